@@ -0,0 +1,194 @@
+"""
+ADAPTAÇÃO DO RANGE DE COR À ILUMINAÇÃO (deriva lenta, com limite e rollback)
+O range HSV capturado no clique fica velho quando a luz do dia ou a
+auto-exposição da câmera mudam: a cor exata falha, o rastreador cai na busca
+por similares (mais cara e sujeita a distratores) e acaba perdendo o objeto.
+
+A cada detecção confirmada, os pixels do bbox com cor próxima do range atual
+(range alargado por `sample_margin`) dão uma amostra: a média de H, S e V
+(o Hue é medido em torno do centro do range, então a volta em 180 não atrapalha).
+Uma média exponencial dessas amostras acompanha a cor do objeto; o
+deslocamento dela em relação à primeira amostra desloca o range do clique
+(mesma largura). O deslocamento é limitado a `max_drift` por canal - o range
+nunca vai longe da cor capturada.
+
+Rollback: mudança brusca de área ou de proporção do bbox (outro objeto
+entrou na máscara, ou o range começou a pegar o fundo) descarta a amostra e
+volta ao último ponto de controle - o estado de `checkpoint_every` amostras
+estáveis atrás.
+"""
+
+import cv2
+import numpy as np
+
+from colormodel import HUE_MAX, in_range, range_center
+
+
+def _hue_delta(a, b):
+    """a - b no círculo do Hue, em -90..90."""
+    return (a - b + HUE_MAX / 2.0) % HUE_MAX - HUE_MAX / 2.0
+
+
+def _widen(lower, upper, margin):
+    """Range alargado de `margin` (H, S, V); Hue dá a volta, S e V limitados a 0..255."""
+    largura_h = (int(upper[0]) - int(lower[0])) % HUE_MAX + 2 * margin[0]
+    if largura_h >= HUE_MAX - 1:
+        h_lower, h_upper = 0, HUE_MAX - 1
+    else:
+        h_lower, h_upper = (int(lower[0]) - margin[0]) % HUE_MAX, (int(upper[0]) + margin[0]) % HUE_MAX
+    return (np.array([h_lower, max(0, int(lower[1]) - margin[1]), max(0, int(lower[2]) - margin[2])], np.uint8),
+            np.array([h_upper, min(255, int(upper[1]) + margin[1]), min(255, int(upper[2]) + margin[2])], np.uint8))
+
+
+_shift_luts = {}
+
+
+def _shift_lut(centro):
+    """Tabela de cv2.LUT que leva o Hue `centro` para 90 (S e V inalterados)."""
+    lut = _shift_luts.get(centro)
+    if lut is None:
+        valores = np.arange(256)
+        lut = np.empty((1, 256, 3), dtype=np.uint8)
+        lut[0, :, 0] = (valores + HUE_MAX // 2 - centro) % HUE_MAX
+        lut[0, :, 1] = valores
+        lut[0, :, 2] = valores
+        lut = _shift_luts[centro] = lut
+    return lut
+
+
+class ColorAdapter:
+    """
+    Acompanha a cor do objeto a partir do range `hsv_color` (lower, upper).
+
+    every:            uma amostra a cada tantas detecções (a luz muda devagar)
+    rate:             peso de cada amostra na média exponencial
+    max_drift:        deslocamento máximo do range (H, S, V) em relação ao clique
+    sample_margin:    folga (H, S, V) sobre o range atual para aceitar pixels na amostra
+    min_pixels:       amostras com menos pixels são ignoradas
+    area_jump:        área fora de [1/area_jump, area_jump] x a média = mudança brusca
+    aspect_jump:      idem para a proporção largura/altura do bbox
+    checkpoint_every: amostras estáveis entre dois pontos de controle
+    """
+
+    def __init__(self, hsv_color, every=3, rate=0.15, max_drift=(10, 60, 80), sample_margin=(6, 30, 40),
+                 min_pixels=20, area_jump=2.5, aspect_jump=2.0, checkpoint_every=30):
+        lower, upper = hsv_color
+        self.base = (np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+        self.every = max(1, int(every))
+        self.rate = float(rate)
+        self.max_drift = np.array(max_drift, dtype=np.float64)
+        self.sample_margin = tuple(int(m) for m in sample_margin)
+        self.min_pixels = int(min_pixels)
+        self.area_jump = float(area_jump)
+        self.aspect_jump = float(aspect_jump)
+        self.checkpoint_every = int(checkpoint_every)
+        self.updates = 0
+        self.rollbacks = 0
+        self.rejected = 0
+        self._seen = 0
+        self.reset()
+
+    def reset(self):
+        """Volta ao range do clique e esquece as amostras."""
+        self.offset = (0, 0, 0)        # deslocamento atual (inteiro) do range
+        self.hsv_color = self.base
+        self._origin = None            # primeira amostra (H, S, V)
+        self._mean = None              # média exponencial das amostras, relativa à origem
+        self._area = None
+        self._aspect = None
+        self._checkpoint = None
+        self._stable = 0
+
+    def _sample(self, hsv):
+        """Média (H, S, V) dos pixels de `hsv` perto do range atual, ou None."""
+        mask = in_range(hsv, *_widen(*self.hsv_color, self.sample_margin))
+        if cv2.countNonZero(mask) < self.min_pixels:
+            return None
+        # Hue deslocado para o centro do range cair em 90: a média não cruza 0/180
+        centro = int(range_center(*self.hsv_color)[0])
+        h, s, v, _ = cv2.mean(cv2.LUT(hsv, _shift_lut(centro)), mask)
+        return np.array([(h - HUE_MAX // 2 + centro) % HUE_MAX, s, v], dtype=np.float64)
+
+    def _sudden(self, area, aspect):
+        if self._area is None:
+            return False
+        razao_area = area / self._area
+        razao_forma = aspect / self._aspect
+        return not (1.0 / self.area_jump <= razao_area <= self.area_jump
+                    and 1.0 / self.aspect_jump <= razao_forma <= self.aspect_jump)
+
+    def _apply(self):
+        """Recalcula o range a partir da média. True se ele mudou."""
+        deriva = np.clip(np.round(self._mean), -self.max_drift, self.max_drift).astype(int)
+        offset = tuple(int(d) for d in deriva)
+        if offset == self.offset:
+            return False
+        self.offset = offset
+        lower, upper = self.base
+        dh, ds, dv = offset
+        self.hsv_color = (
+            np.array([(int(lower[0]) + dh) % HUE_MAX, np.clip(int(lower[1]) + ds, 0, 255),
+                      np.clip(int(lower[2]) + dv, 0, 255)], dtype=np.uint8),
+            np.array([(int(upper[0]) + dh) % HUE_MAX, np.clip(int(upper[1]) + ds, 0, 255),
+                      np.clip(int(upper[2]) + dv, 0, 255)], dtype=np.uint8))
+        return True
+
+    def rollback(self):
+        """Volta ao último ponto de controle (ou ao clique). True se o range mudou."""
+        self.rollbacks += 1
+        self._stable = 0
+        self._mean = None if self._checkpoint is None else self._checkpoint.copy()
+        if self._mean is None:
+            if self.offset == (0, 0, 0):
+                return False
+            self.offset, self.hsv_color = (0, 0, 0), self.base
+            return True
+        return self._apply()
+
+    def observe(self, hsv, bbox, area):
+        """
+        Detecção confirmada: `hsv` é o recorte HSV do bbox, `area` a área do
+        objeto. Retorna True se o range (hsv_color) mudou.
+        """
+        _, _, w_box, h_box = bbox
+        self._seen += 1
+        if self._seen % self.every or not w_box or not h_box or not area:
+            return False
+        aspect = w_box / float(h_box)
+        if self._sudden(area, aspect):
+            # Outro objeto na máscara ou o range pegando o fundo: amostra fora e
+            # volta ao estado estável; a forma nova vira a referência
+            self.rejected += 1
+            self._area, self._aspect = float(area), aspect
+            return self.rollback()
+
+        if self._area is None:
+            self._area, self._aspect = float(area), aspect
+        else:
+            self._area += 0.2 * (area - self._area)
+            self._aspect += 0.2 * (aspect - self._aspect)
+
+        amostra = self._sample(hsv)
+        if amostra is None:
+            return False
+        if self._origin is None:
+            self._origin = amostra
+            self._mean = np.zeros(3)
+            self._checkpoint = self._mean.copy()
+            return False
+        relativa = amostra - self._origin
+        relativa[0] = _hue_delta(amostra[0], self._origin[0])
+        if self._mean is None:
+            self._mean = np.zeros(3)
+        self._mean += self.rate * (relativa - self._mean)
+        np.clip(self._mean, -self.max_drift, self.max_drift, out=self._mean)
+        self.updates += 1
+        self._stable += 1
+        if self._stable >= self.checkpoint_every:
+            self._checkpoint = self._mean.copy()
+            self._stable = 0
+        return self._apply()
+
+    def metrics(self):
+        return {'offset': self.offset, 'updates': self.updates, 'rollbacks': self.rollbacks,
+                'rejected': self.rejected}
@@ -0,0 +1,170 @@
+"""
+PROCESSAMENTO EM LOTE DE VÍDEOS GRAVADOS
+Roda o motor de rastreamento (Tracker) sobre vários vídeos em paralelo, um
+processo por vídeo, e grava a trilha de cada um em CSV ou Parquet.
+
+Uso:
+    python batch.py gravacoes/*.mp4 --color 120,200,180 --out-dir trilhas
+    python batch.py sessao.avi --pick 640,360 --format parquet --workers 8
+
+A cor pode vir de --color H,S,V (mesma tolerância do clique na janela),
+--range Hmin,Smin,Vmin,Hmax,Smax,Vmax ou --pick X,Y (pixel do primeiro frame).
+Coordenadas seguem o frame exibido (espelhado), como no modo ao vivo; use
+--no-mirror para coordenadas do vídeo original.
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from capture import FrameGrabber, open_source
+from colormodel import hsv_range
+from tracker import COLOR_MODELS, Tracker
+
+# Parquet é opcional (pyarrow)
+try:
+    import pyarrow
+    import pyarrow.parquet
+    _use_pyarrow = True
+except Exception:
+    _use_pyarrow = False
+
+
+COLUMNS = ['video', 'frame', 'time_ms', 'phase', 'x', 'y',
+           'bbox_x', 'bbox_y', 'bbox_w', 'bbox_h', 'area', 'tolerance']
+
+
+def _ints(text, count, name):
+    try:
+        values = [int(v) for v in text.split(',')]
+    except ValueError:
+        values = []
+    if len(values) != count:
+        raise argparse.ArgumentTypeError(f'{name} espera {count} inteiros separados por vírgula')
+    return values
+
+
+def track_video(path, color=None, hsv_bounds=None, pick=None, mirror=True, classifier='hsv',
+                color_model='range', flow_interval=0, adapt_color=False, reacquire=True, incremental=False):
+    """
+    Rastreia um vídeo inteiro e devolve (linhas, segundos). Cada linha segue COLUMNS.
+    Roda dentro de um processo do pool: o OpenCV fica com uma thread só para
+    não disputar núcleos com os outros vídeos.
+    """
+    cv2.setNumThreads(1)
+    cap = open_source(path)
+    if not cap.isOpened():
+        raise IOError(f'não foi possível abrir {path}')
+
+    opcoes = dict(mirror=mirror, color_model=color_model, flow_interval=flow_interval, adapt_color=adapt_color,
+                  reacquire=reacquire, incremental=incremental)
+    tracker = Tracker.with_lut(**opcoes) if classifier == 'lut' else Tracker(**opcoes)
+    if color is not None:
+        tracker.set_color(hsv_range(*color, 10, 40, 40))
+    elif hsv_bounds is not None:
+        tracker.set_color((np.array(hsv_bounds[:3], dtype=np.uint8),
+                           np.array(hsv_bounds[3:], dtype=np.uint8)))
+
+    video = os.path.basename(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    rows = []
+    inicio = time.perf_counter()
+    # Decodificação em thread separada, sem descartar frames (block=True)
+    with FrameGrabber(cap, depth=4, block=True) as grabber:
+        while True:
+            frame, _ = grabber.read(latest=False)
+            if frame is None:
+                break
+            if pick is not None and tracker.hsv_color is None:
+                tracker.capture_color(frame.image, *pick)
+
+            time_ms = round(frame.seq * 1000.0 / fps, 3)
+            r = tracker.process(frame.image)
+            # Centróide sub-pixel: centésimos de pixel bastam
+            pos = tuple(round(c, 2) for c in r.position) if r.position is not None else ('', '')
+            bbox = r.bbox if r.bbox is not None else ('', '', '', '')
+            area = r.area if r.area is not None else ''
+            rows.append([video, frame.seq, time_ms, r.phase, *pos, *bbox, area, r.tolerance])
+    return rows, time.perf_counter() - inicio
+
+
+def write_tracks(rows, path, fmt):
+    """Grava as linhas em CSV ou Parquet."""
+    if fmt == 'parquet':
+        columns = {name: [row[i] if row[i] != '' else None for row in rows]
+                   for i, name in enumerate(COLUMNS)}
+        pyarrow.parquet.write_table(pyarrow.table(columns), path)
+    else:
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Rastreia vídeos gravados em paralelo e grava as trilhas')
+    parser.add_argument('videos', nargs='+', help='arquivos de vídeo')
+    cor = parser.add_mutually_exclusive_group(required=True)
+    cor.add_argument('--color', type=lambda t: _ints(t, 3, '--color'), help='cor referência H,S,V')
+    cor.add_argument('--range', dest='hsv_bounds', type=lambda t: _ints(t, 6, '--range'),
+                     help='range Hmin,Smin,Vmin,Hmax,Smax,Vmax')
+    cor.add_argument('--pick', type=lambda t: _ints(t, 2, '--pick'),
+                     help='captura a cor do pixel X,Y do primeiro frame')
+    parser.add_argument('--out-dir', default='.', help='pasta de saída (padrão: pasta atual)')
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='processos em paralelo (padrão: nº de núcleos)')
+    parser.add_argument('--classifier', choices=('hsv', 'lut'), default='hsv')
+    parser.add_argument('--color-model', choices=COLOR_MODELS, default='range',
+                        help='range HSV fixo ou histograma H-S com CamShift')
+    parser.add_argument('--flow-interval', type=int, default=0, metavar='N',
+                        help='detecção por cor a cada N frames, fluxo óptico entre elas (0 = desligado)')
+    parser.add_argument('--adapt-color', action='store_true',
+                        help='o range de cor acompanha mudanças lentas de iluminação')
+    parser.add_argument('--no-reacquire', dest='reacquire', action='store_false',
+                        help='sem a varredura do frame inteiro em faixas quando o objeto se perde')
+    parser.add_argument('--incremental', action='store_true',
+                        help='segmentação incremental: só os blocos da imagem que mudaram (fundo parado)')
+    parser.add_argument('--no-mirror', dest='mirror', action='store_false',
+                        help='coordenadas do vídeo original (sem espelhar)')
+    args = parser.parse_args(argv)
+
+    if args.format == 'parquet' and not _use_pyarrow:
+        parser.error('--format parquet requer pyarrow (pip install pyarrow)')
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    options = dict(color=args.color, hsv_bounds=args.hsv_bounds, pick=args.pick,
+                   mirror=args.mirror, classifier=args.classifier, color_model=args.color_model,
+                   flow_interval=args.flow_interval, adapt_color=args.adapt_color, reacquire=args.reacquire,
+                   incremental=args.incremental)
+
+    falhas = 0
+    inicio = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(track_video, path, **options): path for path in args.videos}
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                rows, segundos = future.result()
+            except Exception as e:
+                falhas += 1
+                print(f"✗ {path}: {e}", file=sys.stderr)
+                continue
+            stem = os.path.splitext(os.path.basename(path))[0]
+            out = os.path.join(args.out_dir, f'{stem}.tracks.{args.format}')
+            write_tracks(rows, out, args.format)
+            fps = len(rows) / segundos if segundos > 0 else 0.0
+            print(f"✓ {path}: {len(rows)} frames em {segundos:.1f}s ({fps:.0f} fps) -> {out}")
+
+    print(f"\n{len(args.videos) - falhas}/{len(args.videos)} vídeos em {time.perf_counter() - inicio:.1f}s")
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,810 @@
+"""
+BENCHMARKS DO DETECTOR (sem câmera)
+
+Uso:
+    python bench.py scenes [--resolutions 480p,720p,1080p --scenarios all --frames 300]
+    python bench.py lut [--width 1280 --height 720 --roi 320]
+    python bench.py motion [--latency-ms 30 --noise 1.5 --rate 240]
+    python bench.py pipeline [--resolution 1080p --fps 60 --frames 600]
+    python bench.py memory [--resolution 720p --scenarios steady,occlusion,distractors]
+    python bench.py preview [--resolution 720p --scenario occlusion --fps 30]
+    python bench.py multi [--resolution 720p --scenarios multi,hands,jump --targets 1,2,4,6]
+    python bench.py jitter [--resolutions 480p,720p,1080p --scenarios steady,noise,fast --screen 1920x1080]
+    python bench.py publish [--rates 120,500,1000,0 --seconds 2 --poll-us 200]
+    python bench.py incremental [--resolutions 720p,1080p --scenarios steady,noise,fast,daylight]
+
+`scenes` roda o caminho completo de detecção (Tracker: cor exata, busca ao
+redor da última posição, cores similares) sobre cenas sintéticas com gabarito
+e mede frames/s, latência por frame, erro do centro e tempo para reencontrar
+o objeto depois que ele some. Com --budget-ms, o governador de qualidade
+(governor.py) ajusta o rastreador a cada frame para caber no orçamento.
+
+`motion` compara os filtros do cursor (motion.py) numa trajetória com ruído
+de medição: erro entre o cursor e a posição real no instante em que o
+cursor é movido, amostrado na taxa do monitor.
+
+`pipeline` compara o loop serial com o pipeline (threads e processos) numa
+fonte a taxa fixa: frames/s entregues, latência captura -> frame pronto e
+frames descartados.
+
+`memory` mede, com tracemalloc, quanta memória cada frame aloca (rastreamento
++ frame exibido) com arrays novos a cada chamada e com os buffers
+reaproveitados do workspace.Workspace, depois de um aquecimento.
+
+`preview` mede o custo da prévia da janela por frame (preview.PreviewRenderer:
+espelhar/reduzir + desenhar, sem o imshow) em resolução cheia e reduzida, com
+e sem o cache de textos, limitada em fps e com a janela escondida.
+
+`multi` compara, para 1, 2, 4... alvos de cores diferentes, um Tracker por
+cor com o multitrack.MultiTracker (uma segmentação por frame para todos):
+custo por frame e taxa de detecção, com os alvos espalhados, próximos (as
+duas mãos) e sumindo e voltando longe.
+
+`jitter` compara a posição de cada frame como centro inteiro do bbox (o que
+o rastreador devolvia) e como centróide sub-pixel (blobs.py): erro médio,
+tremor na tela (desvio do erro, mapeado para a resolução da tela) e o
+atraso de um EMA que levaria o tremor ao alvo (--target-px).
+
+`publish` publica resultados (publisher.py) a taxas fixas e mede, num
+consumidor de teste em outro processo (subscriber.py), quantos chegam e a
+latência da publicação até a leitura, pelo anel em memória e por UDP.
+
+`incremental` compara a segmentação da janela (cvtColor + inRange) feita do
+zero com a do incremental.SegmentationCache (só os blocos que mudaram), na
+janela de rastreamento, na janela de busca crescida e no frame inteiro:
+custo por frame e fração dos blocos que vieram do cache.
+"""
+
+import argparse
+import json
+import multiprocessing
+import threading
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from colormodel import ColorLUT, hsv_range, in_range
+from detection import hsv_at, scaled_length, tracking_window
+from governor import QualityGovernor
+from incremental import SegmentationCache
+from motion import FILTERS, MotionModel
+from pipeline import Pipeline, Stage
+from preview import PreviewRenderer
+from multitrack import MultiTracker
+from publisher import TrackPublisher
+from subscriber import DEFAULT_PORT, TrackSubscriber, UdpSubscriber
+from scenes import RESOLUTIONS, SCENARIOS, Scene, make_scene
+from tracker import COLOR_MODELS, FOUND_PHASES, PHASE_DETECTED, TrackResult, Tracker, tracker_stage
+from workspace import Workspace
+
+
+def _timeit(fn, repeat):
+    """Executa fn() `repeat` vezes e devolve o tempo médio em ms."""
+    fn()  # aquecimento
+    inicio = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - inicio) / repeat * 1000.0
+
+
+def _test_image(width, height, seed=0):
+    """Imagem com regiões suaves de cores aleatórias (mais parecida com uma cena que ruído puro)."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    image = cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+    noise = rng.integers(-6, 7, size=image.shape, dtype=np.int16)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def bench_lut(args):
+    """Compara cvtColor + inRange com a tabela BGR -> máscara."""
+    image = _test_image(args.width, args.height)
+    roi = image[:args.roi, :args.roi]
+    # Vermelho: range com wraparound do Hue
+    exato = hsv_range(2, 200, 200, 10, 40, 40)
+    similar = hsv_range(2, 200, 200, 40, 150, 150)
+    lut = ColorLUT()
+
+    inicio = time.perf_counter()
+    lut.set_range(*exato)
+    build_ms = (time.perf_counter() - inicio) * 1000.0
+    inicio = time.perf_counter()
+    lut.set_range(*similar)
+    rebuild_ms = (time.perf_counter() - inicio) * 1000.0
+
+    print(f"LUT BGR555: montagem {build_ms:.2f} ms, nova tolerância {rebuild_ms:.2f} ms")
+    print(f"{'caso':<34}{'cvtColor+inRange':>18}{'LUT':>10}")
+
+    for nome, img in ((f'frame {args.width}x{args.height}', image), (f'ROI {args.roi}x{args.roi}', roi)):
+        hsv_ms = _timeit(lambda: in_range(cv2.cvtColor(img, cv2.COLOR_BGR2HSV), *exato), args.repeat)
+        lut_ms = _timeit(lambda: lut.mask(img, *exato), args.repeat)
+        print(f"{nome + ' (1 range)':<34}{hsv_ms:>15.3f} ms{lut_ms:>7.3f} ms")
+
+        def hsv_dois():
+            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+            in_range(hsv, *exato)
+            in_range(hsv, *similar)
+
+        def lut_dois():
+            idx = lut.index(img)
+            lut.classify(idx, *exato)
+            lut.classify(idx, *similar)
+
+        hsv_ms = _timeit(hsv_dois, args.repeat)
+        lut_ms = _timeit(lut_dois, args.repeat)
+        print(f"{nome + ' (exato + similar)':<34}{hsv_ms:>15.3f} ms{lut_ms:>7.3f} ms")
+
+    # Concordância com o caminho HSV (a quantização só erra perto das bordas do range)
+    referencia = in_range(cv2.cvtColor(image, cv2.COLOR_BGR2HSV), *similar)
+    concordancia = np.mean(referencia == lut.mask(image, *similar)) * 100.0
+    print(f"Concordância com cvtColor+inRange: {concordancia:.2f}% dos pixels")
+
+
+def run_scene(scene, tracker, mirror=True, governor=None):
+    """
+    Roda `tracker` (qualquer objeto com capture_color/process) sobre a cena e
+    devolve as métricas. Só o tempo de tracker.process entra na latência.
+    Com `governor` (QualityGovernor), a qualidade é ajustada a cada frame.
+    """
+    latencias = []
+    erros = []
+    fases = {}
+    visiveis = encontrados = falsos = 0
+    # Reaquisição: frames entre o objeto voltar a aparecer e ser achado de novo
+    reaquisicoes = []
+    esperando_desde = None
+    visivel_antes = False
+    tolerancia = 2.0 * scene.radius
+
+    for index, frame, truth in scene.frames():
+        if index == 0:
+            tracker.capture_color(frame, *scene.pick_point(mirror))
+
+        if governor is not None:
+            tracker.set_quality(**governor.settings()['quality'])
+        inicio = time.perf_counter()
+        result = tracker.process(frame)
+        latencias.append(time.perf_counter() - inicio)
+        if governor is not None:
+            governor.record(latencias[-1], tracker.last_area)
+        fases[result.phase] = fases.get(result.phase, 0) + 1
+
+        achou = result.phase in FOUND_PHASES
+        correto = False
+        if truth.visible:
+            visiveis += 1
+            if achou:
+                tx = scene.width - 1 - truth.x if mirror else truth.x
+                erro = float(np.hypot(result.position[0] - tx, result.position[1] - truth.y))
+                correto = erro <= tolerancia
+                if correto:
+                    encontrados += 1
+                    erros.append(erro)
+            if not visivel_antes and index > 0:
+                esperando_desde = index
+        elif achou:
+            falsos += 1
+
+        if esperando_desde is not None and correto:
+            reaquisicoes.append(index - esperando_desde)
+            esperando_desde = None
+        visivel_antes = truth.visible
+
+    lat_ms = np.array(latencias) * 1000.0
+    frame_ms = 1000.0 / scene.fps
+    return {
+        'scenario': scene.name,
+        'resolution': f'{scene.width}x{scene.height}',
+        'frames': len(latencias),
+        'fps': round(len(latencias) / max(1e-9, sum(latencias)), 1),
+        'latency_p50_ms': round(float(np.percentile(lat_ms, 50)), 3),
+        'latency_p95_ms': round(float(np.percentile(lat_ms, 95)), 3),
+        'latency_p99_ms': round(float(np.percentile(lat_ms, 99)), 3),
+        'latency_max_ms': round(float(lat_ms.max()), 3),
+        'detection_rate': round(encontrados / visiveis, 4) if visiveis else None,
+        'false_positive_frames': falsos,
+        'centroid_error_mean_px': round(float(np.mean(erros)), 2) if erros else None,
+        'centroid_error_p95_px': round(float(np.percentile(erros, 95)), 2) if erros else None,
+        'reacquisitions': len(reaquisicoes),
+        'reacquire_failed': int(esperando_desde is not None),
+        'reacquire_mean_ms': round(float(np.mean(reaquisicoes)) * frame_ms, 1) if reaquisicoes else None,
+        'reacquire_max_ms': round(float(max(reaquisicoes)) * frame_ms, 1) if reaquisicoes else None,
+        'phases': fases,
+        # Frames achados pela cor exata (o caminho barato), entre os achados
+        'exact_share': round((fases.get('detected', 0) + fases.get('exact', 0))
+                             / max(1, sum(fases.get(f, 0) for f in FOUND_PHASES)), 4),
+        'governor': governor.metrics() if governor is not None else None,
+        'adapter': tracker.adapter.metrics() if getattr(tracker, 'adapter', None) is not None else None,
+        'reacquirer': tracker.reacquirer.metrics() if getattr(tracker, 'reacquirer', None) is not None else None,
+        'segmentation': (tracker.segmentation.metrics()
+                         if getattr(tracker, 'segmentation', None) is not None else None),
+    }
+
+
+def _make_tracker(args, reuse_buffers=True):
+    opcoes = dict(color_model=getattr(args, 'color_model', 'range'), flow_interval=getattr(args, 'flow_interval', 0),
+                  adapt_color=getattr(args, 'adapt_color', False), reacquire=getattr(args, 'reacquire', True),
+                  incremental=getattr(args, 'incremental', False), reuse_buffers=reuse_buffers)
+    return Tracker.with_lut(**opcoes) if args.classifier == 'lut' else Tracker(**opcoes)
+
+
+def bench_scenes(args):
+    """Roda os cenários sintéticos em cada resolução e imprime a tabela de resultados."""
+    resolucoes = args.resolutions.split(',')
+    cenarios = list(SCENARIOS) if args.scenarios == 'all' else args.scenarios.split(',')
+    resultados = []
+
+    print(f"{'cenário':<12}{'res':>10}{'fps':>8}{'p50':>8}{'p95':>8}{'p99':>8}"
+          f"{'detec':>7}{'exato':>7}{'FP':>5}{'erro':>7}{'reaq':>8}{'reaq max':>9}")
+    for res in resolucoes:
+        for nome in cenarios:
+            scene = make_scene(nome, res, num_frames=args.frames, seed=args.seed)
+            governor = QualityGovernor(args.budget_ms) if args.budget_ms else None
+            r = run_scene(scene, _make_tracker(args), governor=governor)
+            resultados.append(r)
+            detec = f"{r['detection_rate'] * 100:.0f}%" if r['detection_rate'] is not None else '-'
+            erro = f"{r['centroid_error_mean_px']:.1f}" if r['centroid_error_mean_px'] is not None else '-'
+            reaq = f"{r['reacquire_mean_ms']:.0f}ms" if r['reacquire_mean_ms'] is not None else '-'
+            reaq_max = f"{r['reacquire_max_ms']:.0f}ms" if r['reacquire_max_ms'] is not None else '-'
+            if r['reacquire_failed']:
+                reaq_max += '*'
+            print(f"{nome:<12}{res:>10}{r['fps']:>8.0f}{r['latency_p50_ms']:>8.2f}"
+                  f"{r['latency_p95_ms']:>8.2f}{r['latency_p99_ms']:>8.2f}{detec:>7}{r['exact_share'] * 100:>6.0f}%"
+                  f"{r['false_positive_frames']:>5}{erro:>7}{reaq:>8}{reaq_max:>9}"
+                  + (f"  nível {r['governor']['level']}" if governor is not None else '')
+                  + (f"  blocos do cache {r['segmentation']['skipped'] * 100:.0f}%"
+                     if r['segmentation'] and r['segmentation']['skipped'] is not None else ''))
+
+    print("\nlatência em ms por frame; exato = achados pela cor exata (sem similares/fluxo);"
+          " erro = distância média do centro (px);\n"
+          "reaq = tempo para reencontrar após reaparecer (* = não reencontrou até o fim)")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(resultados, f, indent=2)
+        print(f"✓ Resultados em {args.json}")
+    return resultados
+
+
+def bench_motion(args):
+    """
+    Simula detecções a 30 fps (posição real + ruído gaussiano) que chegam
+    `latency_ms` depois da captura e mede o erro do cursor em `rate` Hz.
+    """
+    rng = np.random.default_rng(args.seed)
+    latencia = args.latency_ms / 1000.0
+    print(f"latência {args.latency_ms:.0f} ms, ruído {args.noise} px, saída {args.rate:.0f} Hz (erro em px, 720p)")
+    print(f"{'cenário':<10}{'filtro':<10}{'predição':>9}{'erro médio':>12}{'p95':>8}{'tremor':>8}")
+    for nome in ('steady', 'fast', 'lighting'):
+        scene = make_scene(nome, '720p', num_frames=args.frames, seed=args.seed)
+        fps = scene.fps
+        medidas = [(i / fps, scene.position(i)) for i in range(scene.num_frames)]
+        ruido = rng.normal(0, args.noise, (len(medidas), 2))
+        for filtro in FILTERS:
+            for prever in ((False, True) if filtro in ('one-euro', 'kalman') else (False,)):
+                model = MotionModel(filtro, predict=prever)
+                erros, passos = [], []
+                proxima, anterior = 0, None
+                t = latencia
+                fim = scene.num_frames / fps
+                while t < fim:
+                    # Entregar as detecções que já terminaram de processar
+                    while proxima < len(medidas) and medidas[proxima][0] + latencia <= t:
+                        ts, (x, y) = medidas[proxima]
+                        model.update((x + ruido[proxima][0], y + ruido[proxima][1]), ts)
+                        proxima += 1
+                    pos = model.position(now=t)
+                    if pos is not None:
+                        real = scene.position(t * fps)
+                        erros.append(np.hypot(pos[0] - real[0], pos[1] - real[1]))
+                        if anterior is not None:
+                            passos.append(np.hypot(pos[0] - anterior[0], pos[1] - anterior[1]))
+                        anterior = pos
+                    t += 1.0 / args.rate
+                # Tremor: variação do passo do cursor (derivada segunda), alto = cursor trêmulo
+                tremor = float(np.std(np.diff(passos))) if len(passos) > 2 else 0.0
+                print(f"{nome:<10}{filtro:<10}{('sim' if prever else 'não'):>9}"
+                      f"{np.mean(erros):>12.1f}{np.percentile(erros, 95):>8.1f}{tremor:>8.2f}")
+
+
+def _bench_compose():
+    """Composição típica do frame exibido: espelhar + desenhar o resultado."""
+    def compose(frame, meta):
+        imagem = cv2.flip(frame, 1)
+        r = meta['result']
+        if r.bbox is not None:
+            x, y, w, h = r.bbox
+            cv2.rectangle(imagem, (x, y), (x + w, y + h), (0, 255, 0), 3)
+        cv2.putText(imagem, f"{r.phase} seq {meta['seq']}", (15, 40), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.8, (255, 255, 255), 2)
+        return dict(meta, display=imagem)
+    return compose
+
+
+def bench_pipeline(args):
+    """
+    Fonte a `fps` fixos (frames pré-renderizados); mede quantos frames ficam
+    prontos por segundo e a latência de cada um, no loop serial e no pipeline.
+    """
+    scene = make_scene('steady', args.resolution, num_frames=60, seed=args.seed)
+    frames = [scene.render(i) for i in range(scene.num_frames)]
+    cor = Tracker()
+    cor.capture_color(frames[0], *scene.pick_point())
+    intervalo = 1.0 / args.fps
+    print(f"{args.resolution} a {args.fps:.0f} fps, {args.frames} frames")
+    print(f"{'modo':<22}{'fps':>8}{'lat p50':>10}{'lat p95':>10}{'descart.':>10}")
+
+    modos = [('serial', None, None), ('thread/latency', 'thread', 'latency'),
+             ('thread/throughput', 'thread', 'throughput'), ('process/latency', 'process', 'latency'),
+             ('process/throughput', 'process', 'throughput')]
+    for nome, modo, politica in modos:
+        cv2.setNumThreads(args.cv_threads)
+        latencias = []
+        comandos = [('set_color', cor.hsv_color)]
+        if modo is None:
+            track, compose = tracker_stage(), _bench_compose()
+            inicio = time.perf_counter()
+            proximo = inicio
+            for seq in range(args.frames):
+                # Serial: a captura espera o frame anterior terminar (frames atrasados se perdem)
+                agora = time.perf_counter()
+                if agora < proximo:
+                    time.sleep(proximo - agora)
+                t = time.perf_counter()
+                meta = {'seq': seq, 't': t, 'commands': comandos if seq == 0 else ()}
+                compose(frames[seq % len(frames)], track(frames[seq % len(frames)], meta))
+                latencias.append(time.perf_counter() - t)
+                proximo = max(proximo + intervalo, time.perf_counter())
+            total = time.perf_counter() - inicio
+            prontos, descartados = len(latencias), 0
+        else:
+            pipe = Pipeline([Stage('track', tracker_stage, process=(modo == 'process')),
+                             Stage('compose', _bench_compose, workers=args.workers)],
+                            policy=politica, depth=1 if politica == 'latency' else 4).start()
+            recebidos = []
+
+            def consumir():
+                while True:
+                    item = pipe.get(timeout=1.0)
+                    if item is None:
+                        return
+                    recebidos.append(time.perf_counter() - item.meta['t'])
+
+            consumidor = threading.Thread(target=consumir)
+            consumidor.start()
+            inicio = time.perf_counter()
+            for seq in range(args.frames):
+                espera = inicio + seq * intervalo - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                meta = {'seq': seq, 't': time.perf_counter(), 'commands': comandos if seq == 0 else ()}
+                pipe.submit(seq, frames[seq % len(frames)], meta)
+            consumidor.join()
+            total = time.perf_counter() - inicio - 1.0   # menos o timeout final do consumidor
+            stats = pipe.stats()
+            pipe.close()
+            latencias = recebidos
+            prontos = len(recebidos)
+            descartados = sum(s['dropped'] for s in stats.values())
+        lat = np.array(latencias) * 1000.0
+        print(f"{nome:<22}{prontos / total:>8.1f}{np.percentile(lat, 50):>8.2f}ms"
+              f"{np.percentile(lat, 95):>8.2f}ms{descartados:>10}")
+
+
+def bench_memory(args):
+    """
+    Memória alocada por frame em regime: para cada frame (já renderizado),
+    o pico de tracemalloc acima do que estava vivo antes dele, rodando
+    tracker.process + o espelhamento do frame exibido. Compara arrays novos
+    a cada chamada com os buffers do Workspace.
+    """
+    cenarios = args.scenarios.split(',')
+    print(f"{args.resolution}, {args.frames} frames medidos após {args.warmup} de aquecimento")
+    print(f"{'cenário':<12}{'buffers':<10}{'ms/frame':>9}{'KB/frame p50':>14}{'max':>10}"
+          f"{'MB/s a 30fps':>14}{'realocações':>13}{'workspace':>11}")
+    for nome in cenarios:
+        scene = make_scene(nome, args.resolution, num_frames=args.warmup + args.frames, seed=args.seed)
+        frames = [scene.render(i) for i in range(scene.num_frames)]
+        for reaproveitar in (False, True):
+            def aquecido():
+                """Rastreador novo que já passou pelos frames de aquecimento."""
+                tracker = _make_tracker(args, reuse_buffers=reaproveitar)
+                tela = Workspace() if reaproveitar else None
+                tracker.capture_color(frames[0], *scene.pick_point())
+
+                def passo(frame):
+                    tracker.process(frame)
+                    if tela is None:
+                        cv2.flip(frame, 1)
+                    else:
+                        tela.reserve(frame.shape)
+                        cv2.flip(frame, 1, dst=tela.like('display', frame))
+
+                for frame in frames[:args.warmup]:
+                    passo(frame)
+                return tracker, tela, passo
+
+            _, _, passo = aquecido()
+            inicio = time.perf_counter()
+            for frame in frames[args.warmup:]:
+                passo(frame)
+            ms = (time.perf_counter() - inicio) / args.frames * 1000.0
+
+            # A memória numa segunda execução (tracemalloc atrasa o frame)
+            tracker, tela, passo = aquecido()
+            ws = tracker.workspace
+            alocacoes = ws.allocations if ws is not None else 0
+            picos = []
+            tracemalloc.start()
+            for frame in frames[args.warmup:]:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                passo(frame)
+                picos.append(tracemalloc.get_traced_memory()[1] - base)
+            tracemalloc.stop()
+            kb = np.array(picos) / 1024.0
+            realocadas = (ws.allocations - alocacoes) if ws is not None else '-'
+            tamanho = f"{(ws.nbytes + tela.nbytes) / 2**20:.1f} MB" if ws is not None else '-'
+            print(f"{nome:<12}{('workspace' if reaproveitar else 'novos'):<10}{ms:>9.3f}"
+                  f"{np.percentile(kb, 50):>14.1f}{kb.max():>10.1f}{np.mean(kb) * 30 / 1024:>14.2f}"
+                  f"{realocadas:>13}{tamanho:>11}")
+    print("\nKB/frame = pico de memória alocada durante o frame (arrays temporários);"
+          " realocações = buffers que cresceram durante a medição")
+
+
+def bench_preview(args):
+    """
+    Custo da prévia por frame, fora o rastreamento (os resultados são
+    calculados antes) e o imshow (sem janela aqui: a coluna MB/s é o volume
+    que iria para ele).
+    """
+    scene = make_scene(args.scenario, args.resolution, num_frames=args.frames, seed=args.seed)
+    frames = [scene.render(i) for i in range(scene.num_frames)]
+    cor = Tracker()
+    cor.capture_color(frames[0], *scene.pick_point())
+    track = tracker_stage()
+    metas = []
+    for seq, frame in enumerate(frames):
+        meta = {'seq': seq, 'commands': [('set_color', cor.hsv_color)] if seq == 0 else (),
+                'perdidos': 0, 'dropped_total': 0, 'hud': False, 'overlay': 'full'}
+        metas.append(track(frame, meta))
+
+    print(f"{args.resolution}, cena '{args.scenario}', {len(frames)} frames a {args.fps:.0f} fps")
+    print(f"{'prévia':<28}{'média':>10}{'p95':>10}{'desenhadas':>12}{'MB/s':>8}")
+    modos = [('cheia, texto sem cache', dict(cache_text=False)), ('cheia', {}),
+             ('metade', dict(scale=0.5)), (f'metade a {args.preview_fps:.0f} fps', dict(scale=0.5, fps=args.preview_fps)),
+             ('escondida', None)]
+    for nome, opcoes in modos:
+        preview = PreviewRenderer(**(opcoes or {}))
+        preview.visible = opcoes is not None
+        tela = Workspace()
+        custos = []
+        enviados = 0
+        for seq, frame in enumerate(frames):
+            inicio = time.perf_counter()
+            meta = dict(metas[seq], render=preview.due(seq / args.fps))
+            if meta['render']:
+                tela.reserve(frame.shape)
+                meta = preview.compose(frame, meta, tela.array('display', preview.shape(frame.shape)))
+                enviados += meta['display'].nbytes
+            custos.append(time.perf_counter() - inicio)
+        ms = np.array(custos) * 1000.0
+        duracao = len(frames) / args.fps
+        print(f"{nome:<28}{ms.mean():>8.3f}ms{np.percentile(ms, 95):>8.3f}ms"
+              f"{preview.rendered:>12}{enviados / duracao / 2**20:>8.1f}")
+
+
+def _ema_lag(tremor, alvo):
+    """
+    Atraso (frames) do EMA que reduz um tremor branco de `tremor` para
+    `alvo`: o EMA de fator a divide o desvio por sqrt((2 - a) / a) e atrasa
+    (1 - a) / a frames.
+    """
+    if tremor <= alvo:
+        return 0.0
+    q = (alvo / tremor) ** 2
+    a = 2.0 * q / (1.0 + q)
+    return (1.0 - a) / a
+
+
+def bench_jitter(args):
+    """Centro inteiro do bbox x centróide sub-pixel, nos mesmos frames rastreados."""
+    tela_w, tela_h = (int(v) for v in args.screen.split('x'))
+    print(f"tremor e atraso na tela {tela_w}x{tela_h}; EMA até {args.target_px} px de tremor")
+    print(f"{'cenário':<12}{'res':>7}{'posição':>16}{'erro px':>9}{'tremor tela':>13}{'atraso EMA':>12}")
+    for res in args.resolutions.split(','):
+        for nome in args.scenarios.split(','):
+            scene = make_scene(nome, res, num_frames=args.frames, seed=args.seed)
+            escala = tela_w / float(scene.width)
+            tracker = Tracker()
+            erros = {'centro do bbox': [], 'centróide': []}
+            for index, frame, truth in scene.frames():
+                if index == 0:
+                    tracker.capture_color(frame, *scene.pick_point())
+                result = tracker.process(frame)
+                if not truth.visible or result.phase not in FOUND_PHASES:
+                    continue
+                real = (scene.width - 1 - truth.x, truth.y)
+                bx, by, bw, bh = result.bbox
+                erros['centro do bbox'].append((bx + bw // 2 - real[0], by + bh // 2 - real[1]))
+                erros['centróide'].append((result.position[0] - real[0], result.position[1] - real[1]))
+            for posicao, lista in erros.items():
+                e = np.array(lista)
+                if not len(e):
+                    continue
+                tremor = float(np.sqrt(e.var(axis=0).sum())) * escala
+                atraso = _ema_lag(tremor, args.target_px) * 1000.0 / scene.fps
+                print(f"{nome:<12}{res:>7}{posicao:>16}{np.hypot(e[:, 0], e[:, 1]).mean():>7.2f}"
+                      f"{tremor:>11.2f}px{atraso:>10.0f}ms")
+
+
+def _consume(transporte, endereco, total, poll_interval, fila):
+    """
+    Consumidor de teste (outro processo): lê até `total` registros (ou 1 s
+    sem nada) e devolve pela fila as latências publicação -> leitura.
+    """
+    sub = TrackSubscriber(endereco, from_start=True) if transporte == 'memória' else UdpSubscriber(endereco)
+    fila.put('pronto')
+    latencias = []
+    ultimo = time.perf_counter()
+    with sub:
+        while sub.received + sub.lost < total and time.perf_counter() - ultimo < 1.0:
+            novos = sub.wait(0.1, poll_interval) if transporte == 'memória' else sub.wait(0.1)
+            agora = time.perf_counter()
+            if novos:
+                ultimo = agora
+                latencias.extend(agora - u.published for u in novos)
+        fila.put((latencias, sub.lost))
+
+
+def bench_publish(args):
+    """Publicador a taxas fixas x consumidor de teste em outro processo."""
+    resultado = TrackResult(PHASE_DETECTED, (640.25, 360.5), (610, 330, 61, 61), 2900.0, 0, 120, 0)
+    print(f"{'transporte':<12}{'taxa':>8}{'entregues':>11}{'perdidos':>10}{'publicar':>10}"
+          f"{'p50':>9}{'p99':>9}{'máx':>9}   (µs)")
+    for transporte in ('memória', 'udp'):
+        for taxa in (float(t) for t in args.rates.split(',')):
+            total = int(taxa * args.seconds) if taxa > 0 else args.count
+            if transporte == 'memória':
+                publisher, endereco = TrackPublisher('wave-bench', slots=args.slots), 'wave-bench'
+            else:
+                publisher, endereco = TrackPublisher(None, udp=[('127.0.0.1', args.port)]), args.port
+            fila = multiprocessing.Queue()
+            consumidor = multiprocessing.Process(target=_consume,
+                                                 args=(transporte, endereco, total, args.poll_us / 1e6, fila))
+            consumidor.start()
+            fila.get(timeout=10)
+            custos = []
+            inicio = time.perf_counter()
+            for i in range(total):
+                if taxa > 0:
+                    # Espera o instante do registro i (dorme no grosso, gira no último ms)
+                    alvo = inicio + i / taxa
+                    while True:
+                        resta = alvo - time.perf_counter()
+                        if resta <= 0:
+                            break
+                        if resta > 0.001:
+                            time.sleep(resta - 0.001)
+                t0 = time.perf_counter()
+                publisher.publish(i, t0, resultado)
+                custos.append(time.perf_counter() - t0)
+            duracao = time.perf_counter() - inicio
+            latencias, perdidos = fila.get(timeout=30)
+            consumidor.join()
+            publisher.close()
+            us = np.array(latencias) * 1e6 if latencias else np.zeros(1)
+            nome_taxa = f"{taxa:.0f}/s" if taxa > 0 else f"{total / duracao / 1000:.0f}k/s"
+            print(f"{transporte:<12}{nome_taxa:>8}{len(latencias):>11}{perdidos:>10}"
+                  f"{np.mean(custos) * 1e6:>10.1f}{np.percentile(us, 50):>9.0f}{np.percentile(us, 99):>9.0f}"
+                  f"{us.max():>9.0f}")
+    print("taxa 0 = o mais rápido possível; publicar = custo de publish() no loop; p50/p99/máx = publicação -> leitura")
+
+
+def bench_multi(args):
+    """Um Tracker por cor x MultiTracker, por número de alvos."""
+    width, height = RESOLUTIONS.get(args.resolution, args.resolution)
+    print(f"{args.resolution}, {args.frames} frames; ms por frame (média / p95) e detecção")
+    print(f"{'cena':<10}{'alvos':>6}{'um Tracker por cor':>26}{'MultiTracker':>26}")
+    for nome in args.scenarios.split(','):
+        for n in (int(t) for t in args.targets.split(',')):
+            scene = Scene(nome, width, height, num_frames=args.frames, seed=args.seed,
+                          **dict(SCENARIOS[nome], targets=n))
+            frames = [scene.render(i) for i in range(scene.num_frames)]
+            separados = []
+            multi = MultiTracker()
+            for alvo in range(n):
+                x, y = scene.pick_point(target=alvo)
+                tracker = Tracker()
+                tracker.capture_color(frames[0], x, y)
+                separados.append(tracker)
+                multi.capture_color(alvo, frames[0], x, y)
+
+            modos = (lambda f: [t.process(f) for t in separados], lambda f: list(multi.process(f).values()))
+            custos = ([], [])
+            vistos, achados = [0, 0], [0, 0]
+            for index, frame in enumerate(frames):
+                # Quem lê o frame primeiro paga as faltas de cache da CPU: alterna
+                for m in ((0, 1) if index % 2 else (1, 0)):
+                    inicio = time.perf_counter()
+                    resultados = modos[m](frame)
+                    custos[m].append(time.perf_counter() - inicio)
+                    for alvo, result in enumerate(resultados):
+                        if scene.truth(index, alvo).visible:
+                            vistos[m] += 1
+                            achados[m] += result.phase in FOUND_PHASES
+            colunas = []
+            for m in (0, 1):
+                ms = np.array(custos[m]) * 1000.0
+                colunas.append(f"{ms.mean():.2f} / {np.percentile(ms, 95):.2f}  {achados[m] / max(1, vistos[m]):6.1%}")
+            print(f"{nome:<10}{n:>6}{colunas[0]:>26}{colunas[1]:>26}")
+
+
+def bench_incremental(args):
+    """Segmentação da janela do zero x SegmentationCache, em janelas de tamanhos diferentes."""
+    print(f"{'cenário':<11}{'res':>7}{'janela':>14}{'do zero p50/p95':>19}{'incremental p50/p95':>23}"
+          f"{'cache':>8}{'pior':>7}")
+    for res in args.resolutions.split(','):
+        for nome in args.scenarios.split(','):
+            scene = make_scene(nome, res, num_frames=args.frames, seed=args.seed)
+            w, h = scene.width, scene.height
+            area = np.pi * scene.radius ** 2
+            janelas = (('rastreamento', scaled_length(100, w)),
+                       ('busca', scaled_length(200, w)),    # crescida por SEARCH_MAX_GROWTH_FRAMES frames
+                       ('frame inteiro', None))
+            frames = [(frame.copy(), truth) for _, frame, truth in scene.frames()]
+            cor = hsv_range(*hsv_at(frames[0][0], *scene.pick_point(mirror=False), mirror=False), 10, 40, 40)
+            for rotulo, raio in janelas:
+                cache = SegmentationCache()
+                do_zero, incremental, pulados = [], [], []
+                centro = (w / 2, h / 2)
+                for index, (frame, truth) in enumerate(frames):
+                    foco = None
+                    if truth.visible:
+                        centro = (truth.x, truth.y)
+                        r = scene.radius + 2
+                        foco = (int(truth.x) - r, int(truth.y) - r, int(truth.x) + r + 1, int(truth.y) + r + 1)
+                    janela = ((0, 0, w, h) if raio is None
+                              else tracking_window((int(centro[0]), int(centro[1])), raio, area, w, h))
+                    x0, y0, x1, y1 = janela
+
+                    def zero():
+                        t0 = time.perf_counter()
+                        in_range(cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2HSV), *cor)
+                        do_zero.append(time.perf_counter() - t0)
+
+                    def com_cache():
+                        t0 = time.perf_counter()
+                        cache.update(frame, foco)
+                        cache.mask(janela, *cor)
+                        incremental.append(time.perf_counter() - t0)
+
+                    # Quem lê o frame primeiro paga as faltas de cache da CPU: alterna
+                    for medir in ((zero, com_cache) if index % 2 else (com_cache, zero)):
+                        medir()
+                    if index > 0:
+                        pulados.append(cache.skipped_fraction())
+                a, b = np.array(do_zero[1:]) * 1000.0, np.array(incremental[1:]) * 1000.0
+                print(f"{nome:<11}{res:>7}{rotulo:>14}{np.median(a):>10.3f} / {np.percentile(a, 95):.3f}"
+                      f"{np.median(b):>14.3f} / {np.percentile(b, 95):.3f}"
+                      f"{np.mean(pulados):>8.0%}{np.percentile(pulados, 5):>7.0%}")
+    print("\nms por frame (só cvtColor + inRange da janela); cache = fração média dos blocos que vieram do cache,"
+          " pior = percentil 5")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do detector de cor (sem câmera)')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_scenes = sub.add_parser('scenes', help='cenas sintéticas com gabarito (vazão, latência, precisão)')
+    p_scenes.add_argument('--resolutions', default='480p,720p,1080p',
+                          help=f"lista separada por vírgula ({', '.join(RESOLUTIONS)})")
+    p_scenes.add_argument('--scenarios', default='all',
+                          help=f"lista separada por vírgula ou 'all' ({', '.join(SCENARIOS)})")
+    p_scenes.add_argument('--frames', type=int, default=300)
+    p_scenes.add_argument('--seed', type=int, default=0)
+    p_scenes.add_argument('--classifier', choices=('hsv', 'lut'), default='hsv')
+    p_scenes.add_argument('--color-model', choices=COLOR_MODELS, default='range',
+                          help='range HSV fixo ou histograma H-S com CamShift')
+    p_scenes.add_argument('--flow-interval', type=int, default=0, metavar='N',
+                          help='detecção por cor a cada N frames, fluxo óptico entre elas (0 = desligado)')
+    p_scenes.add_argument('--adapt-color', action='store_true',
+                          help='o range de cor acompanha a iluminação (adaptation.ColorAdapter)')
+    p_scenes.add_argument('--no-reacquire', dest='reacquire', action='store_false',
+                          help='sem a varredura do frame inteiro em faixas (só a janela crescendo ao redor)')
+    p_scenes.add_argument('--incremental', action='store_true',
+                          help='segmentação incremental: só os blocos da imagem que mudaram (incremental.py)')
+    p_scenes.add_argument('--budget-ms', type=float,
+                          help='liga o governador de qualidade com este orçamento por frame (p95)')
+    p_scenes.add_argument('--json', help='grava os resultados completos neste arquivo')
+    p_scenes.set_defaults(func=bench_scenes)
+
+    p_lut = sub.add_parser('lut', help='tabela BGR->máscara vs cvtColor+inRange')
+    p_lut.add_argument('--width', type=int, default=1280)
+    p_lut.add_argument('--height', type=int, default=720)
+    p_lut.add_argument('--roi', type=int, default=320, help='lado do recorte (ROI) em pixels')
+    p_lut.add_argument('--repeat', type=int, default=50)
+    p_lut.set_defaults(func=bench_lut)
+
+    p_motion = sub.add_parser('motion', help='filtros/predição do cursor numa trajetória com ruído')
+    p_motion.add_argument('--latency-ms', type=float, default=30.0,
+                          help='atraso entre a captura e a detecção ficar pronta')
+    p_motion.add_argument('--noise', type=float, default=1.5, help='desvio do ruído da medição (px)')
+    p_motion.add_argument('--rate', type=float, default=240.0, help='taxa de saída do cursor (Hz)')
+    p_motion.add_argument('--frames', type=int, default=300)
+    p_motion.add_argument('--seed', type=int, default=0)
+    p_motion.set_defaults(func=bench_motion)
+
+    p_pipe = sub.add_parser('pipeline', help='loop serial vs pipeline em threads/processos')
+    p_pipe.add_argument('--resolution', default='1080p', help=f"({', '.join(RESOLUTIONS)})")
+    p_pipe.add_argument('--fps', type=float, default=60.0, help='taxa da fonte')
+    p_pipe.add_argument('--frames', type=int, default=600)
+    p_pipe.add_argument('--workers', type=int, default=2, help='threads de composição')
+    p_pipe.add_argument('--cv-threads', type=int, default=-1,
+                        help='cv2.setNumThreads (padrão: o do OpenCV)')
+    p_pipe.add_argument('--seed', type=int, default=0)
+    p_pipe.set_defaults(func=bench_pipeline)
+
+    p_mem = sub.add_parser('memory', help='memória alocada por frame: arrays novos vs buffers reaproveitados')
+    p_mem.add_argument('--resolution', default='720p', help=f"({', '.join(RESOLUTIONS)})")
+    p_mem.add_argument('--scenarios', default='steady,occlusion,distractors',
+                       help=f"lista separada por vírgula ({', '.join(SCENARIOS)})")
+    p_mem.add_argument('--frames', type=int, default=200)
+    p_mem.add_argument('--warmup', type=int, default=30)
+    p_mem.add_argument('--seed', type=int, default=0)
+    p_mem.add_argument('--classifier', choices=('hsv', 'lut'), default='hsv')
+    p_mem.add_argument('--color-model', choices=COLOR_MODELS, default='range',
+                       help='range HSV fixo ou histograma H-S com CamShift')
+    p_mem.add_argument('--flow-interval', type=int, default=0, metavar='N',
+                       help='detecção por cor a cada N frames, fluxo óptico entre elas (0 = desligado)')
+    p_mem.set_defaults(func=bench_memory)
+
+    p_prev = sub.add_parser('preview', help='custo da prévia da janela: cheia, reduzida, limitada e escondida')
+    p_prev.add_argument('--resolution', default='720p', help=f"({', '.join(RESOLUTIONS)})")
+    p_prev.add_argument('--scenario', default='occlusion', help=f"({', '.join(SCENARIOS)})")
+    p_prev.add_argument('--frames', type=int, default=300)
+    p_prev.add_argument('--fps', type=float, default=30.0, help='taxa da câmera simulada')
+    p_prev.add_argument('--preview-fps', type=float, default=15.0, help='limite da prévia no modo limitado')
+    p_prev.add_argument('--seed', type=int, default=0)
+    p_prev.set_defaults(func=bench_preview)
+
+    p_multi = sub.add_parser('multi', help='vários alvos: um Tracker por cor x MultiTracker')
+    p_multi.add_argument('--resolution', default='720p', help=f"({', '.join(RESOLUTIONS)})")
+    p_multi.add_argument('--scenarios', default='multi,hands,jump', help=f"({', '.join(SCENARIOS)})")
+    p_multi.add_argument('--targets', default='1,2,4,6', help='números de alvos, separados por vírgula')
+    p_multi.add_argument('--frames', type=int, default=300)
+    p_multi.add_argument('--seed', type=int, default=0)
+    p_multi.set_defaults(func=bench_multi)
+
+    p_jit = sub.add_parser('jitter', help='centro inteiro do bbox x centróide sub-pixel: erro, tremor e atraso')
+    p_jit.add_argument('--resolutions', default='480p,720p,1080p', help=f"({', '.join(RESOLUTIONS)})")
+    p_jit.add_argument('--scenarios', default='steady,noise,fast', help=f"({', '.join(SCENARIOS)})")
+    p_jit.add_argument('--screen', default='1920x1080', help='resolução da tela (LxA)')
+    p_jit.add_argument('--target-px', type=float, default=0.5, help='tremor aceitável na tela (px)')
+    p_jit.add_argument('--frames', type=int, default=300)
+    p_jit.add_argument('--seed', type=int, default=0)
+    p_jit.set_defaults(func=bench_jitter)
+
+    p_pub = sub.add_parser('publish', help='publicação para outros processos: entrega e latência (memória/UDP)')
+    p_pub.add_argument('--rates', default='120,500,1000,0', help='resultados/s, separados por vírgula (0 = máximo)')
+    p_pub.add_argument('--seconds', type=float, default=2.0, help='duração de cada taxa')
+    p_pub.add_argument('--count', type=int, default=20000, help='resultados na taxa máxima')
+    p_pub.add_argument('--slots', type=int, default=256, help='slots do anel em memória')
+    p_pub.add_argument('--poll-us', type=float, default=200, help='intervalo de leitura do consumidor do anel (µs)')
+    p_pub.add_argument('--port', type=int, default=DEFAULT_PORT)
+    p_pub.set_defaults(func=bench_publish)
+
+    p_inc = sub.add_parser('incremental', help='segmentação do zero x só os blocos que mudaram (incremental.py)')
+    p_inc.add_argument('--resolutions', default='720p,1080p', help=f"({', '.join(RESOLUTIONS)})")
+    p_inc.add_argument('--scenarios', default='steady,noise,fast,daylight', help=f"({', '.join(SCENARIOS)})")
+    p_inc.add_argument('--frames', type=int, default=300)
+    p_inc.add_argument('--seed', type=int, default=0)
+    p_inc.set_defaults(func=bench_incremental)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+CAPTURA DE FRAMES EM SEGUNDO PLANO
+Uma thread dedicada lê a câmera (ou vídeo / fonte sintética) continuamente e
+mantém apenas os frames mais novos, para que o loop de detecção nunca fique
+bloqueado em cap.read() nem processe frames atrasados.
+"""
+
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+# Frame capturado: número de sequência (monotônico, começa em 0), instante da
+# captura (time.perf_counter) e imagem BGR
+Frame = collections.namedtuple('Frame', ['seq', 'timestamp', 'image'])
+
+
+class SyntheticSource:
+    """
+    Fonte de frames sintética com a mesma interface básica do cv2.VideoCapture
+    (read/isOpened/get/set/release). Desenha um círculo colorido que se move
+    em órbita sobre um fundo escuro - útil para testes sem câmera.
+    """
+
+    def __init__(self, width=640, height=480, fps=30.0, color_bgr=(255, 0, 0),
+                 radius=30, num_frames=None, realtime=False):
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = float(fps)
+        self.color_bgr = tuple(int(c) for c in color_bgr)
+        self.radius = int(radius)
+        self.num_frames = num_frames
+        self.realtime = realtime
+        self._index = 0
+        self._opened = True
+        self._next_time = None
+        self._background = np.full((self.height, self.width, 3), 30, dtype=np.uint8)
+
+    def position(self, index):
+        """Posição (x, y) do centro do objeto no frame de índice `index`."""
+        t = index / self.fps
+        cx = self.width / 2.0 + (self.width / 3.0) * np.cos(t)
+        cy = self.height / 2.0 + (self.height / 3.0) * np.sin(t)
+        return int(round(cx)), int(round(cy))
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        if not self._opened or (self.num_frames is not None and self._index >= self.num_frames):
+            return False, None
+
+        if self.realtime:
+            # Simular o ritmo de uma câmera real
+            now = time.perf_counter()
+            if self._next_time is None:
+                self._next_time = now
+            if self._next_time > now:
+                time.sleep(self._next_time - now)
+            self._next_time += 1.0 / self.fps
+
+        frame = self._background.copy()
+        cv2.circle(frame, self.position(self._index), self.radius, self.color_bgr, -1)
+        self._index += 1
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.num_frames or 0)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._opened = False
+
+
+def open_source(source=0, width=None, height=None, fps=None):
+    """
+    Abre uma fonte de frames:
+      - int ou string numérica -> índice de câmera (cv2.VideoCapture)
+      - 'synthetic'            -> SyntheticSource
+      - pasta de sessão gravada -> recorder.ReplaySource (ritmo original)
+      - outra string           -> caminho de arquivo de vídeo
+      - objeto com read()      -> usado diretamente
+    Resolução e FPS só são aplicados a câmeras.
+    """
+    if hasattr(source, 'read'):
+        return source
+
+    if isinstance(source, str) and source.lower() == 'synthetic':
+        kwargs = {'realtime': True}
+        if width:
+            kwargs['width'] = width
+        if height:
+            kwargs['height'] = height
+        if fps:
+            kwargs['fps'] = fps
+        return SyntheticSource(**kwargs)
+
+    if isinstance(source, str) and os.path.isfile(os.path.join(source, 'session.json')):
+        from recorder import ReplaySource
+        return ReplaySource(source, realtime=True)
+
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+
+    cap = cv2.VideoCapture(source)
+    if isinstance(source, int) and cap.isOpened():
+        if width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            cap.set(cv2.CAP_PROP_FPS, fps)
+        cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
+        # Pedir ao driver o menor buffer possível (nem todos os backends suportam)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def open_source_async(source=0, **kwargs):
+    """
+    open_source numa thread: abrir uma câmera leva de centenas de ms a alguns
+    segundos (driver, negociação de formato), tempo que o programa usa para
+    se inicializar. Devolve um concurrent.futures.Future; result() espera a
+    fonte (e repassa a exceção, se houver).
+    """
+    future = concurrent.futures.Future()
+
+    def abrir():
+        try:
+            future.set_result(open_source(source, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=abrir, name='OpenSource', daemon=True).start()
+    return future
+
+
+class FrameGrabber:
+    """
+    Lê frames de uma fonte numa thread própria e guarda até `depth` frames.
+
+    Quando o buffer está cheio o frame MAIS ANTIGO é descartado (drop-oldest),
+    a menos que `block=True`, caso em que a thread de captura espera o consumidor
+    (útil para processar arquivos de vídeo sem perder frames).
+
+    read(latest=True) devolve sempre o frame mais novo e descarta os anteriores;
+    read(latest=False) devolve o mais antigo (ordem FIFO). Junto do frame é
+    devolvido quantos frames foram perdidos desde a última leitura.
+
+    `on_frame(frame)` é chamada na thread de captura para cada frame lido,
+    antes de ele entrar no buffer (ex.: SessionRecorder.store_frame).
+    """
+
+    def __init__(self, source, depth=1, block=False, on_frame=None):
+        if depth < 1:
+            raise ValueError('depth deve ser >= 1')
+        self.source = source
+        self.depth = int(depth)
+        self.block = block
+        self.on_frame = on_frame
+
+        self._buffer = collections.deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._eof = False
+        self._next_seq = 0
+        self._last_seq = -1
+
+        # Estatísticas
+        self.frames_captured = 0
+        self.frames_dropped = 0
+
+    @property
+    def eof(self):
+        """True quando a fonte terminou e não há mais frames no buffer."""
+        with self._cond:
+            return self._eof and not self._buffer
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='FrameGrabber', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            ret, image = self.source.read()
+            timestamp = time.perf_counter()
+            if not ret:
+                break
+            if self.on_frame is not None:
+                self.on_frame(Frame(self._next_seq, timestamp, image))
+
+            with self._cond:
+                if self.block:
+                    while self._running and len(self._buffer) >= self.depth:
+                        self._cond.wait()
+                    if not self._running:
+                        break
+                elif len(self._buffer) >= self.depth:
+                    # Descartar o mais antigo para abrir espaço para o mais novo
+                    self._buffer.popleft()
+
+                self._buffer.append(Frame(self._next_seq, timestamp, image))
+                self._next_seq += 1
+                self.frames_captured += 1
+                self._cond.notify_all()
+
+        with self._cond:
+            self._eof = True
+            self._cond.notify_all()
+
+    def read(self, timeout=None, latest=True):
+        """
+        Espera por um frame novo e devolve (frame, perdidos).
+        Devolve (None, 0) se a fonte terminou ou o timeout expirou.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._buffer or self._eof, timeout):
+                return None, 0
+            if not self._buffer:
+                return None, 0
+
+            if latest:
+                frame = self._buffer.pop()
+                self._buffer.clear()
+            else:
+                frame = self._buffer.popleft()
+            self._cond.notify_all()
+
+        # Perdidos = lacunas na sequência (descartes no buffer ou na leitura)
+        dropped = frame.seq - self._last_seq - 1
+        self._last_seq = frame.seq
+        self.frames_dropped += dropped
+        return frame, dropped
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def release(self):
+        """Para a thread e libera a fonte."""
+        self.stop()
+        try:
+            self.source.release()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.release()
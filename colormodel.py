@@ -0,0 +1,345 @@
+"""
+MODELO DE COR
+Ranges HSV com suporte a wraparound do Hue (vermelhos ficam dos dois lados
+de 0/180), classificador por tabela (LUT) BGR -> máscara, mapa de
+distância HSV para a busca por cores similares, histograma H-S para
+back-projection (HistogramModel) e classificação contra vários ranges numa
+passada só (LabelClassifier).
+
+Um range com lower[0] > upper[0] representa Hue "dando a volta":
+por exemplo H(172-8) aceita 172..179 e 0..8.
+"""
+
+import cv2
+import numpy as np
+
+
+# Hue no OpenCV vai de 0 a 179
+HUE_MAX = 180
+
+# Tolerância da busca por similares no nível t: base + crescimento * t (H, S, V)
+SIMILAR_BASE = (12, 45, 45)
+SIMILAR_GROWTH = (0.6, 2.0, 2.0)
+MAX_TOLERANCE = 120
+
+# Histograma H-S da back-projection: bins por canal e pisos de Saturação e
+# Valor (pixels quase cinza ou escuros têm Hue instável e ficam de fora)
+HIST_BINS = (30, 32)
+HIST_MIN_SATURATION = 40
+HIST_MIN_VALUE = 32
+
+
+def hsv_range(h, s, v, h_tol, s_tol, v_tol):
+    """
+    Range (lower, upper) uint8 ao redor de (h, s, v). O Hue dá a volta em 180
+    em vez de ser cortado; Saturação e Valor são limitados a 0..255.
+    """
+    h_tol, s_tol, v_tol = int(h_tol), int(s_tol), int(v_tol)
+    if 2 * h_tol + 1 >= HUE_MAX:
+        h_lower, h_upper = 0, HUE_MAX - 1
+    else:
+        h_lower = (int(h) - h_tol) % HUE_MAX
+        h_upper = (int(h) + h_tol) % HUE_MAX
+    lower = np.array([h_lower, max(0, int(s) - s_tol), max(0, int(v) - v_tol)], dtype=np.uint8)
+    upper = np.array([h_upper, min(255, int(s) + s_tol), min(255, int(v) + v_tol)], dtype=np.uint8)
+    return lower, upper
+
+
+def hue_wraps(lower, upper):
+    return int(lower[0]) > int(upper[0])
+
+
+def range_center(lower, upper):
+    """Cor referência (centro do range), respeitando o wraparound do Hue."""
+    h_lower, h_upper = int(lower[0]), int(upper[0])
+    if h_lower > h_upper:
+        h_upper += HUE_MAX
+    return np.array([
+        ((h_lower + h_upper) // 2) % HUE_MAX,
+        (int(lower[1]) + int(upper[1])) // 2,
+        (int(lower[2]) + int(upper[2])) // 2
+    ])
+
+
+def in_range(hsv, lower, upper, dst=None, scratch=None):
+    """
+    cv2.inRange que entende range de Hue com wraparound. `dst` e `scratch`
+    (buffers 2D uint8 do tamanho de hsv) evitam alocar as máscaras.
+    """
+    if not hue_wraps(lower, upper):
+        return cv2.inRange(hsv, lower, upper, dst=dst)
+    high = cv2.inRange(hsv, lower, np.array([HUE_MAX - 1, upper[1], upper[2]], dtype=np.uint8), dst=dst)
+    low = cv2.inRange(hsv, np.array([0, lower[1], lower[2]], dtype=np.uint8), upper, dst=scratch)
+    return cv2.bitwise_or(high, low, dst=high)
+
+
+def similar_tolerances(level):
+    """Tolerâncias (H, S, V) da busca por similares no nível `level`."""
+    return tuple(base + growth * level for base, growth in zip(SIMILAR_BASE, SIMILAR_GROWTH))
+
+
+def _tolerance_lut(hsv_ref):
+    """
+    Tabelas (uma por canal, 256 entradas uint8): para cada valor do canal, o
+    menor nível inteiro de tolerância que aceita esse valor (255 = nunca).
+    Como cada canal contribui de forma independente, o mapa é só cv2.LUT
+    por canal + máximo.
+    """
+    values = np.arange(256, dtype=np.float64)
+    luts = []
+    for c, (ref, base, growth) in enumerate(zip(hsv_ref, SIMILAR_BASE, SIMILAR_GROWTH)):
+        dist = np.abs(values - int(ref))
+        if c == 0:
+            dist = np.minimum(dist, HUE_MAX - dist)  # Hue circular
+        level = np.ceil((dist - base) / growth - 1e-9)
+        luts.append(np.clip(level, 0, 255).astype(np.uint8))
+    return luts
+
+
+_tolerance_luts = {}
+
+
+def _cached_tolerance_lut(hsv_ref):
+    key = tuple(int(c) for c in hsv_ref)
+    luts = _tolerance_luts.get(key)
+    if luts is None:
+        if len(_tolerance_luts) >= 64:
+            _tolerance_luts.clear()
+        luts = _tolerance_luts[key] = _tolerance_lut(key)
+    return luts
+
+
+def tolerance_map(hsv, hsv_ref, dst=None, channels=None):
+    """
+    Mapa de distância HSV ponderada até a cor referência: para cada pixel,
+    o menor nível (inteiro) de tolerância t em que ele entra no range da
+    busca por similares (|dH| <= 12 + 0.6t, |dS| <= 45 + 2t, |dV| <= 45 + 2t).
+    A distância do Hue é circular. Limiarizar o mapa em t (mapa <= t) dá a
+    mesma máscara que inRange com a tolerância t, sem reconverter o frame.
+    `channels` (três buffers 2D) recebe os canais separados; `dst`, o mapa.
+    """
+    luts = _cached_tolerance_lut(hsv_ref)
+    h, s, v = cv2.split(hsv, channels)
+    tmap = cv2.max(cv2.LUT(h, luts[0], dst=h), cv2.LUT(s, luts[1], dst=s), dst=dst)
+    return cv2.max(tmap, cv2.LUT(v, luts[2], dst=v), dst=tmap)
+
+
+def threshold_tolerance(tmap, level, dst=None):
+    """Máscara 0/255 dos pixels aceitos no nível (inteiro) de tolerância `level`."""
+    return cv2.compare(tmap, int(level), cv2.CMP_LE, dst=dst)
+
+
+def range_key(lower, upper):
+    return tuple(int(c) for c in lower) + tuple(int(c) for c in upper)
+
+
+def range_channels(lower, upper):
+    """Valores aceitos pelo range em cada canal: três vetores bool de 256 (H, S, V)."""
+    valores = np.arange(256)
+    if hue_wraps(lower, upper):
+        h = (valores >= int(lower[0])) | (valores <= int(upper[0]))
+    else:
+        h = (valores >= int(lower[0])) & (valores <= int(upper[0]))
+    return (h, (valores >= int(lower[1])) & (valores <= int(upper[1])),
+            (valores >= int(lower[2])) & (valores <= int(upper[2])))
+
+
+def similar_channels(hsv_ref, level):
+    """Valores aceitos em cada canal pela busca por similares no nível `level` (o critério de tolerance_map)."""
+    return tuple(lut <= int(level) for lut in _cached_tolerance_lut(hsv_ref))
+
+
+class LabelClassifier:
+    """
+    Classifica os pixels HSV contra vários ranges numa passada só: o range i
+    acende o bit i da imagem de rótulos (uint8 até 8 ranges, uint16 até 16). Cada canal
+    tem uma tabela de 256 entradas com os bits dos ranges que aceitam aquele
+    valor, e o rótulo é o E dos três canais: três cv2.LUT e dois bitwise_and,
+    qualquer que seja o número de ranges.
+    """
+
+    MAX_RANGES = 16
+
+    def __init__(self):
+        self.luts = None
+        self.dtype = np.uint8
+        self._key = None
+
+    def set_ranges(self, channels, key=None):
+        """
+        `channels`: por range, os valores aceitos em cada canal (range_channels
+        ou similar_channels; None = range desligado). Com a mesma `key` da
+        chamada anterior as tabelas não são remontadas.
+        """
+        if key is not None and key == self._key:
+            return
+        if len(channels) > self.MAX_RANGES:
+            raise ValueError(f'no máximo {self.MAX_RANGES} ranges por classificação')
+        dtype = np.uint8 if len(channels) <= 8 else np.uint16
+        luts = [np.zeros(256, dtype=dtype) for _ in range(3)]
+        for bit, aceitos in enumerate(channels):
+            if aceitos is None:
+                continue
+            for lut, canal in zip(luts, aceitos):
+                lut[canal] |= dtype(1 << bit)
+        self.luts = luts
+        self.dtype = dtype
+        self._key = key
+
+    def classify(self, hsv, dst=None, scratch=None, channels=None):
+        """
+        Imagem de rótulos (`dtype`) de `hsv`. `dst` e `scratch` (buffers 2D
+        de `dtype`) e `channels` (três buffers 2D uint8) evitam alocações.
+        """
+        h, s, v = cv2.split(hsv, channels)
+        rotulos = cv2.LUT(h, self.luts[0], dst=dst)
+        rotulos = cv2.bitwise_and(rotulos, cv2.LUT(s, self.luts[1], dst=scratch), dst=rotulos)
+        return cv2.bitwise_and(rotulos, cv2.LUT(v, self.luts[2], dst=scratch), dst=rotulos)
+
+
+# Bits por canal da grade BGR do ColorLUT: o formato BGR555 do OpenCV
+LUT_BITS = 5
+_lattice = None
+
+
+def _lattice_hsv():
+    """
+    Cor HSV do centro de cada célula BGR555, na ordem do índice: 128 linhas
+    (byte alto) x 256 colunas (byte baixo).
+    """
+    global _lattice
+    if _lattice is None:
+        shift = 8 - LUT_BITS
+        mask = (1 << LUT_BITS) - 1
+        cells = np.arange(1 << 3 * LUT_BITS)
+        centro = (1 << shift) >> 1
+        b, g, r = ((((cells >> k * LUT_BITS) & mask) << shift) + centro for k in range(3))
+        bgr = np.stack([b, g, r], axis=-1).astype(np.uint8).reshape(128, 256, 3)
+        _lattice = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    return _lattice
+
+
+class ColorLUT:
+    """
+    Classificador BGR -> máscara por tabela de consulta.
+
+    A cor BGR é quantizada em 5 bits por canal pelo cvtColor para BGR555, e
+    os dois bytes do pixel (alargados para int16) viram as coordenadas
+    (x, y) de um cv2.remap com INTER_NEAREST sobre uma tabela uint8 de
+    128 x 256 células (255 = dentro do range). Índice e consulta ficam no
+    OpenCV, sem passar por índices np.intp. A conversão HSV das células é
+    feita uma única vez; mudar a tolerância só refaz o teste de range sobre
+    essa grade, e as tabelas de cada range ficam em cache.
+
+    O índice de um recorte pode ser calculado uma vez (index) e aplicado a
+    vários ranges (classify) - cada máscara custa só um remap.
+    """
+
+    def __init__(self, cache_size=32):
+        self.cache_size = cache_size
+        self._lattice = _lattice_hsv()
+        self._tables = {}
+
+    def table(self, lower, upper):
+        """Tabela (uint8, 128 x 256, um byte por célula) do range; montada ou do cache."""
+        key = range_key(lower, upper)
+        table = self._tables.get(key)
+        if table is None:
+            table = in_range(self._lattice, lower, upper)
+            if len(self._tables) >= self.cache_size:
+                # Descartar a tabela mais antiga
+                self._tables.pop(next(iter(self._tables)))
+            self._tables[key] = table
+        return table
+
+    def set_range(self, lower, upper):
+        """Pré-monta a tabela do range (chamado na captura da cor)."""
+        self.table(lower, upper)
+
+    def clear(self):
+        self._tables.clear()
+
+    def index(self, bgr, out=None, packed=None):
+        """
+        Índice da célula de cada pixel: mapa int16 de 2 canais (byte baixo,
+        byte alto do BGR555), mesmo formato 2D de `bgr`. `out` (int16) e
+        `packed` (uint8), buffers 2D de 2 canais, evitam alocações.
+        """
+        packed = cv2.cvtColor(bgr, cv2.COLOR_BGR2BGR555, dst=packed)
+        if out is None:
+            return packed.astype(np.int16)
+        np.copyto(out, packed, casting='unsafe')
+        return out
+
+    def classify(self, idx, lower, upper, out=None):
+        """Máscara 0/255 de um índice já calculado (em `out`, se dado)."""
+        return cv2.remap(self.table(lower, upper), idx, None, cv2.INTER_NEAREST, dst=out)
+
+    def mask(self, bgr, lower, upper):
+        """Máscara 0/255 dos pixels BGR dentro do range HSV."""
+        return self.classify(self.index(bgr), lower, upper)
+
+
+class HistogramModel:
+    """
+    Modelo de cor aprendido: histograma 2D Hue x Saturação do objeto.
+
+    Em vez de um range fixo ao redor de um pixel, guarda a distribuição de
+    cores de uma região (o recorte ao redor do clique e, depois, detecções
+    confirmadas). Novas amostras entram por média exponencial com peso
+    `learning_rate`; a primeira define o histograma. back_project() dá, para
+    cada pixel, a probabilidade (0..255) de ele ser do objeto - o Valor fica
+    de fora, então sombras e reflexos mudam pouco a resposta.
+    """
+
+    def __init__(self, bins=HIST_BINS, min_saturation=HIST_MIN_SATURATION,
+                 min_value=HIST_MIN_VALUE, learning_rate=0.1):
+        self.bins = tuple(int(b) for b in bins)
+        self.min_saturation = int(min_saturation)
+        self.min_value = int(min_value)
+        self.learning_rate = learning_rate
+        self._floor = (np.array([0, self.min_saturation, self.min_value], dtype=np.uint8),
+                       np.array([HUE_MAX - 1, 255, 255], dtype=np.uint8))
+        self.reset()
+
+    def reset(self):
+        self.hist = None
+        self.samples = 0
+
+    @property
+    def ready(self):
+        return self.hist is not None
+
+    def load(self, hist):
+        """Usa um histograma já aprendido (perfil salvo). False se os bins não batem."""
+        hist = np.asarray(hist, dtype=np.float32)
+        if hist.shape != self.bins:
+            return False
+        self.hist = hist.copy()
+        self.samples = 1
+        return True
+
+    def valid_mask(self, hsv, dst=None):
+        """Pixels com Saturação e Valor acima dos pisos (Hue confiável)."""
+        return cv2.inRange(hsv, *self._floor, dst=dst)
+
+    def learn(self, hsv, mask=None):
+        """Acrescenta os pixels de `hsv` (restritos a `mask`) ao modelo. False se nenhum serviu."""
+        valid = self.valid_mask(hsv)
+        if mask is not None:
+            valid = cv2.bitwise_and(valid, mask)
+        if not cv2.countNonZero(valid):
+            return False
+        hist = cv2.calcHist([hsv], [0, 1], valid, list(self.bins), [0, HUE_MAX, 0, 256])
+        cv2.normalize(hist, hist, 0, 255, cv2.NORM_MINMAX)
+        if self.hist is not None:
+            hist = cv2.addWeighted(self.hist, 1.0 - self.learning_rate, hist, self.learning_rate, 0)
+            cv2.normalize(hist, hist, 0, 255, cv2.NORM_MINMAX)
+        self.hist = hist
+        self.samples += 1
+        return True
+
+    def back_project(self, hsv, dst=None, scratch=None):
+        """Mapa uint8 de probabilidade (0..255) de cada pixel ser do objeto (buffers opcionais)."""
+        prob = cv2.calcBackProject([hsv], [0, 1], self.hist, [0, HUE_MAX, 0, 256], 1, dst=dst)
+        return cv2.bitwise_and(prob, self.valid_mask(hsv, scratch), dst=prob)
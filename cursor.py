@@ -0,0 +1,414 @@
+"""
+SAÍDA DO CURSOR (backends de injeção + thread de despacho)
+O loop de detecção nunca chama a API do sistema diretamente: ele entrega
+movimentos e botões ao CursorDispatcher, que os aplica numa thread própria.
+
+Backends (BACKENDS):
+    'pyautogui' - multiplataforma (PAUSE zerado: o padrão dorme 0.1 s por chamada)
+    'win32'     - SendInput do Windows, direto por ctypes
+    'xtest'     - X11 XTest (python-xlib)
+    'uinput'    - dispositivo virtual do kernel Linux (python-evdev), funciona
+                  também no Wayland/console
+    'record'    - só grava os eventos em memória (testes e benchmarks)
+
+Todos recebem coordenadas de tela em pixels e botões 'left'/'right'.
+uinput e record não perguntam a resolução ao sistema: recebem `size` de
+quem os cria (make_backend) ou a do primeiro monitor conectado no sysfs
+(detect_screen_size).
+"""
+
+import collections
+import ctypes
+import glob
+import os
+import re
+import sys
+import threading
+import time
+
+
+# Resolução usada quando nem o backend nem o sistema informam a tela
+DEFAULT_SCREEN_SIZE = (1920, 1080)
+
+
+def parse_size(text):
+    """'LARGURAxALTURA' -> (largura, altura)."""
+    largura, _, altura = text.lower().partition('x')
+    return int(largura), int(altura)
+
+
+def detect_screen_size():
+    """
+    (largura, altura) do primeiro monitor conectado segundo o sysfs do Linux
+    (modo preferido do DRM, senão o framebuffer), ou None.
+    """
+    candidatos = []
+    for conector in sorted(glob.glob('/sys/class/drm/card*-*')):
+        try:
+            with open(os.path.join(conector, 'status')) as f:
+                if f.read().strip() != 'connected':
+                    continue
+        except OSError:
+            continue
+        candidatos.append(os.path.join(conector, 'modes'))
+    candidatos.append('/sys/class/graphics/fb0/virtual_size')
+    for caminho in candidatos:
+        try:
+            with open(caminho) as f:
+                achado = re.match(r'\s*(\d+)\D(\d+)', f.readline())
+        except OSError:
+            continue
+        if achado and int(achado.group(1)) > 0 and int(achado.group(2)) > 0:
+            return int(achado.group(1)), int(achado.group(2))
+    return None
+
+
+class CursorBackend:
+    """Interface dos backends. `click` padrão = botão abaixo + acima."""
+
+    name = 'base'
+    # True: o backend não consulta a tela e aceita `size` no construtor
+    needs_screen_size = False
+
+    def move(self, x, y):
+        raise NotImplementedError
+
+    def button(self, button, down):
+        raise NotImplementedError
+
+    def click(self, button='left'):
+        self.button(button, True)
+        self.button(button, False)
+
+    def screen_size(self):
+        return detect_screen_size() or DEFAULT_SCREEN_SIZE
+
+    def close(self):
+        pass
+
+
+class PyAutoGuiBackend(CursorBackend):
+    name = 'pyautogui'
+
+    def __init__(self):
+        import pyautogui
+        pyautogui.FAILSAFE = False
+        # Sem isso cada chamada dorme 0.1 s e o loop fica preso em ~10 fps
+        pyautogui.PAUSE = 0
+        self._gui = pyautogui
+
+    def move(self, x, y):
+        self._gui.moveTo(x, y, duration=0, _pause=False)
+
+    def button(self, button, down):
+        if down:
+            self._gui.mouseDown(button=button, _pause=False)
+        else:
+            self._gui.mouseUp(button=button, _pause=False)
+
+    def click(self, button='left'):
+        self._gui.click(button=button, _pause=False)
+
+    def screen_size(self):
+        return tuple(self._gui.size())
+
+
+class _MOUSEINPUT(ctypes.Structure):
+    _fields_ = [('dx', ctypes.c_long), ('dy', ctypes.c_long), ('mouseData', ctypes.c_ulong),
+                ('dwFlags', ctypes.c_ulong), ('time', ctypes.c_ulong),
+                ('dwExtraInfo', ctypes.POINTER(ctypes.c_ulong))]
+
+
+class _INPUT(ctypes.Structure):
+    class _U(ctypes.Union):
+        # O union real também tem KEYBDINPUT/HARDWAREINPUT; MOUSEINPUT é o maior
+        _fields_ = [('mi', _MOUSEINPUT)]
+    _anonymous_ = ('u',)
+    _fields_ = [('type', ctypes.c_ulong), ('u', _U)]
+
+
+class Win32Backend(CursorBackend):
+    """SendInput com coordenadas absolutas normalizadas (0..65535) na área de trabalho virtual."""
+
+    name = 'win32'
+    INPUT_MOUSE = 0
+    MOUSEEVENTF_MOVE = 0x0001
+    MOUSEEVENTF_ABSOLUTE = 0x8000
+    MOUSEEVENTF_VIRTUALDESK = 0x4000
+    FLAGS = {('left', True): 0x0002, ('left', False): 0x0004,
+             ('right', True): 0x0008, ('right', False): 0x0010}
+
+    def __init__(self):
+        self._user32 = ctypes.windll.user32
+        # Tamanho em pixels físicos mesmo com escala de DPI
+        try:
+            self._user32.SetProcessDPIAware()
+        except Exception:
+            pass
+        # Área de trabalho virtual (todos os monitores)
+        self._origin = (self._user32.GetSystemMetrics(76), self._user32.GetSystemMetrics(77))
+        self._virtual = (self._user32.GetSystemMetrics(78), self._user32.GetSystemMetrics(79))
+
+    def _send(self, flags, dx=0, dy=0):
+        entrada = _INPUT(type=self.INPUT_MOUSE)
+        entrada.mi = _MOUSEINPUT(dx, dy, 0, flags, 0, None)
+        self._user32.SendInput(1, ctypes.byref(entrada), ctypes.sizeof(_INPUT))
+
+    def move(self, x, y):
+        (ox, oy), (vw, vh) = self._origin, self._virtual
+        dx = int(round((x - ox) * 65535 / max(1, vw - 1)))
+        dy = int(round((y - oy) * 65535 / max(1, vh - 1)))
+        self._send(self.MOUSEEVENTF_MOVE | self.MOUSEEVENTF_ABSOLUTE | self.MOUSEEVENTF_VIRTUALDESK, dx, dy)
+
+    def button(self, button, down):
+        self._send(self.FLAGS[(button, down)])
+
+    def screen_size(self):
+        return self._user32.GetSystemMetrics(0), self._user32.GetSystemMetrics(1)
+
+
+class XTestBackend(CursorBackend):
+    name = 'xtest'
+    BUTTONS = {'left': 1, 'right': 3}
+
+    def __init__(self):
+        from Xlib import X, display
+        from Xlib.ext import xtest
+        self._X = X
+        self._xtest = xtest
+        self._display = display.Display()
+        self._screen = self._display.screen()
+
+    def move(self, x, y):
+        self._xtest.fake_input(self._display, self._X.MotionNotify, x=int(x), y=int(y))
+        self._display.flush()
+
+    def button(self, button, down):
+        tipo = self._X.ButtonPress if down else self._X.ButtonRelease
+        self._xtest.fake_input(self._display, tipo, self.BUTTONS[button])
+        self._display.flush()
+
+    def screen_size(self):
+        return self._screen.width_in_pixels, self._screen.height_in_pixels
+
+    def close(self):
+        self._display.close()
+
+
+class UInputBackend(CursorBackend):
+    """
+    Tablet virtual (eixos absolutos) via /dev/uinput. Requer permissão de
+    escrita em /dev/uinput (grupo `input` ou regra udev). Os eixos vão de 0
+    a `size` - 1: com a resolução errada o cursor não alcança a borda (ou
+    passa do ponto), então `size` deve ser a da tela real.
+    """
+
+    name = 'uinput'
+    needs_screen_size = True
+
+    def __init__(self, size=None):
+        import evdev
+        from evdev import ecodes
+        self._ecodes = ecodes
+        w, h = size or detect_screen_size() or DEFAULT_SCREEN_SIZE
+        self._size = (int(w), int(h))
+        caps = {
+            ecodes.EV_KEY: [ecodes.BTN_LEFT, ecodes.BTN_RIGHT],
+            ecodes.EV_ABS: [(ecodes.ABS_X, evdev.AbsInfo(0, 0, self._size[0] - 1, 0, 0, 0)),
+                            (ecodes.ABS_Y, evdev.AbsInfo(0, 0, self._size[1] - 1, 0, 0, 0))],
+        }
+        self._device = evdev.UInput(caps, name='wave-virtual-mouse')
+        self.BUTTONS = {'left': ecodes.BTN_LEFT, 'right': ecodes.BTN_RIGHT}
+
+    def move(self, x, y):
+        e = self._ecodes
+        self._device.write(e.EV_ABS, e.ABS_X, int(x))
+        self._device.write(e.EV_ABS, e.ABS_Y, int(y))
+        self._device.syn()
+
+    def button(self, button, down):
+        self._device.write(self._ecodes.EV_KEY, self.BUTTONS[button], 1 if down else 0)
+        self._device.syn()
+
+    def screen_size(self):
+        return self._size
+
+    def close(self):
+        self._device.close()
+
+
+class RecordingBackend(CursorBackend):
+    """Grava (timestamp, 'move'|'down'|'up', dados) em `events`. Não toca no sistema."""
+
+    name = 'record'
+    needs_screen_size = True
+
+    def __init__(self, size=None):
+        w, h = size or detect_screen_size() or DEFAULT_SCREEN_SIZE
+        self._size = (int(w), int(h))
+        self.events = []
+        self._lock = threading.Lock()
+
+    def _record(self, kind, data):
+        with self._lock:
+            self.events.append((time.perf_counter(), kind, data))
+
+    def move(self, x, y):
+        self._record('move', (x, y))
+
+    def button(self, button, down):
+        self._record('down' if down else 'up', button)
+
+    def screen_size(self):
+        return self._size
+
+
+BACKENDS = {
+    'pyautogui': PyAutoGuiBackend,
+    'win32': Win32Backend,
+    'xtest': XTestBackend,
+    'uinput': UInputBackend,
+    'record': RecordingBackend,
+}
+
+
+def _create(name, size):
+    cls = BACKENDS[name]
+    return cls(size) if cls.needs_screen_size else cls()
+
+
+def make_backend(name='auto', size=None):
+    """
+    Cria o backend `name`. 'auto' escolhe win32 no Windows, xtest com X11,
+    uinput no Linux sem X e, por último, pyautogui. `size` (largura, altura)
+    vai para os backends que não consultam a tela (uinput, record).
+    """
+    if name != 'auto':
+        return _create(name, size)
+    if sys.platform == 'win32':
+        ordem = ('win32', 'pyautogui')
+    elif os.environ.get('DISPLAY'):
+        ordem = ('xtest', 'pyautogui', 'uinput')
+    else:
+        ordem = ('uinput', 'pyautogui')
+    erros = []
+    for nome in ordem:
+        try:
+            return _create(nome, size)
+        except Exception as e:
+            erros.append(f'{nome}: {e}')
+    raise RuntimeError('nenhum backend de cursor disponível (' + '; '.join(erros) + ')')
+
+
+class CursorDispatcher:
+    """
+    Aplica os comandos do cursor numa thread própria; move/press/release/click
+    só enfileiram e voltam na hora.
+
+    A fila mantém a ordem de chegada. Movimentos seguidos são fundidos no
+    mais novo (o cursor pula direto para a última posição); eventos de botão
+    nunca são fundidos nem descartados, e um movimento enfileirado antes de
+    um clique é aplicado antes dele.
+
+    `tap(kind, data)` (opcional) recebe cada comando na hora em que é
+    enfileirado: ('move', (x, y)) ou ('down'/'up'/'click', botão).
+    """
+
+    def __init__(self, backend, tap=None):
+        self.backend = backend
+        self.tap = tap
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self.held = set()            # botões pressionados (para soltar ao fechar)
+        self.moves_coalesced = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name='CursorDispatcher', daemon=True)
+        self._thread.start()
+
+    def screen_size(self):
+        return self.backend.screen_size()
+
+    def move(self, x, y):
+        if self.tap is not None:
+            self.tap('move', (x, y))
+        with self._cond:
+            if self._queue and self._queue[-1][0] == 'move':
+                self._queue[-1] = ('move', (x, y))
+                self.moves_coalesced += 1
+            else:
+                self._queue.append(('move', (x, y)))
+            self._cond.notify()
+
+    def _button(self, kind, button):
+        if self.tap is not None:
+            self.tap(kind, button)
+        with self._cond:
+            if kind == 'down':
+                self.held.add(button)
+            elif kind == 'up':
+                self.held.discard(button)
+            self._queue.append((kind, button))
+            self._cond.notify()
+
+    def press(self, button='left'):
+        self._button('down', button)
+
+    def release(self, button='left'):
+        self._button('up', button)
+
+    def click(self, button='left'):
+        self._button('click', button)
+
+    def release_all(self):
+        """Solta qualquer botão que tenha ficado pressionado."""
+        for button in list(self.held):
+            self.release(button)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._busy = False
+                    self._cond.notify_all()
+                    self._cond.wait()
+                if not self._queue:
+                    self._busy = False
+                    self._cond.notify_all()
+                    return
+                kind, data = self._queue.popleft()
+                self._busy = True
+            try:
+                if kind == 'move':
+                    self.backend.move(*data)
+                elif kind == 'click':
+                    self.backend.click(data)
+                else:
+                    self.backend.button(data, kind == 'down')
+            except Exception:
+                # Uma falha do sistema não pode derrubar o loop; segue com o próximo
+                self.errors += 1
+
+    def flush(self, timeout=1.0):
+        """Espera a fila esvaziar. Retorna False se o tempo acabou."""
+        fim = time.perf_counter() + timeout
+        with self._cond:
+            while self._queue or self._busy:
+                resta = fim - time.perf_counter()
+                if resta <= 0:
+                    return False
+                self._cond.wait(resta)
+        return True
+
+    def close(self, timeout=1.0):
+        """Solta os botões pressionados, esvazia a fila e encerra a thread."""
+        self.release_all()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        try:
+            self.backend.close()
+        except Exception:
+            pass
@@ -0,0 +1,510 @@
+"""
+DETECÇÃO POR COR RESTRITA A UMA JANELA (ROI)
+Conversão HSV, máscara, morfologia e contornos rodam apenas numa janela ao
+redor da posição prevista do objeto. O frame da câmera NÃO é espelhado: as
+coordenadas são mapeadas entre o frame cru e o frame exibido (espelhado).
+
+Quando o objeto está perdido, a busca no frame inteiro é feita em pirâmide:
+candidatos numa versão reduzida (1/4 ou 1/8) e refinamento em resolução cheia.
+Áreas, raios e kernel são definidos para 1280x720 e escalados para a
+resolução real da câmera.
+
+Com um modelo de histograma (colormodel.HistogramModel), o objeto também
+pode ser seguido por back-projection + CamShift dentro da janela
+(find_object_camshift), sem máscara binária, morfologia nem contornos.
+
+Com um workspace.Workspace, os intermediários (recorte reduzido, HSV,
+máscaras, mapa de distância, back-projection) vão para buffers
+reaproveitados entre frames em vez de arrays novos.
+
+O objeto de cada máscara sai dos momentos do maior contorno (blobs.py):
+posição = centróide sub-pixel (floats), não o centro inteiro do bbox.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+import blobs
+from colormodel import MAX_TOLERANCE, in_range, threshold_tolerance, tolerance_map
+from instrumentation import PROFILER
+
+
+# Resolução de referência: áreas e distâncias abaixo valem para 1280x720
+REFERENCE_SIZE = (1280, 720)
+
+# Áreas mínimas (pixels na resolução de referência) para aceitar um contorno
+MIN_AREA_EXACT = 100
+MIN_AREA_SIMILAR = 70
+
+# Largura mínima da imagem reduzida usada para achar candidatos
+COARSE_WIDTH = 240
+
+# Kernels da limpeza morfológica, criados uma vez por tamanho
+_kernels = {}
+
+# Limpeza morfológica: abertura + fechamento, só abertura, ou nenhuma
+MORPHOLOGY_MODES = ('full', 'open', 'none')
+
+# CamShift: até 10 iterações ou deslocamento < 1 px
+CAMSHIFT_CRITERIA = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 1)
+
+# Confiança mínima do CamShift: probabilidade média (0..1) dentro da janela final
+CAMSHIFT_MIN_CONFIDENCE = 0.25
+
+
+def area_scale(frame_w, frame_h):
+    """Fator para converter áreas da resolução de referência para a real."""
+    return (frame_w * frame_h) / float(REFERENCE_SIZE[0] * REFERENCE_SIZE[1])
+
+
+def scaled_area(area, frame_w, frame_h):
+    """Área (px de referência) convertida para pixels do frame real."""
+    return area * area_scale(frame_w, frame_h)
+
+
+def scaled_length(length, frame_w):
+    """Distância (px de referência) convertida para pixels do frame real."""
+    return int(round(length * frame_w / float(REFERENCE_SIZE[0])))
+
+
+def morph_kernel(frame_w):
+    """Kernel 3x3 em 1280 px de largura, crescendo (sempre ímpar) com a resolução."""
+    size = max(3, scaled_length(3, frame_w) | 1)
+    kernel = _kernels.get(size)
+    if kernel is None:
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+        _kernels[size] = kernel
+    return kernel
+
+
+def search_window(center, radius, frame_w, frame_h):
+    """
+    Janela (x0, y0, x1, y1) de lado 2*radius ao redor de `center`, recortada
+    aos limites do frame. Coordenadas do frame exibido (espelhado).
+    """
+    cx, cy = center
+    radius = int(round(radius))
+    x0 = max(0, int(cx) - radius)
+    x1 = min(frame_w, int(cx) + radius)
+    y0 = max(0, int(cy) - radius)
+    y1 = min(frame_h, int(cy) + radius)
+    return x0, y0, x1, y1
+
+
+def tracking_window(center, search_rad, last_area, frame_w, frame_h):
+    """
+    Janela de rastreamento: raio de busca (quanto o objeto pode ter andado)
+    mais o tamanho aparente do objeto, estimado pela última área.
+    """
+    margin = math.sqrt(max(0, last_area))
+    return search_window(center, search_rad + margin, frame_w, frame_h)
+
+
+class RoiFrame:
+    """
+    Recorte de um frame BGR cru (não espelhado) correspondente a uma janela do
+    frame exibido. O HSV é calculado uma única vez, sob demanda, e reaproveitado
+    por todas as buscas do frame (exata e similar).
+
+    Com um `classifier` (ColorLUT) as máscaras saem da tabela BGR -> máscara:
+    o índice do recorte é calculado uma vez e cada range custa um remap.
+
+    Com `scale` < 1 o recorte é reduzido antes de tudo (menos pixels para
+    converter e filtrar); posições, bbox e áreas devolvidas continuam em
+    pixels do frame cheio. `morphology` escolhe a limpeza (MORPHOLOGY_MODES).
+
+    Com `workspace`, os intermediários usam os buffers `slot`.* dele: dois
+    RoiFrames vivos ao mesmo tempo precisam de slots diferentes.
+
+    Com `cache` (incremental.SegmentationCache já atualizado com este frame)
+    e scale 1, o HSV e a máscara vêm dos blocos do cache: só os que mudaram
+    são reconvertidos. Os arrays devolvidos são views do cache (só leitura).
+    """
+
+    def __init__(self, frame, window=None, mirror=True, classifier=None, scale=1.0, morphology='full',
+                 workspace=None, slot='roi', cache=None):
+        self.frame = frame
+        self.workspace = workspace
+        self.slot = slot
+        self.classifier = classifier
+        self.scale = min(1.0, float(scale))
+        self.morphology = morphology
+        self.frame_h, self.frame_w = frame.shape[:2]
+        self.mirror = mirror
+        if window is None:
+            window = (0, 0, self.frame_w, self.frame_h)
+        self.window = window
+
+        x0, y0, x1, y1 = window
+        if mirror:
+            # Coluna x exibida corresponde à coluna (w - 1 - x) do frame cru
+            x0, x1 = self.frame_w - x1, self.frame_w - x0
+        self.raw_window = (x0, y0, x1, y1)
+        self.area_scale = area_scale(self.frame_w, self.frame_h)
+        self.kernel = morph_kernel(int(self.frame_w * self.scale))
+        self.cache = cache if cache is not None and cache.frame is frame and self.scale == 1.0 else None
+        self._bgr = None
+        self._hsv = None
+        self._lut_index = None
+        self._tmap = None
+        self._tmap_ref = None
+        self._prob = None
+        self._prob_model = None
+
+    def buffer(self, name, shape, dtype=np.uint8):
+        """Buffer de saída `name` (None sem workspace: o OpenCV aloca)."""
+        if self.workspace is None:
+            return None
+        return self.workspace.array(f'{self.slot}.{name}', shape, dtype)
+
+    @property
+    def empty(self):
+        x0, y0, x1, y1 = self.raw_window
+        return x1 <= x0 or y1 <= y0
+
+    @property
+    def full_frame(self):
+        return self.window == (0, 0, self.frame_w, self.frame_h)
+
+    @property
+    def bgr(self):
+        if self._bgr is None:
+            x0, y0, x1, y1 = self.raw_window
+            self._bgr = self.frame[y0:y1, x0:x1]
+            if self.scale < 1.0 and not self.empty:
+                size = (max(1, int(round((x1 - x0) * self.scale))), max(1, int(round((y1 - y0) * self.scale))))
+                self._bgr = cv2.resize(self._bgr, size, dst=self.buffer('bgr', size[::-1] + (3,)),
+                                       interpolation=cv2.INTER_AREA)
+        return self._bgr
+
+    @property
+    def hsv(self):
+        if self._hsv is None:
+            t0 = PROFILER.tic()
+            if self.cache is not None:
+                self._hsv = self.cache.hsv(self.raw_window)
+            else:
+                self._hsv = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV, dst=self.buffer('hsv', self.bgr.shape))
+            PROFILER.toc('hsv', t0)
+        return self._hsv
+
+    def classify(self, lower, upper):
+        """Máscara crua (sem limpeza) dos pixels dentro do range HSV."""
+        shape = self.bgr.shape[:2]
+        if self.classifier is not None:
+            t0 = PROFILER.tic()
+            if self._lut_index is None:
+                self._lut_index = self.classifier.index(self.bgr, self.buffer('lut_index', shape + (2,), np.int16),
+                                                        self.buffer('lut_packed', shape + (2,)))
+            mask = self.classifier.classify(self._lut_index, lower, upper, self.buffer('mask', shape))
+        elif self.cache is not None:
+            t0 = PROFILER.tic()
+            mask = self.cache.mask(self.raw_window, lower, upper)
+        else:
+            hsv = self.hsv
+            t0 = PROFILER.tic()
+            mask = in_range(hsv, lower, upper, self.buffer('mask', shape), self.buffer('mask_scratch', shape))
+        PROFILER.toc('mask', t0)
+        return mask
+
+    def tolerance_map(self, hsv_ref):
+        """Mapa de distância até hsv_ref (calculado uma vez por referência)."""
+        ref = tuple(int(c) for c in hsv_ref)
+        if self._tmap is None or self._tmap_ref != ref:
+            shape = self.hsv.shape[:2]
+            canais = None if self.workspace is None else [self.buffer(c, shape) for c in 'hsv']
+            self._tmap = tolerance_map(self.hsv, ref, self.buffer('tmap', shape), canais)
+            self._tmap_ref = ref
+        return self._tmap
+
+    def back_project(self, model):
+        """Probabilidade (0..255) de cada pixel do recorte pelo HistogramModel (uma vez por modelo)."""
+        if self._prob is None or self._prob_model is not model:
+            t0 = PROFILER.tic()
+            shape = self.hsv.shape[:2]
+            self._prob = model.back_project(self.hsv, self.buffer('prob', shape), self.buffer('valid', shape))
+            self._prob_model = model
+            PROFILER.toc('backproject', t0)
+        return self._prob
+
+    def clean(self, mask):
+        """Limpeza morfológica (abertura + fechamento, conforme `morphology`)."""
+        if self.morphology == 'none':
+            return mask
+        t0 = PROFILER.tic()
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=self.buffer('clean', mask.shape))
+        if self.morphology == 'full':
+            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.kernel, dst=mask)
+        PROFILER.toc('morphology', t0)
+        return mask
+
+    def mask(self, lower, upper):
+        """Máscara limpa (abertura + fechamento) dos pixels dentro do range HSV."""
+        return self.clean(self.classify(lower, upper))
+
+    def to_display(self, bbox):
+        """Converte um bbox local do recorte para coordenadas do frame exibido."""
+        x, y, w_box, h_box = bbox
+        if self.scale < 1.0:
+            s = self.scale
+            x, y = int(x / s), int(y / s)
+            w_box, h_box = int(round(w_box / s)), int(round(h_box / s))
+        rx0, ry0 = self.raw_window[0], self.raw_window[1]
+        x_raw = rx0 + x
+        if self.mirror:
+            x_disp = self.frame_w - (x_raw + w_box)
+        else:
+            x_disp = x_raw
+        return x_disp, ry0 + y, w_box, h_box
+
+    def to_local(self, bbox):
+        """
+        Converte um bbox do frame exibido para coordenadas locais do recorte
+        (o inverso de to_display), cortado aos limites do recorte.
+        """
+        x, y, w_box, h_box = bbox
+        rx0, ry0 = self.raw_window[0], self.raw_window[1]
+        x_raw = self.frame_w - (x + w_box) if self.mirror else x
+        s = self.scale
+        local_h, local_w = self.bgr.shape[:2]
+        x0 = min(max(0, int((x_raw - rx0) * s)), local_w)
+        y0 = min(max(0, int((y - ry0) * s)), local_h)
+        x1 = min(max(0, int(math.ceil((x_raw + w_box - rx0) * s))), local_w)
+        y1 = min(max(0, int(math.ceil((y + h_box - ry0) * s))), local_h)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def point_to_display(self, x, y):
+        """Ponto (float, em índices de pixel) local do recorte -> frame exibido."""
+        s = self.scale
+        x_raw = self.raw_window[0] + (x + 0.5) / s - 0.5
+        if self.mirror:
+            x_raw = self.frame_w - 1 - x_raw
+        return x_raw, self.raw_window[1] + (y + 0.5) / s - 0.5
+
+    def blob(self, mask, min_area):
+        """
+        Maior contorno da máscara com área > min_area (pixels reais) como
+        blobs.BlobStats no frame exibido (centróide sub-pixel, bbox, área,
+        orientação), ou None.
+        """
+        t0 = PROFILER.tic()
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        s2 = self.scale * self.scale
+        stats = blobs.largest(contours, min_area * s2)
+        if stats is not None:
+            angulo = -stats.angle if self.mirror else stats.angle
+            stats = blobs.BlobStats(self.point_to_display(*stats.position), self.to_display(stats.bbox),
+                              stats.area / s2, angulo)
+        PROFILER.toc('contours', t0)
+        return stats
+
+    def largest_blob(self, mask, min_area):
+        """
+        Maior contorno da máscara com área > min_area (pixels reais).
+        Retorna (posição, bbox, área) no frame exibido ou (None, None, None);
+        a posição é o centróide sub-pixel (floats).
+        """
+        stats = self.blob(mask, min_area)
+        if stats is None:
+            return None, None, None
+        return stats.position, stats.bbox, stats.area
+
+    def detect(self, lower, upper, min_area=MIN_AREA_EXACT):
+        """Máscara + maior contorno num só passo (min_area em px de referência)."""
+        if self.empty:
+            return None, None, None
+        return self.largest_blob(self.mask(lower, upper), min_area * self.area_scale)
+
+
+def mirror_window(window, frame_w):
+    """Converte uma janela entre coordenadas do frame cru e do espelhado."""
+    x0, y0, x1, y1 = window
+    return frame_w - x1, y0, frame_w - x0, y1
+
+
+def pyramid_factor(frame_w, coarse_width=COARSE_WIDTH):
+    """Maior redução em potência de 2 que mantém a largura >= coarse_width."""
+    factor = 1
+    while frame_w // (factor * 2) >= coarse_width:
+        factor *= 2
+    return factor
+
+
+def find_object_pyramid(frame, hsv_color, mirror=True, min_area=MIN_AREA_EXACT,
+                        factor=None, max_candidates=3, classifier=None, workspace=None):
+    """
+    Busca no frame inteiro do grosso para o fino:
+    1. candidatos na imagem reduzida (HSV + inRange, sem morfologia)
+    2. refinamento de centro/bbox em resolução cheia numa janela pequena
+       ao redor de cada candidato (os maiores primeiro)
+    Com `workspace`, usa os slots 'coarse' e 'candidate' dele.
+    Retorna (posição, bbox, área) no frame exibido ou (None, None, None)
+    """
+    lower, upper = hsv_color
+    frame_h, frame_w = frame.shape[:2]
+    if factor is None:
+        factor = pyramid_factor(frame_w)
+    if factor <= 1:
+        return RoiFrame(frame, None, mirror, classifier, workspace=workspace,
+                        slot='candidate').detect(lower, upper, min_area)
+
+    t0 = PROFILER.tic()
+    size = (frame_w // factor, frame_h // factor)
+    small = None if workspace is None else workspace.array('coarse.frame', size[::-1] + frame.shape[2:])
+    small = cv2.resize(frame, size, dst=small, interpolation=cv2.INTER_AREA)
+    coarse = RoiFrame(small, None, False, classifier, workspace=workspace, slot='coarse').classify(lower, upper)
+    contours, _ = cv2.findContours(coarse, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    PROFILER.toc('pyramid', t0)
+    if not contours:
+        return None, None, None
+
+    # Na imagem reduzida as bordas misturam cores: aceitar candidatos com metade da área
+    coarse_min = 0.5 * scaled_area(min_area, frame_w, frame_h) / (factor * factor)
+    candidates = []
+    for contour in contours:
+        x, y, w_box, h_box = cv2.boundingRect(contour)
+        if w_box * h_box >= coarse_min:
+            candidates.append((w_box * h_box, (x, y, w_box, h_box)))
+    candidates.sort(key=lambda c: c[0], reverse=True)
+
+    best = (None, None, None)
+    for _, (x, y, w_box, h_box) in candidates[:max_candidates]:
+        # Janela em resolução cheia com margem de dois pixels da imagem reduzida
+        raw = (max(0, (x - 2) * factor), max(0, (y - 2) * factor),
+               min(frame_w, (x + w_box + 2) * factor), min(frame_h, (y + h_box + 2) * factor))
+        janela = mirror_window(raw, frame_w) if mirror else raw
+        pos, bbox, area = RoiFrame(frame, janela, mirror, classifier, workspace=workspace,
+                                   slot='candidate').detect(lower, upper, min_area)
+        if pos is not None and (best[2] is None or area > best[2]):
+            best = (pos, bbox, area)
+    return best
+
+
+def hsv_at(frame, x, y, mirror=True):
+    """Valor HSV (ints) do pixel (x, y) do frame exibido, convertendo só esse pixel."""
+    if mirror:
+        x = frame.shape[1] - 1 - x
+    pixel = cv2.cvtColor(frame[y:y + 1, x:x + 1], cv2.COLOR_BGR2HSV)
+    return tuple(int(c) for c in pixel[0, 0])
+
+
+def hsv_patch_at(frame, x, y, radius, mirror=True):
+    """Recorte HSV (2*radius+1 de lado, cortado nas bordas) ao redor do pixel (x, y) do frame exibido."""
+    frame_h, frame_w = frame.shape[:2]
+    if mirror:
+        x = frame_w - 1 - x
+    radius = int(radius)
+    patch = frame[max(0, y - radius):min(frame_h, y + radius + 1),
+                  max(0, x - radius):min(frame_w, x + radius + 1)]
+    return cv2.cvtColor(patch, cv2.COLOR_BGR2HSV)
+
+
+def find_object_camshift(roi, model, bbox, min_area=MIN_AREA_EXACT,
+                         min_confidence=CAMSHIFT_MIN_CONFIDENCE):
+    """
+    Segue o objeto por back-projection + CamShift dentro do ROI, partindo do
+    bbox anterior (frame exibido). Sem máscara binária, morfologia nem
+    contornos: só a back-projection do recorte e algumas iterações de
+    mean-shift.
+
+    confiança = probabilidade média (0..1) dentro da janela final; área =
+    massa da back-projection (pixels "cheios" equivalentes, px reais).
+    Retorna (posição, bbox, área, confiança, caixa girada) ou cinco None.
+    A caixa girada é ((cx, cy), (w, h), ângulo) no frame exibido.
+    """
+    vazio = (None, None, None, None, None)
+    if roi.empty:
+        return vazio
+    prob = roi.back_project(model)
+    janela = roi.to_local(bbox)
+    if janela[2] <= 0 or janela[3] <= 0:
+        # Objeto anterior fora do recorte: começar do recorte inteiro
+        janela = (0, 0, prob.shape[1], prob.shape[0])
+
+    t0 = PROFILER.tic()
+    caixa, (x, y, w_box, h_box) = cv2.CamShift(prob, janela, CAMSHIFT_CRITERIA)
+    PROFILER.toc('camshift', t0)
+    if w_box <= 0 or h_box <= 0:
+        return vazio
+
+    massa = float(cv2.sumElems(prob[y:y + h_box, x:x + w_box])[0]) / 255.0
+    confianca = massa / (w_box * h_box)
+    s2 = roi.scale * roi.scale
+    area = massa / s2
+    if confianca < min_confidence or area <= min_area * roi.area_scale:
+        return vazio
+
+    (cx, cy), (cw, ch), angulo = caixa
+    cx, cy = roi.point_to_display(cx, cy)
+    if roi.mirror:
+        angulo = -angulo
+    caixa = ((cx, cy), (cw / roi.scale, ch / roi.scale), angulo)
+    bbox = roi.to_display((x, y, w_box, h_box))
+    return (cx, cy), bbox, area, confianca, caixa
+
+
+def find_object_near_position(roi, hsv_color):
+    """
+    Procura pelo objeto com a cor exata dentro da janela do ROI
+    Retorna (posição, bbox, área) ou (None, None, None)
+    """
+    lower, upper = hsv_color
+    return roi.detect(lower, upper, MIN_AREA_EXACT)
+
+
+def find_similar_object_fast(roi, hsv_ref, tolerance_increase=0):
+    """
+    Busca por objetos SIMILARES ao referência em tempo real
+    Tolerância: H 12 + 0.6t, S/V 45 + 2t (Hue circular, sem cortar vermelhos)
+    A máscara sai do limiar do mapa de distância do ROI - o frame não é
+    reconvertido nem refiltrado para cada nível de tolerância.
+    """
+    if roi.empty:
+        return None, None, None
+    tmap = roi.tolerance_map(hsv_ref)
+    mask = roi.clean(threshold_tolerance(tmap, tolerance_increase, roi.buffer('similar', tmap.shape)))
+    # Limiar MUITO menor para pegar similares pequenos
+    min_area = MIN_AREA_SIMILAR * roi.area_scale
+    if cv2.countNonZero(mask) <= min_area * roi.scale * roi.scale:
+        # Poucos pixels no total: nenhum contorno pode passar do limiar
+        return None, None, None
+    return roi.largest_blob(mask, min_area)
+
+
+def find_similar_object_ladder(roi, hsv_ref, max_tolerance=MAX_TOLERANCE, step=10, max_area=None):
+    """
+    Tenta toda a escada de tolerâncias (0, step, ..., max_tolerance) num só
+    frame e fica com a MAIS APERTADA que encontra um objeto.
+
+    Máscaras de níveis maiores contêm as de níveis menores (e abertura /
+    fechamento preservam a inclusão), então basta testar o nível máximo e,
+    se ele achar algo, fazer busca binária pelo menor nível que ainda acha.
+    Se o objeto do nível mais apertado passar de `max_area` (px reais), é o
+    fundo vazando para dentro da máscara - nenhum nível serve.
+    Retorna (posição, bbox, área, nível) ou (None, None, None, None)
+    """
+    levels = list(range(0, int(max_tolerance) + 1, step))
+    if not levels or roi.empty:
+        return None, None, None, None
+    if levels[-1] != max_tolerance:
+        levels.append(max_tolerance)
+
+    best = find_similar_object_fast(roi, hsv_ref, levels[-1])
+    if best[0] is None:
+        return None, None, None, None
+    best_level = levels[-1]
+
+    lo, hi = 0, len(levels) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        result = find_similar_object_fast(roi, hsv_ref, levels[mid])
+        if result[0] is not None:
+            best, best_level = result, levels[mid]
+            hi = mid
+        else:
+            lo = mid + 1
+    if max_area is not None and best[2] > max_area:
+        return None, None, None, None
+    return best + (best_level,)
@@ -0,0 +1,185 @@
+"""
+FLUXO ÓPTICO ESPARSO (Lucas-Kanade em pirâmide) ENTRE DETECÇÕES DE COR
+Depois de uma detecção pela cor, alguns pontos bons para rastrear (cantos de
+Shi-Tomasi) são escolhidos sobre o objeto e seguidos frame a frame com
+cv2.calcOpticalFlowPyrLK num recorte em tons de cinza ao redor dele. O
+deslocamento do objeto é a mediana do deslocamento dos pontos.
+
+Pontos que andam diferente do conjunto (mais de `max_deviation` px da
+mediana: fundo, oclusão, deriva) são descartados; opcionalmente cada ponto
+passa também pela verificação ida-e-volta (forward_backward=True: o fluxo de
+volta precisa cair a menos de `max_fb_error` px do ponto de partida - mais
+robusto, mas dobra o custo). Quando sobram poucos pontos, o rastreamento
+por fluxo desiste e a detecção por cor assume.
+
+As posições de entrada e saída estão no frame exibido (espelhado se
+mirror=True); o recorte é feito no frame cru, como em detection.RoiFrame.
+"""
+
+import cv2
+import numpy as np
+
+from colormodel import in_range
+from detection import scaled_length
+
+# Critério de parada do LK por nível da pirâmide
+LK_CRITERIA = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.1)
+
+# Os cantos ficam alguns pixels para dentro da cor do objeto: um ponto na borda
+# enxerga o fundo parado, passa na verificação ida-e-volta e puxa a mediana
+_ERODE = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
+
+
+class FeatureFlow:
+    """
+    Segue um objeto por pontos de textura entre detecções de cor.
+
+    max_points:     cantos escolhidos no seed
+    min_points:     abaixo disso (após a verificação ida-e-volta) desiste
+    min_confidence: fração mínima dos pontos iniciais que ainda sobrevivem
+    margin:         folga (px em 1280x720) do recorte ao redor do objeto -
+                    quanto o objeto pode andar entre dois frames
+    """
+
+    def __init__(self, max_points=20, min_points=6, min_confidence=0.4, win_size=11, max_level=2,
+                 forward_backward=False, max_fb_error=1.0, max_deviation=2.0, margin=60):
+        self.max_points = max_points
+        self.min_points = min_points
+        self.min_confidence = min_confidence
+        self.win_size = (win_size, win_size)
+        self.max_level = max_level
+        self.forward_backward = forward_backward
+        self.max_fb_error = max_fb_error
+        self.max_deviation = max_deviation
+        self.margin = margin
+        # Dois buffers cinza alternados: o do frame anterior continua valendo
+        self._grays = [None, None]
+        self._turn = 0
+        self.reset()
+
+    def reset(self):
+        self._prev = None          # recorte cinza do frame anterior
+        self._origin = None        # canto (x, y) do recorte no frame cru
+        self._points = None        # pontos (N, 1, 2) float32, coordenadas do recorte
+        self._center = None        # centro do objeto no frame cru (float)
+        self._velocity = (0.0, 0.0)  # último deslocamento (px/frame, frame cru)
+        self._initial = 0
+        self._mirror = True
+        self._frame_w = 0
+
+    @property
+    def active(self):
+        return self._points is not None
+
+    def _window(self, frame_w, frame_h):
+        """Origem do recorte (tamanho fixo na sessão) centrado no objeto, empurrado para dentro do frame."""
+        w, h = self._size
+        x0 = int(round(self._center[0] - w / 2.0))
+        y0 = int(round(self._center[1] - h / 2.0))
+        return min(max(0, x0), frame_w - w), min(max(0, y0), frame_h - h)
+
+    def _gray(self, frame, origin):
+        x0, y0 = origin
+        w, h = self._size
+        self._turn ^= 1
+        buf = self._grays[self._turn]
+        if buf is None or buf.shape != (h, w):
+            buf = self._grays[self._turn] = np.empty((h, w), np.uint8)
+        return cv2.cvtColor(frame[y0:y0 + h, x0:x0 + w], cv2.COLOR_BGR2GRAY, dst=buf)
+
+    def _lk(self, prev, nxt, points, guess):
+        return cv2.calcOpticalFlowPyrLK(prev, nxt, points, guess, winSize=self.win_size,
+                                        maxLevel=self.max_level, criteria=LK_CRITERIA,
+                                        flags=cv2.OPTFLOW_USE_INITIAL_FLOW)
+
+    def seed(self, frame, bbox, mirror=True, hsv_color=None):
+        """
+        Escolhe os pontos sobre o objeto do bbox (frame exibido). Com
+        `hsv_color`, só vale o interior da área com a cor do objeto.
+        Retorna False se não há pontos suficientes (objeto liso).
+        """
+        frame_h, frame_w = frame.shape[:2]
+        x, y, w_box, h_box = bbox
+        if mirror:
+            x = frame_w - (x + w_box)
+        folga = scaled_length(self.margin, frame_w)
+        self._size = (min(frame_w, w_box + 2 * folga), min(frame_h, h_box + 2 * folga))
+        self._center = (x + w_box / 2.0, y + h_box / 2.0)
+        self._mirror = mirror
+        self._frame_w = frame_w
+        origin = self._window(frame_w, frame_h)
+        gray = self._gray(frame, origin)
+
+        # Cantos só dentro do bbox (e, com a cor, no interior dos pixels dela)
+        bx0, by0 = max(0, x - origin[0]), max(0, y - origin[1])
+        objeto = gray[by0:by0 + h_box, bx0:bx0 + w_box]
+        mask = None
+        if hsv_color is not None:
+            bgr = frame[origin[1] + by0:origin[1] + by0 + objeto.shape[0],
+                        origin[0] + bx0:origin[0] + bx0 + objeto.shape[1]]
+            mask = cv2.erode(in_range(cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV), *hsv_color), _ERODE)
+
+        points = None
+        if objeto.size:
+            points = cv2.goodFeaturesToTrack(objeto, self.max_points, 0.01, max(3, scaled_length(4, frame_w)),
+                                             mask=mask, blockSize=5)
+        if points is None or len(points) < self.min_points:
+            self.reset()
+            return False
+        self._prev = gray
+        self._origin = origin
+        self._points = points.astype(np.float32) + np.float32([bx0, by0])
+        self._initial = len(points)
+        return True
+
+    def track(self, frame, center=None):
+        """
+        Segue os pontos até `frame`. `center` (frame exibido) é a posição
+        prevista do objeto, usada como palpite inicial do deslocamento; sem
+        ela, o palpite é repetir o último deslocamento.
+        Retorna ((cx, cy) no frame exibido, confiança 0..1) ou None quando o
+        fluxo perdeu o objeto (e reseta).
+        """
+        if self._points is None:
+            return None
+        frame_h, frame_w = frame.shape[:2]
+        # Palpite inicial: pontos deslocados até a posição prevista (ou pela última velocidade)
+        previsto = self._velocity
+        if center is not None:
+            px = self._frame_w - center[0] if self._mirror else center[0]
+            previsto = (px - self._center[0], center[1] - self._center[1])
+        self._center = (self._center[0] + previsto[0], self._center[1] + previsto[1])
+        origin = self._window(frame_w, frame_h)
+        atual = self._gray(frame, origin)
+
+        offset = np.float32([self._origin[0] - origin[0] + previsto[0],
+                             self._origin[1] - origin[1] + previsto[1]])
+        guess = self._points + offset
+        nxt, st, _ = self._lk(self._prev, atual, self._points, guess.copy())
+        bons = st.reshape(-1) == 1
+        if self.forward_backward:
+            back, st_back, _ = self._lk(atual, self._prev, nxt, self._points.copy())
+            erro = np.linalg.norm((back - self._points).reshape(-1, 2), axis=1)
+            bons &= (st_back.reshape(-1) == 1) & (erro < self.max_fb_error)
+        desloc = (nxt - guess).reshape(-1, 2)
+        if bons.sum() >= self.min_points:
+            # Ponto que anda diferente do conjunto (fundo, oclusão, deriva) sai
+            mediana = np.median(desloc[bons], axis=0)
+            bons &= np.linalg.norm(desloc - mediana, axis=1) < self.max_deviation
+        confianca = bons.sum() / float(self._initial)
+        if bons.sum() < self.min_points or confianca < self.min_confidence:
+            self.reset()
+            return None
+
+        # Mediana: pontos presos no fundo ou numa oclusão não puxam o centro
+        dx, dy = np.median(desloc[bons], axis=0)
+        self._center = (self._center[0] + float(dx), self._center[1] + float(dy))
+        self._velocity = (previsto[0] + float(dx), previsto[1] + float(dy))
+        self._prev = atual
+        self._origin = origin
+        self._points = nxt[bons].reshape(-1, 1, 2)
+
+        cx, cy = self._center
+        if self._mirror:
+            cx = self._frame_w - cx
+        return (cx, cy), confianca
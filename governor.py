@@ -0,0 +1,133 @@
+"""
+GOVERNADOR DE QUALIDADE (mantém o custo do frame dentro de um orçamento)
+Mede o custo de cada frame (rastreamento + composição) e, quando o
+percentil (p95 por padrão) passa do orçamento, desce um nível de qualidade:
+recorte reduzido antes da segmentação, janela de busca menor, menos
+morfologia e overlay mais simples. Com folga por um tempo, sobe de novo.
+
+A redução nunca deixa o objeto menor que `min_object_px` pixels de lado no
+recorte reduzido (usa a área aparente do objeto, `last_area`).
+
+As decisões ficam em metrics() / decisions para o HUD e a exportação.
+"""
+
+import collections
+
+import numpy as np
+
+
+# Nível de qualidade. scale: redução do recorte; margin: fator do raio de
+# busca; morphology: ver detection.MORPHOLOGY_MODES; overlay: OVERLAY_MODES
+QualityLevel = collections.namedtuple('QualityLevel', ['scale', 'margin', 'morphology', 'overlay'])
+
+# Detalhe do overlay: tudo / sem legenda e faixa HSV / só o bbox do objeto
+OVERLAY_MODES = ('full', 'reduced', 'minimal')
+
+# Do melhor (0) para o mais barato
+LEVELS = (
+    QualityLevel(1.0, 1.0, 'full', 'full'),
+    QualityLevel(1.0, 0.85, 'open', 'full'),
+    QualityLevel(0.75, 0.75, 'open', 'reduced'),
+    QualityLevel(0.5, 0.7, 'open', 'reduced'),
+    QualityLevel(0.5, 0.6, 'open', 'minimal'),
+    QualityLevel(0.35, 0.5, 'none', 'minimal'),
+)
+
+# Decisão registrada: frame, nível anterior, novo nível, percentil medido (ms)
+Decision = collections.namedtuple('Decision', ['frame', 'from_level', 'to_level', 'measured_ms'])
+
+
+class QualityGovernor:
+    """
+    budget_ms:  orçamento por frame (ms) no `percentile` escolhido
+    window:     frames usados no percentil (a janela recomeça após cada mudança)
+    headroom:   sobe de nível quando o percentil < headroom * orçamento ...
+    hold:       ... por pelo menos `hold` frames desde a última mudança
+    """
+
+    def __init__(self, budget_ms=8.0, percentile=95, window=30, headroom=0.6, hold=90,
+                 min_object_px=12, levels=LEVELS, level=0):
+        self.budget_ms = float(budget_ms)
+        self.percentile = percentile
+        self.window = int(window)
+        self.headroom = headroom
+        self.hold = int(hold)
+        self.min_object_px = min_object_px
+        self.levels = tuple(levels)
+        self.level = int(level)
+        self.frames = 0
+        self.decisions = collections.deque(maxlen=100)
+        self.downgrades = 0
+        self.upgrades = 0
+        self._samples = collections.deque(maxlen=self.window)
+        self._since_change = 0
+        self._last_area = 0
+        self._measured_ms = None
+
+    def record(self, seconds, last_area=None):
+        """Custo do frame que terminou (s) e área do objeto (px). Devolve settings()."""
+        self.frames += 1
+        self._since_change += 1
+        self._samples.append(seconds * 1000.0)
+        if last_area is not None:
+            self._last_area = last_area
+
+        if len(self._samples) >= self.window // 2:
+            medido = float(np.percentile(self._samples, self.percentile))
+            self._measured_ms = medido
+            if medido > self.budget_ms and self.level < len(self.levels) - 1:
+                self._change(self.level + 1, medido)
+            elif (medido < self.headroom * self.budget_ms and self.level > 0
+                    and self._since_change >= self.hold):
+                self._change(self.level - 1, medido)
+        return self.settings()
+
+    def _change(self, level, medido):
+        self.decisions.append(Decision(self.frames, self.level, level, round(medido, 3)))
+        if level > self.level:
+            self.downgrades += 1
+        else:
+            self.upgrades += 1
+        self.level = level
+        self._since_change = 0
+        # Amostras do nível anterior não dizem nada sobre o novo
+        self._samples.clear()
+
+    def _scale(self):
+        scale = self.levels[self.level].scale
+        if scale < 1.0 and self._last_area > 0:
+            # Objeto pequeno na imagem: não reduzir abaixo de min_object_px de lado
+            lado = np.sqrt(self._last_area)
+            scale = max(scale, min(1.0, self.min_object_px / lado))
+        return scale
+
+    def settings(self):
+        """{'quality': argumentos de Tracker.set_quality, 'overlay': modo do overlay}."""
+        nivel = self.levels[self.level]
+        return {'quality': {'scale': self._scale(), 'margin': nivel.margin, 'morphology': nivel.morphology},
+                'overlay': nivel.overlay}
+
+    def metrics(self):
+        nivel = self.levels[self.level]
+        ultimo = self.decisions[-1] if self.decisions else None
+        return {
+            'level': self.level,
+            'scale': round(self._scale(), 3),
+            'margin': nivel.margin,
+            'morphology': nivel.morphology,
+            'overlay': nivel.overlay,
+            'budget_ms': self.budget_ms,
+            f'p{self.percentile}_ms': None if self._measured_ms is None else round(self._measured_ms, 3),
+            'frames': self.frames,
+            'downgrades': self.downgrades,
+            'upgrades': self.upgrades,
+            'last_decision': ultimo._asdict() if ultimo else None,
+        }
+
+    def describe(self):
+        """Linha curta para o HUD."""
+        m = self.metrics()
+        medido = m[f'p{self.percentile}_ms']
+        medido = '-' if medido is None else f'{medido:.1f}'
+        return (f"qualidade {m['level']}: escala {m['scale']:.2f} raio x{m['margin']:.2f} "
+                f"morf {m['morphology']} | p{self.percentile} {medido}/{self.budget_ms:g} ms")
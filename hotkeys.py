@@ -0,0 +1,94 @@
+"""
+TECLAS GLOBAIS POR EVENTO (hook da biblioteca `keyboard`)
+Em vez de consultar keyboard.is_pressed várias vezes por frame, um hook
+recebe cada tecla no momento em que ela é pressionada/solta, atualiza a
+tabela de estado e põe o evento (com timestamp) numa fila. O loop esvazia a
+fila uma vez por frame com drain(), então nenhum toque curto se perde mesmo
+com o loop lento.
+
+Teclas com `direct` (ex.: a/l -> botões do mouse) são tratadas já na thread
+do hook, sem esperar o próximo frame.
+"""
+
+import collections
+import threading
+import time
+
+# Evento de tecla: instante (time.perf_counter), nome e se foi pressionada
+KeyEvent = collections.namedtuple('KeyEvent', ['timestamp', 'key', 'down'])
+
+
+class HotkeyInput:
+    """
+    keys:   teclas observadas (nomes da biblioteca keyboard, minúsculos)
+    direct: {tecla: função(down)} chamada na thread do hook a cada mudança
+    """
+
+    def __init__(self, keys=('esc', '0', 'r', 'a', 'l'), direct=None):
+        self.keys = frozenset(keys)
+        self.direct = dict(direct or {})
+        self._state = dict.fromkeys(self.keys, False)
+        self._events = collections.deque(maxlen=256)
+        self._lock = threading.Lock()
+        self._hook = None
+        self._keyboard = None
+
+    @property
+    def active(self):
+        return self._hook is not None
+
+    def start(self):
+        """Instala o hook global. Retorna False se `keyboard` não estiver disponível."""
+        if self._hook is None:
+            try:
+                import keyboard
+                self._hook = keyboard.hook(self._on_event)
+                self._keyboard = keyboard
+            except Exception:
+                # Sem a biblioteca ou sem permissão (Linux exige root): só cv2.waitKey
+                self._hook = None
+                return False
+        return True
+
+    def stop(self):
+        if self._hook is not None:
+            try:
+                self._keyboard.unhook(self._hook)
+            except Exception:
+                pass
+            self._hook = None
+        # Não deixar botões presos
+        for key, fn in self.direct.items():
+            if self._state.get(key):
+                self._state[key] = False
+                fn(False)
+
+    def _on_event(self, event):
+        self.feed((event.name or '').lower(), event.event_type == 'down')
+
+    def feed(self, key, down):
+        """Registra uma mudança de tecla (chamado pelo hook; útil também em testes)."""
+        if key not in self.keys:
+            return
+        with self._lock:
+            if self._state[key] == down:
+                # Auto-repetição do teclado (down, down, down...): só a primeira conta
+                return
+            self._state[key] = down
+            self._events.append(KeyEvent(time.perf_counter(), key, down))
+        fn = self.direct.get(key)
+        if fn is not None:
+            try:
+                fn(down)
+            except Exception:
+                pass
+
+    def is_down(self, key):
+        return self._state.get(key, False)
+
+    def drain(self):
+        """Remove e devolve, em ordem, os eventos desde a última chamada."""
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+        return events
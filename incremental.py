@@ -0,0 +1,262 @@
+"""
+SEGMENTAÇÃO INCREMENTAL (só os blocos da imagem que mudaram)
+Nos quiosques o fundo quase não muda, mas cada frame era convertido para
+HSV e filtrado pelo range como se tudo fosse novo. Com incremental=True o
+Tracker guarda o HSV e a máscara da cor exata do frame inteiro, em blocos
+de TILE_SIZE px (em 1280x720), e a janela de cada frame só reconverte:
+  - os blocos que mudaram: a média BGR do bloco (numa grade de 8x8
+    amostras, as mesmas posições em todo frame, juntas por cv2.remap)
+    se afastou mais de CHANGE_THRESHOLD níveis da média de quando o
+    bloco foi convertido;
+  - os blocos ao redor do último bbox do objeto (sempre);
+  - uma faixa de linhas de blocos por frame, em rodízio: em REFRESH_FRAMES
+    frames todos os blocos são reconvertidos (ruído e deriva abaixo do
+    limiar, exposição automática), sem um frame pagar o frame inteiro.
+
+A comparação é com a média da última conversão e não com o frame anterior:
+uma deriva lenta se acumula até passar do limiar. Mudança de exposição
+muda todos os blocos de uma vez - o frame sai inteiro, como sem o cache.
+
+Tudo é preguiçoso: a mudança só é medida e o HSV só é convertido dentro das
+janelas pedidas (RoiFrame com `cache`). Linhas seguidas de blocos a
+converter saem num único retângulo de cvtColor/inRange. Morfologia,
+contornos e o resto rodam sobre a janela montada, como antes.
+
+Vale só para recortes em resolução cheia (scale 1; com o governador
+reduzindo o recorte, o RoiFrame converte do jeito normal). A máscara em
+cache é a do classificador HSV; com a tabela BGR->máscara (lut) só o HSV
+(adaptação, similares, histograma) vem do cache.
+
+skipped_fraction(): fração dos blocos pedidos no frame que vieram do cache.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+from colormodel import in_range
+from detection import scaled_length
+
+
+# Lado do bloco (px em 1280x720; múltiplo de SAMPLES na resolução real)
+TILE_SIZE = 32
+
+# Amostras por lado do bloco na medida de mudança (8x8 = 64 pixels por bloco)
+SAMPLES = 8
+
+# Diferença (níveis 0..255, em qualquer canal BGR) entre a média do bloco e a
+# da última conversão a partir da qual o bloco é reconvertido. Com 64
+# amostras o ruído da câmera quase não move a média; um objeto cobrindo
+# ~5% do bloco já move
+CHANGE_THRESHOLD = 6
+
+# Todo bloco é reconvertido pelo menos a cada tantos frames (rodízio de linhas)
+REFRESH_FRAMES = 30
+
+# Com mais que essa fração dos blocos da janela a refazer (objeto rápido,
+# câmera mexendo), uma conversão da janela inteira sai mais barata que os
+# retângulos
+DENSE_FRACTION = 0.6
+
+# Blocos sem mudança que podem ser refeitos para juntar duas linhas de blocos
+# num retângulo só (uma chamada a menos de cvtColor/inRange)
+MERGE_SLACK = 4
+
+
+def tile_size(frame_w, tile=TILE_SIZE):
+    """Lado do bloco na resolução real: escalado e arredondado para múltiplo de SAMPLES."""
+    return max(SAMPLES, scaled_length(tile, frame_w) // SAMPLES * SAMPLES)
+
+
+class SegmentationCache:
+    """
+    HSV e máscara do frame inteiro em blocos, reconvertidos só onde a imagem
+    mudou. update() a cada frame, antes das buscas; hsv()/mask() devolvem a
+    janela pedida (coordenadas do frame cru) como view do cache - só leitura.
+    """
+
+    def __init__(self, tile=TILE_SIZE, threshold=CHANGE_THRESHOLD, refresh_frames=REFRESH_FRAMES):
+        self.tile_ref = tile
+        self.threshold = threshold
+        self.refresh_frames = max(1, int(refresh_frames))
+        self.frame = None
+        self.shape = None
+        self.frames = 0
+        self.tile = None
+        self.tiles_requested = 0
+        self.tiles_converted = 0
+        self._requested = 0
+        self._converted = 0
+        self._mask_key = None
+
+    def _allocate(self, shape):
+        frame_h, frame_w = shape[:2]
+        self.shape = shape
+        self.tile = tile_size(frame_w, self.tile_ref)
+        self.step = self.tile // SAMPLES
+        self.rows = math.ceil(frame_h / self.tile)
+        self.cols = math.ceil(frame_w / self.tile)
+        grade = (self.rows, self.cols)
+        self.hsv_cache = np.empty(shape, np.uint8)
+        self.mask_cache = np.empty(shape[:2], np.uint8)
+        self.scratch = np.empty(shape[:2], np.uint8)
+        # Posição (absoluta, cortada ao frame) de cada amostra: cv2.remap junta
+        # as amostras de uma janela de blocos numa chamada
+        xs = np.minimum(np.arange(self.cols * SAMPLES) * self.step + self.step // 2, frame_w - 1)
+        ys = np.minimum(np.arange(self.rows * SAMPLES) * self.step + self.step // 2, frame_h - 1)
+        self.map_x, self.map_y = np.meshgrid(xs.astype(np.float32), ys.astype(np.float32))
+        self.reference = np.zeros(grade + (3,), np.uint8)   # média de cada bloco na última conversão
+        self.current = np.zeros(grade + (3,), np.uint8)     # média medida neste frame
+        self.hsv_valid = np.zeros(grade, bool)
+        self.mask_valid = np.zeros(grade, bool)
+        self.checked = np.zeros(grade, bool)                # mudança já medida neste frame
+        self._mask_key = None
+
+    def reset(self):
+        """Descarta tudo: o próximo frame é convertido inteiro."""
+        self.shape = None
+
+    def update(self, frame, focus=None):
+        """
+        Novo frame. `focus`: janela (x0, y0, x1, y1) do frame cru sempre
+        reconvertida (o último bbox do objeto), com um bloco de folga.
+        """
+        if self.frame is not None:
+            self.tiles_requested += self._requested
+            self.tiles_converted += self._converted
+            self._requested = self._converted = 0
+        if self.shape != frame.shape:
+            self._allocate(frame.shape)
+        self.frame = frame
+        self.checked[:] = False
+        # Rodízio: as linhas de blocos deste frame perdem o cache
+        self.hsv_valid[self.frames % self.refresh_frames::self.refresh_frames] = False
+        if focus is not None:
+            ty0, tx0, ty1, tx1 = self._tiles(focus)
+            self.hsv_valid[ty0:ty1, tx0:tx1] = False
+        self.frames += 1
+
+    def skipped_fraction(self):
+        """Fração dos blocos pedidos neste frame (até agora) que vieram do cache; None sem pedidos."""
+        if not self._requested:
+            return None
+        return 1.0 - float(self._converted) / self._requested
+
+    def _tiles(self, window):
+        """Blocos (ty0, tx0, ty1, tx1) que cobrem a janela (x0, y0, x1, y1), cortados à grade."""
+        x0, y0, x1, y1 = window
+        t = self.tile
+        return (min(max(0, y0 // t), self.rows), min(max(0, x0 // t), self.cols),
+                min(max(0, -(-y1 // t)), self.rows), min(max(0, -(-x1 // t)), self.cols))
+
+    def _check(self, ty0, tx0, ty1, tx1):
+        """Mede a mudança dos blocos (se algum ainda não foi medido neste frame); os que mudaram perdem o cache."""
+        if self.checked[ty0:ty1, tx0:tx1].all():
+            return
+        ny, nx = ty1 - ty0, tx1 - tx0
+        linhas, colunas = slice(ty0 * SAMPLES, ty1 * SAMPLES), slice(tx0 * SAMPLES, tx1 * SAMPLES)
+        amostras = cv2.remap(self.frame, self.map_x[linhas, colunas], self.map_y[linhas, colunas], cv2.INTER_NEAREST)
+        medias = cv2.resize(amostras, (nx, ny), interpolation=cv2.INTER_AREA).reshape(ny, nx, 3)
+        # Blocos já medidos neste frame dão a mesma média: medir de novo não muda nada
+        self.current[ty0:ty1, tx0:tx1] = medias
+        mudou = cv2.absdiff(medias, self.reference[ty0:ty1, tx0:tx1]).max(axis=2) > self.threshold
+        self.hsv_valid[ty0:ty1, tx0:tx1] &= ~mudou
+        self.checked[ty0:ty1, tx0:tx1] = True
+
+    def _stale(self, valid, ty0, tx0, ty1, tx1):
+        """
+        Retângulos (ty0, tx0, ty1, tx1) de blocos a refazer: em cada linha de
+        blocos, do primeiro ao último inválido; linhas seguidas viram um
+        retângulo só enquanto isso não refaz mais que MERGE_SLACK blocos à toa
+        (poucas chamadas grandes em vez de uma por bloco).
+        """
+        invalidos = ~valid[ty0:ty1, tx0:tx1]
+        grupo = None
+        for dy in np.flatnonzero(invalidos.any(axis=1)).tolist():
+            colunas = np.flatnonzero(invalidos[dy])
+            a, b = int(colunas[0]), int(colunas[-1]) + 1
+            if grupo is not None and dy == grupo[2]:
+                r0, c0, _, c1, soma = grupo
+                u0, u1 = min(c0, a), max(c1, b)
+                if (u1 - u0) * (dy + 1 - r0) <= soma + (b - a) + MERGE_SLACK:
+                    grupo = (r0, u0, dy + 1, u1, soma + (b - a))
+                    continue
+            if grupo is not None:
+                yield ty0 + grupo[0], tx0 + grupo[1], ty0 + grupo[2], tx0 + grupo[3]
+            grupo = (dy, a, dy + 1, b, b - a)
+        if grupo is not None:
+            yield ty0 + grupo[0], tx0 + grupo[1], ty0 + grupo[2], tx0 + grupo[3]
+
+    def _pixels(self, ty0, tx0, ty1, tx1):
+        t = self.tile
+        frame_h, frame_w = self.shape[:2]
+        return slice(ty0 * t, min(frame_h, ty1 * t)), slice(tx0 * t, min(frame_w, tx1 * t))
+
+    def _inside(self, window):
+        """Blocos inteiros dentro da janela (o bloco cortado na borda do frame conta como inteiro)."""
+        x0, y0, x1, y1 = window
+        t = self.tile
+        frame_h, frame_w = self.shape[:2]
+        return (-(-y0 // t), -(-x0 // t), self.rows if y1 >= frame_h else y1 // t,
+                self.cols if x1 >= frame_w else x1 // t)
+
+    def _dense(self, valid, ty0, tx0, ty1, tx1):
+        """Blocos a refazer são mais de DENSE_FRACTION dos da janela: uma chamada na janela inteira compensa."""
+        sub = valid[ty0:ty1, tx0:tx1]
+        return sub.size - np.count_nonzero(sub) > DENSE_FRACTION * sub.size
+
+    def hsv(self, window):
+        """HSV da janela (x0, y0, x1, y1) do frame cru, reconvertendo só os blocos sem cache."""
+        x0, y0, x1, y1 = window
+        ty0, tx0, ty1, tx1 = self._tiles(window)
+        if ty1 <= ty0 or tx1 <= tx0:
+            return self.hsv_cache[y0:y1, x0:x1]
+        self._check(ty0, tx0, ty1, tx1)
+        self._requested += (ty1 - ty0) * (tx1 - tx0)
+        if self._dense(self.hsv_valid, ty0, tx0, ty1, tx1):
+            # Os blocos cortados pela janela continuam sem cache (só parte deles foi convertida)
+            cv2.cvtColor(self.frame[y0:y1, x0:x1], cv2.COLOR_BGR2HSV, dst=self.hsv_cache[y0:y1, x0:x1])
+            self.mask_valid[ty0:ty1, tx0:tx1] = False
+            a, b, c, d = self._inside(window)
+            self.hsv_valid[a:c, b:d] = True
+            self.reference[a:c, b:d] = self.current[a:c, b:d]
+            self._converted += (ty1 - ty0) * (tx1 - tx0)
+            return self.hsv_cache[y0:y1, x0:x1]
+        for a, b, c, d in self._stale(self.hsv_valid, ty0, tx0, ty1, tx1):
+            linhas, colunas = self._pixels(a, b, c, d)
+            cv2.cvtColor(self.frame[linhas, colunas], cv2.COLOR_BGR2HSV, dst=self.hsv_cache[linhas, colunas])
+            self.hsv_valid[a:c, b:d] = True
+            self.mask_valid[a:c, b:d] = False
+            self.reference[a:c, b:d] = self.current[a:c, b:d]
+            self._converted += (c - a) * (d - b)
+        return self.hsv_cache[y0:y1, x0:x1]
+
+    def mask(self, window, lower, upper):
+        """Máscara crua (in_range) da janela, refiltrando só os blocos sem cache ou com range novo."""
+        chave = (tuple(int(c) for c in lower), tuple(int(c) for c in upper))
+        if chave != self._mask_key:
+            self.mask_valid[:] = False
+            self._mask_key = chave
+        hsv = self.hsv(window)
+        x0, y0, x1, y1 = window
+        ty0, tx0, ty1, tx1 = self._tiles(window)
+        if ty1 <= ty0 or tx1 <= tx0 or self._dense(self.mask_valid, ty0, tx0, ty1, tx1):
+            mask = in_range(hsv, lower, upper, self.mask_cache[y0:y1, x0:x1], self.scratch[y0:y1, x0:x1])
+            a, b, c, d = self._inside(window)
+            # Só onde o HSV do bloco inteiro vale (um bloco cortado pode ter HSV velho fora da janela)
+            self.mask_valid[a:c, b:d] = self.hsv_valid[a:c, b:d]
+            return mask
+        for a, b, c, d in self._stale(self.mask_valid, ty0, tx0, ty1, tx1):
+            linhas, colunas = self._pixels(a, b, c, d)
+            in_range(self.hsv_cache[linhas, colunas], lower, upper, self.mask_cache[linhas, colunas],
+                     self.scratch[linhas, colunas])
+            self.mask_valid[a:c, b:d] = True
+        return self.mask_cache[y0:y1, x0:x1]
+
+    def metrics(self):
+        pedidos = self.tiles_requested + self._requested
+        convertidos = self.tiles_converted + self._converted
+        return {'tile_px': self.tile, 'frames': self.frames,
+                'tiles_requested': pedidos, 'tiles_converted': convertidos,
+                'skipped': round(1.0 - convertidos / pedidos, 4) if pedidos else None}
@@ -0,0 +1,155 @@
+"""
+INSTRUMENTAÇÃO DO LOOP (tempo por etapa)
+Mede quanto cada etapa do frame custa (captura, espelhamento, HSV, máscara,
+morfologia, contornos, busca por similares, overlay, imshow, waitKey,
+teclado, cursor), mantém percentis móveis (p50/p95/p99), desenha um HUD
+opcional e exporta JSON/CSV.
+
+Uso no código quente:
+    t0 = PROFILER.tic()
+    ... etapa ...
+    PROFILER.toc('hsv', t0)
+
+Desligado (padrão), tic() devolve 0 e toc() retorna na primeira linha -
+pode ficar no código de produção.
+"""
+
+import csv
+import json
+import time
+
+import cv2
+import numpy as np
+
+
+# Ordem de exibição das etapas conhecidas (outras aparecem depois, em ordem alfabética)
+STAGES = ('frame', 'capture', 'flip', 'pyramid', 'hsv', 'backproject', 'camshift', 'flow', 'adapt', 'reacquire',
+          'mask', 'morphology', 'contours', 'similar', 'overlay', 'imshow', 'waitkey', 'keyboard', 'cursor')
+
+
+class StageProfiler:
+    """Tempos por etapa em buffers circulares de `window` amostras (segundos)."""
+
+    def __init__(self, enabled=False, window=1024):
+        self.enabled = enabled
+        self.window = int(window)
+        self._samples = {}
+        self._counts = {}
+        self.frames = 0
+        self.export_path = None
+        self.export_interval = None
+        self._next_export = None
+        # {nome: função sem argumentos} com dados extras para o JSON (ex.: governador)
+        self.extras = {}
+        # Lista: cada amostra também vai para ela como (etapa, segundos) - um
+        # worker de processo devolve assim os tempos ao processo principal
+        self.log = None
+
+    def tic(self):
+        """Início de uma medição (0.0 quando desligado)."""
+        if not self.enabled:
+            return 0.0
+        return time.perf_counter()
+
+    def toc(self, stage, t0):
+        """Registra o tempo desde `t0` na etapa `stage`."""
+        if not self.enabled:
+            return
+        self.record(stage, time.perf_counter() - t0)
+
+    def record(self, stage, seconds):
+        if self.log is not None:
+            self.log.append((stage, seconds))
+        buf = self._samples.get(stage)
+        if buf is None:
+            buf = self._samples[stage] = np.zeros(self.window, dtype=np.float64)
+            self._counts[stage] = 0
+        count = self._counts[stage]
+        buf[count % self.window] = seconds
+        self._counts[stage] = count + 1
+
+    def drain(self):
+        """Amostras (etapa, segundos) acumuladas em `log` desde a última chamada."""
+        amostras, self.log = self.log, []
+        return amostras
+
+    def reset(self):
+        self._samples.clear()
+        self._counts.clear()
+        self.frames = 0
+
+    def configure_export(self, path, interval=None):
+        """Exporta para `path` (.json ou .csv) a cada `interval` segundos e no fim."""
+        self.export_path = path
+        self.export_interval = interval
+        self._next_export = time.perf_counter() + interval if interval else None
+
+    def frame_done(self):
+        """Fim de um frame: conta e, se configurado, exporta periodicamente."""
+        if not self.enabled:
+            return
+        self.frames += 1
+        if self._next_export is not None and time.perf_counter() >= self._next_export:
+            self._next_export += self.export_interval
+            self.export()
+
+    def stages(self):
+        known = [s for s in STAGES if s in self._samples]
+        return known + sorted(s for s in self._samples if s not in STAGES)
+
+    def summary(self):
+        """{etapa: {'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}} da janela atual."""
+        result = {}
+        for stage in self.stages():
+            count = self._counts[stage]
+            data = self._samples[stage][:min(count, self.window)] * 1000.0
+            p50, p95, p99 = np.percentile(data, (50, 95, 99))
+            result[stage] = {
+                'count': count,
+                'mean_ms': round(float(data.mean()), 4),
+                'p50_ms': round(float(p50), 4),
+                'p95_ms': round(float(p95), 4),
+                'p99_ms': round(float(p99), 4),
+                'max_ms': round(float(data.max()), 4),
+            }
+        return result
+
+    def export(self, path=None):
+        """Grava o resumo em JSON ou CSV (pela extensão do arquivo)."""
+        path = path or self.export_path
+        if not path or not self._samples:
+            return
+        summary = self.summary()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+                for stage, s in summary.items():
+                    writer.writerow([stage, s['count'], s['mean_ms'], s['p50_ms'],
+                                     s['p95_ms'], s['p99_ms'], s['max_ms']])
+        else:
+            with open(path, 'w') as f:
+                dados = {'timestamp': time.time(), 'frames': self.frames, 'stages': summary}
+                for nome, fn in self.extras.items():
+                    dados[nome] = fn()
+                json.dump(dados, f, indent=2)
+
+    def draw_hud(self, frame, origin=(10, 20)):
+        """Tabela de percentis (ms) no canto do frame."""
+        if not self._samples:
+            return
+        summary = self.summary()
+        x, y = origin
+        colunas = (0, 95, 150, 205)
+        linhas = [('etapa', 'p50', 'p95', 'p99')]
+        for stage, s in summary.items():
+            linhas.append((stage, f"{s['p50_ms']:.2f}", f"{s['p95_ms']:.2f}", f"{s['p99_ms']:.2f}"))
+        cv2.rectangle(frame, (x - 5, y - 15), (x + 255, y - 7 + 16 * len(linhas)), (0, 0, 0), -1)
+        for i, linha in enumerate(linhas):
+            for dx, texto in zip(colunas, linha):
+                cv2.putText(frame, texto, (x + dx, y + 16 * i), cv2.FONT_HERSHEY_PLAIN, 0.9,
+                            (255, 255, 255), 1)
+
+
+# Instância global usada pelo loop e pelos módulos de detecção (desligada por padrão)
+PROFILER = StageProfiler()
@@ -0,0 +1,310 @@
+"""
+MODELO DE MOVIMENTO DO CURSOR (filtro + predição + interpolação)
+Suaviza as posições detectadas, estima a velocidade do objeto e projeta a
+posição do instante da captura até o instante em que o cursor é movido (o
+atraso do pipeline entra pelos timestamps), em vez do filtro exponencial
+fixo que atrasava o cursor alguns frames.
+
+Filtros disponíveis (FILTERS):
+    'one-euro' - One-Euro (Casiez et al.): corte adaptativo pela velocidade,
+                 suaviza parado e quase não atrasa em movimento
+    'kalman'   - Kalman de velocidade constante, por eixo
+    'ema'      - média exponencial fixa (comportamento antigo, sem predição)
+    'none'     - sem filtro
+
+As posições estão em pixels do frame exibido; os tempos vêm de
+time.perf_counter() (o mesmo relógio do Frame.timestamp da captura).
+"""
+
+import math
+import threading
+import time
+
+
+class OneEuroFilter:
+    """
+    Filtro One-Euro em 2D. `min_cutoff` (Hz) controla o tremor parado;
+    `beta` aumenta o corte com a velocidade (px/s) para reduzir o atraso.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=3.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._pos = None
+        self._vel = (0.0, 0.0)
+        self._t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, x, y, t):
+        if self._pos is None or t <= self._t:
+            if self._pos is None:
+                self._vel = (0.0, 0.0)
+            self._pos = (float(x), float(y))
+            self._t = t
+            return self._pos
+
+        dt = t - self._t
+        px, py = self._pos
+        # Velocidade bruta filtrada com corte fixo
+        a_d = self._alpha(self.d_cutoff, dt)
+        vx = self._vel[0] + a_d * ((x - px) / dt - self._vel[0])
+        vy = self._vel[1] + a_d * ((y - py) / dt - self._vel[1])
+        # Corte da posição cresce com a velocidade
+        a = self._alpha(self.min_cutoff + self.beta * math.hypot(vx, vy), dt)
+        self._pos = (px + a * (x - px), py + a * (y - py))
+        self._vel = (vx, vy)
+        self._t = t
+        return self._pos
+
+    def predict(self, t):
+        """Posição extrapolada para o instante `t` (None sem medições)."""
+        if self._pos is None:
+            return None
+        dt = t - self._t
+        return self._pos[0] + self._vel[0] * dt, self._pos[1] + self._vel[1] * dt
+
+
+class KalmanFilter:
+    """
+    Kalman de velocidade constante, eixos x e y independentes.
+    `accel_noise`: densidade espectral da aceleração (px²/s³) - maior segue
+    mudanças de direção mais rápido; `measurement_noise`: variância da
+    medição (px²).
+    """
+
+    def __init__(self, accel_noise=2.0e5, measurement_noise=4.0):
+        self.q = accel_noise
+        self.r = measurement_noise
+        self.reset()
+
+    def reset(self):
+        # Estado por eixo: [posição, velocidade, P00, P01, P11]
+        self._axes = None
+        self._t = None
+
+    def _axis_update(self, state, z, dt):
+        p, v, p00, p01, p11 = state
+        if dt > 0:
+            # Predição: p += v*dt, P = F P F' + Q (aceleração como ruído branco)
+            q = self.q
+            p += v * dt
+            p00 += dt * (2.0 * p01 + dt * p11) + q * dt ** 3 / 3.0
+            p01 += dt * p11 + q * dt ** 2 / 2.0
+            p11 += q * dt
+        # Correção com a medição da posição
+        s = p00 + self.r
+        k0, k1 = p00 / s, p01 / s
+        resid = z - p
+        p += k0 * resid
+        v += k1 * resid
+        p11 -= k1 * p01
+        p01 -= k0 * p01
+        p00 -= k0 * p00
+        return [p, v, p00, p01, p11]
+
+    def update(self, x, y, t):
+        if self._axes is None:
+            # Velocidade inicial desconhecida: variância grande
+            big = 1.0e6
+            self._axes = [[float(x), 0.0, self.r, 0.0, big], [float(y), 0.0, self.r, 0.0, big]]
+            self._t = t
+        else:
+            dt = max(0.0, t - self._t)
+            self._axes = [self._axis_update(self._axes[0], x, dt), self._axis_update(self._axes[1], y, dt)]
+            self._t = max(t, self._t)
+        return self._axes[0][0], self._axes[1][0]
+
+    def predict(self, t):
+        if self._axes is None:
+            return None
+        dt = t - self._t
+        (px, vx), (py, vy) = self._axes[0][:2], self._axes[1][:2]
+        return px + vx * dt, py + vy * dt
+
+
+class ExponentialFilter:
+    """Média exponencial fixa (o `smooth=0.25` antigo). Não estima velocidade."""
+
+    def __init__(self, alpha=0.25):
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self._pos = None
+
+    def update(self, x, y, t):
+        if self._pos is None:
+            self._pos = (float(x), float(y))
+        else:
+            a = self.alpha
+            self._pos = (self._pos[0] + a * (x - self._pos[0]), self._pos[1] + a * (y - self._pos[1]))
+        return self._pos
+
+    def predict(self, t):
+        return self._pos
+
+
+class PassThroughFilter:
+    """Sem filtro: a última medição."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._pos = None
+
+    def update(self, x, y, t):
+        self._pos = (float(x), float(y))
+        return self._pos
+
+    def predict(self, t):
+        return self._pos
+
+
+FILTERS = {
+    'one-euro': OneEuroFilter,
+    'kalman': KalmanFilter,
+    'ema': ExponentialFilter,
+    'none': PassThroughFilter,
+}
+
+
+def make_filter(name, **kwargs):
+    """Cria o filtro `name` (chave de FILTERS)."""
+    try:
+        cls = FILTERS[name]
+    except KeyError:
+        raise ValueError(f"filtro desconhecido: {name!r} (opções: {', '.join(FILTERS)})")
+    return cls(**kwargs)
+
+
+class MotionModel:
+    """
+    Filtro + predição compartilhados entre o loop de detecção (update) e a
+    saída do cursor (position), que pode rodar em outra thread.
+
+    update() recebe cada detecção com o timestamp da captura, e position()
+    extrapola até o instante pedido - o momento em que o cursor é movido -,
+    então o atraso do pipeline já entra na predição sem ser medido à parte.
+    `lead` soma segundos fixos para a latência da própria câmera, que não
+    aparece nos timestamps.
+    """
+
+    def __init__(self, filter='kalman', predict=True, lead=0.0, max_extrapolation=0.1, **filter_kwargs):
+        self.filter = make_filter(filter, **filter_kwargs) if isinstance(filter, str) else filter
+        self.predict = predict
+        self.lead = lead
+        self.max_extrapolation = max_extrapolation
+        self.last_timestamp = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.filter.reset()
+            self.last_timestamp = None
+
+    def update(self, pos, timestamp):
+        """Nova detecção `pos` do frame capturado em `timestamp`."""
+        with self._lock:
+            self.last_timestamp = timestamp
+            return self.filter.update(pos[0], pos[1], timestamp)
+
+    def _at(self, t):
+        if self.last_timestamp is None:
+            return None
+        # Não extrapolar longe demais da última medição (objeto pode ter parado/sumido)
+        t = min(t, self.last_timestamp + self.max_extrapolation)
+        return self.filter.predict(t)
+
+    def position(self, now=None):
+        """Posição para o cursor no instante `now` (com predição, se ligada)."""
+        with self._lock:
+            if not self.predict:
+                return self.filter.predict(self.last_timestamp) if self.last_timestamp is not None else None
+            now = time.perf_counter() if now is None else now
+            return self._at(now + self.lead)
+
+    def center(self, timestamp):
+        """Posição prevista do objeto no frame capturado em `timestamp` (centro da busca)."""
+        with self._lock:
+            return self._at(timestamp)
+
+
+class CursorInterpolator:
+    """
+    Thread que move o cursor a `rate` Hz (taxa do monitor) entre os frames
+    da câmera, amostrando MotionModel.position(). `move(x, y)` recebe
+    coordenadas (floats) do frame exibido. Só move enquanto `active` for True
+    e `snap(x, y)` mudou - o pixel da tela que o movimento atingiria (padrão:
+    o pixel do frame, mais grosso que o da tela quando a câmera tem menos
+    resolução).
+    """
+
+    def __init__(self, model, move, rate=144.0, snap=None):
+        self.model = model
+        self.move = move
+        self.snap = snap or (lambda x, y: (int(round(x)), int(round(y))))
+        self.rate = float(rate)
+        self.active = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._timer_period = False
+
+    def start(self):
+        if self._thread is None:
+            # No Windows, sleep() tem resolução de ~15 ms sem timeBeginPeriod(1)
+            try:
+                import ctypes
+                self._timer_period = ctypes.windll.winmm.timeBeginPeriod(1) == 0
+            except Exception:
+                self._timer_period = False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='CursorInterpolator', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        periodo = 1.0 / self.rate
+        proximo = time.perf_counter()
+        ultimo = None
+        while not self._stop.is_set():
+            if self.active:
+                pos = self.model.position()
+                if pos is not None:
+                    destino = self.snap(*pos)
+                    if destino != ultimo:
+                        try:
+                            self.move(*pos)
+                        except Exception:
+                            pass
+                        ultimo = destino
+            else:
+                ultimo = None
+            proximo += periodo
+            espera = proximo - time.perf_counter()
+            if espera > 0:
+                self._stop.wait(espera)
+            else:
+                # Atrasou (move lento): recomeça a grade a partir de agora
+                proximo = time.perf_counter()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self._timer_period:
+            try:
+                import ctypes
+                ctypes.windll.winmm.timeEndPeriod(1)
+            except Exception:
+                pass
+            self._timer_period = False
@@ -0,0 +1,497 @@
+"""
+RASTREAMENTO DE VÁRIOS OBJETOS (várias cores, uma segmentação por frame)
+Para controlar com as duas mãos (um marcador para o ponteiro, outro para
+gestos de clique/rolagem) ou para vários usuários na mesma estação. Rodar um
+Tracker por cor repetiria a conversão HSV e todo o trabalho sobre o frame; o
+MultiTracker faz esse trabalho uma vez, qualquer que seja o número de alvos:
+
+  1. as janelas dos alvos rastreados (e, se algum alvo está perdido, uma
+     faixa do frame reduzido como na busca em pirâmide) viram recortes -
+     janelas que se sobrepõem bastante viram um só, convertido para HSV uma
+     vez. O custo acompanha a área das janelas, não a do frame;
+  2. cada recorte é classificado só contra as cores que podem valer nele:
+     as dos alvos donos da janela e, na faixa reduzida, a cor exata dos
+     alvos que procuram no frame inteiro. Com uma cor só (o caso comum: um
+     alvo rastreado pela cor exata) é um cv2.inRange direto na máscara,
+     como no Tracker; com mais, colormodel.LabelClassifier classifica o
+     recorte contra todas numa passada (três cv2.LUT): cada alvo tem um
+     bit para a cor exata e outro para a cor similar (ligado só enquanto ele
+     não é achado, no nível de tolerância dele);
+  3. as máscaras dos recortes ficam lado a lado num mosaico: uma limpeza
+     morfológica e UMA chamada a cv2.findContours no mosaico
+     dão todos os blobs; cada blob diz quais alvos ele contém pela contagem
+     de bits (blobs de cores diferentes encostados são separados por alvo),
+     ou, num recorte de uma cor só, por cv2.countNonZero no bbox.
+     cv2.connectedComponentsWithStats daria o mesmo, mas rotular cada pixel
+     custa ~10x os contornos nessas máscaras quase vazias;
+  4. cada alvo rastreado fica com o maior blob da cor dele na sua janela;
+     os perdidos, com o maior que sobrar em qualquer recorte.
+
+Um alvo perdido há REACQUIRE_AFTER_FRAMES frames, ou seguido só pela cor
+similar (que pode ser um pedaço do fundo) esse tempo todo, também aceita a
+cor exata fora da própria janela: enquanto houver um alvo assim, o frame
+reduzido entra no mosaico uma faixa horizontal por frame, em rodízio (como
+no reacquire.Reacquirer, SCAN_BANDS frames cobrem o frame todo). Reduzir o
+frame inteiro a cada frame custava mais que a busca de todos os alvos; só o
+primeiro frame depois de uma cor nova ou de reset() o reduz inteiro.
+
+Cada alvo guarda o próprio estado (posição, raio de busca, tolerância,
+frames perdidos). Em vez da escada inteira de tolerâncias a cada frame, o
+nível da cor similar de um alvo sobe um degrau por frame sem achá-lo e volta
+a zero quando a cor exata reaparece. Não há histograma, fluxo óptico nem
+adaptação de cor.
+"""
+
+import bisect
+import collections
+import math
+import time
+
+import cv2
+import numpy as np
+
+from blobs import contour_stats, mask_stats
+from colormodel import MAX_TOLERANCE, LabelClassifier, hsv_range, range_center, range_channels, similar_channels
+from detection import (MIN_AREA_EXACT, MIN_AREA_SIMILAR, RoiFrame, area_scale, hsv_at, morph_kernel, pyramid_factor,
+                       scaled_length, tracking_window)
+from instrumentation import PROFILER
+from tracker import (PHASE_DETECTED, PHASE_EXACT, PHASE_LOST, PHASE_SEARCHING, PHASE_SIMILAR,
+                     REACQUIRE_AFTER_FRAMES, SEARCH_MAX_GROWTH_FRAMES, SIMILAR_MAX_AREA_RATIO, TrackResult)
+from workspace import Workspace
+
+
+# Dois bits por alvo (exato e similar) na imagem de rótulos de 16 bits
+MAX_TARGETS = LabelClassifier.MAX_RANGES // 2
+
+# Degrau do nível de tolerância da cor similar a cada frame sem achar o alvo
+TOLERANCE_STEP = 10
+
+# Faixas do frame reduzido varridas em rodízio enquanto algum alvo está perdido
+SCAN_BANDS = 4
+
+# Resultado de um alvo ainda sem cor (multi_stage)
+_NO_TARGET = TrackResult(PHASE_LOST, None, None, None, 0, 0, 0)
+
+# Blob de um frame para um alvo: chave (blobs com a mesma chave são os mesmos
+# pixels e só servem a um alvo), centróide sub-pixel e bbox no frame exibido, área (px
+# reais) e se a cor exata sozinha já passa da área mínima
+Blob = collections.namedtuple('Blob', ['key', 'position', 'bbox', 'area', 'exact'])
+
+# Bits de cada valor de um byte (256 x 8): contagem de pixels por bit = histograma @ tabela
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1, bitorder='little').astype(np.int64)
+
+
+def _bit_counts(valores):
+    """Quantos dos rótulos `valores` (uint8 ou uint16) têm cada bit ligado (vetor de 8 ou 16)."""
+    if valores.dtype == np.uint8:
+        return np.bincount(valores, minlength=256) @ _BYTE_BITS
+    baixo = np.bincount(valores & 0xFF, minlength=256) @ _BYTE_BITS
+    alto = np.bincount(valores >> 8, minlength=256) @ _BYTE_BITS
+    return np.concatenate([baixo, alto])
+
+
+class Target:
+    """Estado de um alvo: cor, último achado e contadores (como os de um Tracker)."""
+
+    def __init__(self, name, hsv_color):
+        self.name = name
+        lower, upper = hsv_color
+        self.hsv_color = (lower, upper)
+        self.hsv_ref = range_center(lower, upper)
+        self.reset()
+
+    def reset(self):
+        self.last_position = None
+        self.last_bbox = None
+        self.last_area = 0
+        self.frames_lost = 0
+        self.frames_similar = 0
+        self.tolerance = 0
+
+    @property
+    def wide(self):
+        """Procura a cor exata no frame inteiro (perdido, ou há tempo demais só na cor similar)?"""
+        return (self.last_position is None or self.frames_lost >= REACQUIRE_AFTER_FRAMES
+                or self.frames_similar >= REACQUIRE_AFTER_FRAMES)
+
+    def channels(self):
+        """Valores aceitos por canal nos bits (exato, similar) do alvo."""
+        similar = similar_channels(self.hsv_ref, self.tolerance) if self.tolerance > 0 else None
+        return range_channels(*self.hsv_color), similar
+
+    def key(self):
+        lower, upper = self.hsv_color
+        return tuple(int(c) for c in lower) + tuple(int(c) for c in upper) + (self.tolerance,)
+
+
+class MultiTracker:
+    """
+    Rastreador de vários objetos, cada um pela sua cor, com uma segmentação
+    por frame (ver docstring do módulo). Os alvos têm nome e são processados
+    na ordem em que foram adicionados; process() devolve {nome: TrackResult}.
+    """
+
+    def __init__(self, mirror=True, search_radius=100, max_lost_frames=60, max_tolerance=MAX_TOLERANCE,
+                 reuse_buffers=True):
+        self.mirror = mirror
+        self.search_radius = search_radius   # px em 1280x720
+        self.max_lost_frames = max_lost_frames
+        self.max_tolerance = max_tolerance
+        self.scale = 1.0
+        self.margin = 1.0
+        self.morphology = 'full'
+        self.classifier = LabelClassifier()
+        self._ranges_key = None
+        self._scan = 0
+        self._full_scan = True
+        self.workspace = Workspace() if reuse_buffers else None
+        self.targets = collections.OrderedDict()
+
+    def add(self, name, hsv_color):
+        """Adiciona (ou troca a cor de) um alvo. Retorna o Target."""
+        if name not in self.targets and len(self.targets) >= MAX_TARGETS:
+            raise ValueError(f'no máximo {MAX_TARGETS} alvos por MultiTracker')
+        alvo = self.targets[name] = Target(name, hsv_color)
+        self._full_scan = True
+        return alvo
+
+    def capture_color(self, name, frame, x, y, h_tol=10, s_tol=40, v_tol=40):
+        """Cor do pixel (x, y) do frame exibido para o alvo `name` (como o clique). Retorna o HSV."""
+        h_val, s_val, v_val = hsv_at(frame, x, y, mirror=self.mirror)
+        self.add(name, hsv_range(h_val, s_val, v_val, h_tol, s_tol, v_tol))
+        return h_val, s_val, v_val
+
+    def remove(self, name):
+        self.targets.pop(name, None)
+
+    def reset(self):
+        """Esquece posições e contadores (as cores ficam)."""
+        for alvo in self.targets.values():
+            alvo.reset()
+        self._full_scan = True
+
+    def set_quality(self, scale=1.0, margin=1.0, morphology='full'):
+        self.scale = scale
+        self.margin = margin
+        self.morphology = morphology
+
+    def _windows(self, frame_w, frame_h, centers):
+        """Janela e raio de cada alvo rastreado ({nome: (janela, raio)}; None se perdido)."""
+        janelas = {}
+        for alvo in self.targets.values():
+            if alvo.last_position is None:
+                janelas[alvo.name] = None
+                continue
+            crescimento = min(alvo.frames_lost, SEARCH_MAX_GROWTH_FRAMES)
+            raio = scaled_length((self.search_radius + crescimento * 10) * self.margin, frame_w)
+            centro = alvo.last_position
+            if centers and centers.get(alvo.name) is not None and alvo.frames_lost == 0:
+                centro = centers[alvo.name]
+            janelas[alvo.name] = (tracking_window(centro, raio, alvo.last_area, frame_w, frame_h), raio)
+        return janelas
+
+    def _tiles(self, frame, janelas):
+        """
+        Recortes do mosaico: [(donos, RoiFrame)]. As janelas dos alvos
+        rastreados, com as que se sobrepõem bastante unidas num recorte só (donos =
+        índices dos alvos), e, se algum alvo procura no frame inteiro
+        (Target.wide), uma faixa do frame reduzido como na busca em pirâmide
+        (donos vazio), uma só para todos eles. Se as janelas somam mais que o frame,
+        o recorte é o frame inteiro, de todos: o custo do mosaico nunca passa
+        do de segmentar o frame.
+        """
+        frame_h, frame_w = frame.shape[:2]
+        grupos = [((i,), janela[0]) for i, janela in enumerate(janelas.values()) if janela is not None]
+        unidos = True
+        while unidos:
+            unidos = False
+            for a in range(len(grupos)):
+                for b in range(a + 1, len(grupos)):
+                    (donos_a, (ax0, ay0, ax1, ay1)), (donos_b, (bx0, by0, bx1, by1)) = grupos[a], grupos[b]
+                    uniao = (min(ax0, bx0), min(ay0, by0), max(ax1, bx1), max(ay1, by1))
+                    # Une só quando o retângulo da união tem menos pixels que as duas janelas
+                    if ((uniao[2] - uniao[0]) * (uniao[3] - uniao[1])
+                            < (ax1 - ax0) * (ay1 - ay0) + (bx1 - bx0) * (by1 - by0)):
+                        grupos[a] = (donos_a + donos_b, uniao)
+                        del grupos[b]
+                        unidos = True
+                        break
+                if unidos:
+                    break
+        if sum((x1 - x0) * (y1 - y0) for _, (x0, y0, x1, y1) in grupos) >= frame_w * frame_h:
+            roi = RoiFrame(frame, None, mirror=self.mirror, scale=self.scale, workspace=self.workspace,
+                           slot='multi.0')
+            return [(tuple(range(len(self.targets))), roi)]
+        recortes = []
+        for n, (donos, janela) in enumerate(grupos):
+            roi = RoiFrame(frame, janela, mirror=self.mirror, scale=self.scale, workspace=self.workspace,
+                           slot=f'multi.{n}')
+            if not roi.empty:
+                recortes.append((donos, roi))
+        largos = [alvo for alvo in self.targets.values() if alvo.wide]
+        if largos:
+            fator = pyramid_factor(frame_w)
+            if self._full_scan:
+                # Cor nova ou reset: o primeiro frame procura no frame reduzido inteiro, como a captura
+                y0, y1 = 0, frame_h
+            else:
+                y0, y1 = self._band(frame_h, fator, max(alvo.last_area for alvo in largos))
+            recortes.append(((), RoiFrame(frame, (0, y0, frame_w, y1), mirror=self.mirror, scale=1.0 / fator,
+                                          workspace=self.workspace, slot='multi.coarse')))
+        self._full_scan = False
+        return recortes
+
+    def _band(self, frame_h, fator, area):
+        """
+        Linhas (y0, y1) da próxima faixa do rodízio, com sobreposição do
+        tamanho do objeto e alinhadas à redução (como Reacquirer._band).
+        """
+        indice = self._scan % SCAN_BANDS
+        self._scan += 1
+        altura = int(math.ceil(frame_h / float(SCAN_BANDS)))
+        sobra = int(math.sqrt(max(area, MIN_AREA_EXACT))) + 2 * fator
+        y0 = max(0, indice * altura - sobra)
+        y1 = min(frame_h, (indice + 1) * altura + sobra)
+        return y0 - y0 % fator, min(frame_h, y1 + (-y1) % fator)
+
+    def _mosaic(self, recortes, kernel):
+        """
+        Máscara dos recortes lado a lado numa imagem só, separados por colunas
+        de largura maior que o kernel: a morfologia não junta blobs de
+        recortes vizinhos. Cada recorte é convertido e classificado nos
+        próprios buffers (contíguos: cv2.inRange lendo e escrevendo em vistas
+        do mosaico custa ~50% a mais) e só a máscara é copiada para o lugar
+        dele. Retorna (máscara, x de cada recorte, unicos, rótulos): unicos[r]
+        é o alvo da única cor (exata) do recorte r, ou None; rótulos[r], a
+        imagem de rótulos do recorte (None com uma cor só).
+        """
+        alvos = list(self.targets.values())
+        espaco = kernel.shape[1] + 1
+        altura = max(roi.bgr.shape[0] for _, roi in recortes)
+        largura = sum(roi.bgr.shape[1] for _, roi in recortes) + espaco * (len(recortes) - 1)
+        forma = (altura, largura)
+        # Um recorte só: a máscara dele já é o mosaico
+        mosaico = None if len(recortes) == 1 else np.empty(forma, np.uint8) if self.workspace is None else \
+            self.workspace.array('multi.mask', forma)
+        inicios, unicos, rotulos = [], [], []
+        x = 0
+        for donos, roi in recortes:
+            h, w = roi.bgr.shape[:2]
+            # Recorte da janela: cores dos donos; faixa reduzida: cor exata de quem procura em tudo
+            if donos:
+                cores = [(i, alvos[i].tolerance > 0) for i in donos]
+            else:
+                cores = [(i, False) for i, alvo in enumerate(alvos) if alvo.wide]
+            if len(cores) == 1 and not cores[0][1]:
+                i = cores[0][0]
+                mask = roi.classify(*alvos[i].hsv_color)
+                unicos.append(i)
+                rotulos.append(None)
+            else:
+                hsv = roi.hsv
+                t0 = PROFILER.tic()
+                self._set_ranges(alvos)
+                tipo = self.classifier.dtype
+                canais = None if self.workspace is None else [roi.buffer(c, (h, w)) for c in 'hsv']
+                bits = self.classifier.classify(hsv, roi.buffer('labels', (h, w), tipo),
+                                                roi.buffer('labels_scratch', (h, w), tipo), canais)
+                mask = cv2.compare(bits, 0, cv2.CMP_GT, dst=roi.buffer('mask', (h, w)))
+                PROFILER.toc('mask', t0)
+                unicos.append(None)
+                rotulos.append(bits)
+            inicios.append(x)
+            if mosaico is None:
+                return mask, inicios, unicos, rotulos
+            mosaico[:h, x:x + w] = mask
+            # Fora dos recortes (colunas entre eles, sobra abaixo dos mais baixos) não há nada
+            mosaico[h:, x:x + w] = 0
+            mosaico[:, x + w:x + w + espaco] = 0
+            x += w + espaco
+        return mosaico, inicios, unicos, rotulos
+
+    def _set_ranges(self, alvos):
+        """Tabelas do LabelClassifier para as cores atuais (só remontadas quando mudam)."""
+        chave = tuple(alvo.key() for alvo in alvos)
+        if chave != self._ranges_key:
+            self.classifier.set_ranges([bit for alvo in alvos for bit in alvo.channels()], key=chave)
+            self._ranges_key = chave
+
+    def _blobs(self, recortes, inicios, unicos, rotulos, mask, contornos):
+        """
+        Blobs de cada alvo ({índice do alvo: [Blob]}) a partir dos contornos
+        do mosaico. Um blob com mais de um alvo vira um blob por alvo, com o
+        bbox só dos pixels da cor dele. Cada alvo aceita blobs do próprio
+        recorte e, se procura no frame inteiro, blobs da cor exata dos outros.
+        `unicos` e `rotulos`: por recorte, como em _mosaic.
+        """
+        alvos = list(self.targets.values())
+        n_alvos = len(alvos)
+        blobs = {i: [] for i in range(n_alvos)}
+        for k, contorno in enumerate(contornos):
+            x, y, w_box, h_box = cv2.boundingRect(contorno)
+            r = bisect.bisect_right(inicios, x) - 1
+            donos, roi = recortes[r]
+            escala = roi.scale * roi.scale
+            # No frame reduzido as bordas misturam cores: metade da área mínima (como na pirâmide)
+            reducao = 1.0 if donos else 0.5
+            min_exato = reducao * MIN_AREA_EXACT * roi.area_scale
+            min_similar = reducao * MIN_AREA_SIMILAR * roi.area_scale
+            # Ruído: nem o bbox inteiro chega à área mínima (sem momentos nem casco)
+            if w_box * h_box < min_similar * escala:
+                continue
+            stats = contour_stats(contorno)
+            if stats is None:
+                continue
+
+            if unicos[r] is not None:
+                # Uma cor só no recorte: todo pixel da máscara é dela
+                exatos = np.zeros(n_alvos)
+                exatos[unicos[r]] = cv2.countNonZero(mask[y:y + h_box, x:x + w_box]) / escala
+                totais = exatos
+            else:
+                # O fechamento pode passar um pouco da borda do recorte, onde não há rótulos
+                bits = rotulos[r][y:y + h_box, x - inicios[r]:x - inicios[r] + w_box]
+                dentro = mask[y:y + bits.shape[0], x:x + bits.shape[1]] > 0
+                contagem = _bit_counts(bits[dentro]) / escala
+                exatos = contagem[0:2 * n_alvos:2]
+                totais = np.maximum(exatos, contagem[1:2 * n_alvos:2])
+            presentes = [i for i in range(n_alvos) if totais[i] > min_similar and (
+                i in donos or (alvos[i].wide and exatos[i] > min_exato))]
+            vistos = {}
+            for i in presentes:
+                local = (x - inicios[r], y, w_box, h_box)
+                centro = (stats.position[0] - inicios[r], stats.position[1])
+                chave = k
+                if len(presentes) > 1:
+                    # Centróide e bbox só dos pixels da cor dele
+                    proprio = mask_stats((((bits & bits.dtype.type(3 << 2 * i)) > 0) & dentro).astype(np.uint8))
+                    (cx, cy), (bx, by, bw, bh) = proprio.position, proprio.bbox
+                    local = (local[0] + bx, y + by, bw, bh)
+                    centro = (local[0] - bx + cx, y + cy)
+                    # Alvos da mesma cor veem os mesmos pixels: um blob só, disputado
+                    chave = vistos.setdefault((local, totais[i]), (k, len(vistos)))
+                blobs[i].append(Blob(chave, roi.point_to_display(*centro), roi.to_display(local), float(totais[i]),
+                                     exatos[i] > min_exato))
+        return blobs
+
+    def process(self, frame, centers=None):
+        """
+        Processa um frame BGR cru e devolve {nome: TrackResult}, na ordem dos
+        alvos. `centers`: posição prevista de cada alvo ({nome: (x, y)}).
+        """
+        if not self.targets:
+            return {}
+        frame_h, frame_w = frame.shape[:2]
+        if self.workspace is not None:
+            self.workspace.reserve(frame.shape)
+
+        janelas = self._windows(frame_w, frame_h, centers)
+        recortes = self._tiles(frame, janelas)
+        alvos = list(self.targets.values())
+        blobs = {}
+        if recortes:
+            # Cada pixel convertido e classificado uma vez; uma limpeza e uma
+            # busca de contornos para todos
+            kernel = morph_kernel(int(frame_w * self.scale))
+            mask, inicios, unicos, rotulos = self._mosaic(recortes, kernel)
+            # RoiFrame do mosaico só pelos buffers e pela limpeza (a máscara já está pronta)
+            base = RoiFrame(mask, None, mirror=False, morphology=self.morphology, workspace=self.workspace,
+                            slot='multi')
+            base.kernel = kernel
+            mask = base.clean(mask)
+            t0 = PROFILER.tic()
+            contornos, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            blobs = self._blobs(recortes, inicios, unicos, rotulos, mask, contornos)
+            PROFILER.toc('contours', t0)
+
+        # Alvos rastreados escolhem primeiro (no recorte deles); os perdidos, no que sobrar
+        ordem = sorted(range(len(alvos)), key=lambda i: (alvos[i].last_position is None, alvos[i].wide))
+        usados = set()
+        resultados = {}
+        for i in ordem:
+            alvo = alvos[i]
+            janela = janelas[alvo.name]
+            max_area = SIMILAR_MAX_AREA_RATIO * max(alvo.last_area, MIN_AREA_EXACT * area_scale(frame_w, frame_h))
+            candidatos = [blob for blob in blobs.get(i, ()) if blob.key not in usados and (
+                blob.exact or (alvo.tolerance > 0 and alvo.last_position is not None and blob.area <= max_area))]
+            raio = janela[1] if janela is not None else 0
+            if candidatos:
+                blob = max(candidatos, key=lambda b: (b.exact, b.area))
+                usados.add(blob.key)
+                resultados[alvo.name] = self._found(alvo, blob, raio)
+            else:
+                resultados[alvo.name] = self._missed(alvo, raio)
+        return collections.OrderedDict((nome, resultados[nome]) for nome in self.targets)
+
+    def _found(self, alvo, blob, raio):
+        if blob.exact:
+            if alvo.last_position is None:
+                phase = PHASE_DETECTED
+            else:
+                phase = PHASE_DETECTED if alvo.frames_lost == 0 and alvo.frames_similar == 0 else PHASE_EXACT
+            alvo.tolerance = 0
+            alvo.frames_similar = 0
+        else:
+            phase = PHASE_SIMILAR
+            alvo.frames_similar += 1
+        alvo.last_position = blob.position
+        alvo.last_bbox = blob.bbox
+        alvo.last_area = blob.area
+        alvo.frames_lost = 0
+        return TrackResult(phase, blob.position, blob.bbox, blob.area, alvo.tolerance, raio, 0)
+
+    def _missed(self, alvo, raio):
+        if alvo.last_position is None:
+            return TrackResult(PHASE_LOST, None, None, None, 0, 0, 0)
+        alvo.frames_lost += 1
+        frames_lost = alvo.frames_lost
+        if frames_lost > self.max_lost_frames:
+            alvo.reset()
+            return TrackResult(PHASE_LOST, None, None, None, 0, raio, frames_lost)
+        # A cor similar abre um degrau por frame sem achar (no próximo frame)
+        alvo.tolerance = min(self.max_tolerance, alvo.tolerance + TOLERANCE_STEP)
+        return TrackResult(PHASE_SEARCHING, alvo.last_position, None, None, alvo.tolerance, raio, frames_lost)
+
+
+def multi_stage(targets=2, mirror=True, hsv_color=None, **kwargs):
+    """
+    Fábrica para pipeline.Stage, como tracker.tracker_stage, com um
+    MultiTracker de `targets` alvos (nomes 0, 1, ...). Cada 'set_color' vai
+    para o próximo alvo, em rodízio: o primeiro clique é o alvo 0 (o do
+    cursor), o segundo o alvo 1, e assim por diante; 'reset' esquece cores e
+    posições e o rodízio volta ao alvo 0. `hsv_color`: cor inicial do alvo 0
+    (perfil). kwargs vão para o MultiTracker.
+
+    Devolve o meta com as chaves de tracker_stage do alvo 0 ('result',
+    'hsv_color', 'base_color', 'last_area', 'track_s') e 'targets': o
+    TrackResult de cada alvo, na ordem (PHASE_LOST sem cor).
+    """
+    tracker = MultiTracker(mirror=mirror, **kwargs)
+    proximo = [0]
+    if hsv_color is not None:
+        tracker.add(0, hsv_color)
+        proximo[0] = 1 % targets
+
+    def track(frame, meta):
+        inicio = time.perf_counter()
+        if meta.get('quality'):
+            tracker.set_quality(**meta['quality'])
+        for command in meta.get('commands') or ():
+            if command[0] == 'set_color':
+                tracker.add(proximo[0], command[1])
+                proximo[0] = (proximo[0] + 1) % targets
+            elif command[0] == 'reset':
+                tracker.targets.clear()
+                proximo[0] = 0
+        principal = tracker.targets.get(0)
+        centro = meta.get('center')
+        centros = {0: centro} if centro is not None and principal is not None and \
+            principal.last_position is not None else None
+        resultados = tracker.process(frame, centros)
+        alvos = [resultados.get(i, _NO_TARGET) for i in range(targets)]
+        cor = principal.hsv_color if principal is not None else None
+        return dict(meta, result=alvos[0], targets=alvos, hsv_color=cor, base_color=cor,
+                    last_area=principal.last_area if principal is not None else 0,
+                    track_s=time.perf_counter() - inicio)
+
+    return track
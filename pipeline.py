@@ -0,0 +1,429 @@
+"""
+PIPELINE MULTI-NÚCLEO (etapas em threads ou processos com filas limitadas)
+Cada etapa roda nos seus próprios workers e passa o frame adiante por uma
+fila de tamanho limitado, então a etapa N do frame k roda ao mesmo tempo
+que a etapa N-1 do frame k+1 (o OpenCV solta o GIL, então threads já usam
+vários núcleos; processos isolam etapas em Python puro).
+
+Política das filas:
+    'latency'    - fila cheia descarta o item mais antigo (trabalho velho
+                   não atrasa o frame novo)
+    'throughput' - fila cheia bloqueia quem produz (nenhum frame é perdido)
+
+Uma etapa com vários workers devolve os itens na mesma ordem em que os
+recebeu, então etapas com estado (o Tracker) sempre veem os frames em
+ordem crescente de sequência.
+
+Em etapas de processo o frame vai por memória compartilhada (SharedFrameRing):
+só o índice do slot e os metadados passam pela fila.
+Os tempos que o PROFILER mede dentro do processo (hsv, mask, contours...)
+voltam com cada item e entram no PROFILER do processo principal.
+
+Uso:
+    pipe = Pipeline([Stage('track', make_track), Stage('compose', make_compose, workers=2)],
+                    policy='latency').start()
+    pipe.submit(seq, frame, meta)
+    item = pipe.get(timeout=0.5)   # (seq, frame, meta) ou None
+"""
+
+import collections
+import multiprocessing
+import multiprocessing.shared_memory
+import queue
+import threading
+import time
+
+import numpy as np
+
+from instrumentation import PROFILER
+
+
+POLICIES = ('latency', 'throughput')
+
+# Item que passa entre as etapas. meta é o que cada etapa devolve.
+Item = collections.namedtuple('Item', ['seq', 'frame', 'meta'])
+
+
+class Stage:
+    """
+    Etapa do pipeline. `factory()` é chamada uma vez dentro de cada worker
+    (thread ou processo) e devolve fn(frame, meta) -> novo meta. Com
+    process=True, factory precisa ser importável (função de módulo) e o
+    meta, serializável.
+    """
+
+    def __init__(self, name, factory, workers=1, process=False):
+        self.name = name
+        self.factory = factory
+        self.workers = max(1, int(workers))
+        self.process = process
+
+
+class _BoundedQueue:
+    """Fila limitada; cheia, descarta o mais antigo (drop_oldest) ou bloqueia."""
+
+    def __init__(self, maxsize, drop_oldest, on_drop=None):
+        self.maxsize = max(1, int(maxsize))
+        self.drop_oldest = drop_oldest
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._ticket = 0
+
+    def put(self, item):
+        descartado = None
+        with self._cond:
+            while len(self._items) >= self.maxsize and not self._closed:
+                if self.drop_oldest:
+                    descartado = self._items.popleft()
+                    self.dropped += 1
+                    break
+                self._cond.wait(0.1)
+            if self._closed:
+                return
+            self._items.append(item)
+            self._cond.notify_all()
+        if descartado is not None and self.on_drop is not None:
+            self.on_drop(descartado)
+
+    def get(self, timeout=None):
+        """Próximo item e seu número de ordem (contínuo: 0, 1, 2...), ou (None, None)."""
+        fim = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while not self._items:
+                if self._closed:
+                    return None, None
+                resta = None if fim is None else fim - time.perf_counter()
+                if resta is not None and resta <= 0:
+                    return None, None
+                self._cond.wait(resta)
+            item = self._items.popleft()
+            ticket = self._ticket
+            self._ticket += 1
+            self._cond.notify_all()
+            return item, ticket
+
+    def __len__(self):
+        return len(self._items)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class _Reorder:
+    """Entrega os itens na ordem dos tickets, mesmo que os workers terminem fora de ordem."""
+
+    def __init__(self, emit):
+        self.emit = emit
+        self._next = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def push(self, ticket, item):
+        with self._lock:
+            self._pending[ticket] = item
+            while self._next in self._pending:
+                self.emit(self._pending.pop(self._next))
+                self._next += 1
+
+
+class SharedFrameRing:
+    """
+    `slots` frames de mesmo formato num bloco de memória compartilhada.
+    acquire() reserva um slot livre, o consumidor devolve com release().
+    """
+
+    def __init__(self, shape, dtype=np.uint8, slots=4):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = int(slots)
+        nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = multiprocessing.shared_memory.SharedMemory(create=True, size=nbytes * self.slots)
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+
+    @property
+    def spec(self):
+        """O que um processo precisa para abrir o mesmo bloco (ver attach)."""
+        return self.shm.name, self.shape, self.dtype.str, self.slots
+
+    def acquire(self, timeout=None):
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put(self, image, timeout=None):
+        """Copia `image` para um slot livre e devolve o índice (None se não houver)."""
+        slot = self.acquire(timeout)
+        if slot is not None:
+            np.copyto(self.frames[slot], image)
+        return slot
+
+    def release(self, slot):
+        self._free.put(slot)
+
+    def close(self):
+        del self.frames
+        self.shm.close()
+        self.shm.unlink()
+
+    @staticmethod
+    def attach(spec):
+        """(shm, frames) no processo worker a partir de `spec`."""
+        name, shape, dtype, slots = spec
+        shm = multiprocessing.shared_memory.SharedMemory(name=name)
+        frames = np.ndarray((slots,) + tuple(shape), dtype=np.dtype(dtype), buffer=shm.buf)
+        return shm, frames
+
+
+def _process_worker(factory, inq, outq, profile=False):
+    """
+    Laço de um worker de processo: frame do slot -> fn -> (ticket, slot, meta,
+    erro, amostras). O processo sobe antes do primeiro frame; o anel é aberto
+    na primeira tarefa. Com `profile`, o PROFILER deste processo fica ligado e
+    as amostras de cada item voltam junto (None desligado).
+    """
+    PROFILER.enabled = profile
+    if profile:
+        PROFILER.log = []
+    fn = factory()
+    outq.put(None)   # pronto
+    spec = shm = frames = None
+    try:
+        while True:
+            tarefa = inq.get()
+            if tarefa is None:
+                break
+            ticket, slot, meta, ring = tarefa
+            if ring != spec:
+                if shm is not None:
+                    del frames
+                    shm.close()
+                    shm = None
+                spec = ring
+                shm, frames = SharedFrameRing.attach(spec)
+            try:
+                meta = fn(frames[slot], meta)
+                outq.put((ticket, slot, meta, None, PROFILER.drain() if profile else None))
+            except Exception as e:
+                outq.put((ticket, slot, None, repr(e), None))
+    finally:
+        if shm is not None:
+            del frames
+            shm.close()
+
+
+class _StageRunner:
+    """Workers de uma etapa: consomem `inq`, aplicam fn e entregam em ordem para `emit`."""
+
+    def __init__(self, stage, inq, emit, pipeline):
+        self.stage = stage
+        self.inq = inq
+        self.pipeline = pipeline
+        self.reorder = _Reorder(emit)
+        self.processed = 0
+        self.busy = 0.0
+        self._threads = []
+        self._procs = []
+        self._ring = None
+        self._frames = {}    # processos: ticket -> frame original (fica no processo principal)
+
+    def start(self):
+        if self.stage.process:
+            self._start_processes()
+        else:
+            for i in range(self.stage.workers):
+                t = threading.Thread(target=self._thread_loop, name=f'{self.stage.name}-{i}', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _done(self, ticket, item, meta, seconds):
+        self.processed += 1
+        self.busy += seconds
+        self.reorder.push(ticket, Item(item.seq, item.frame, meta))
+
+    def _thread_loop(self):
+        fn = self.stage.factory()
+        while True:
+            item, ticket = self.inq.get()
+            if item is None:
+                return
+            inicio = time.perf_counter()
+            try:
+                meta = fn(item.frame, item.meta)
+            except Exception as e:
+                self.pipeline._fail(self.stage.name, e)
+                return
+            self._done(ticket, item, meta, time.perf_counter() - inicio)
+
+    def _start_processes(self):
+        ctx = multiprocessing.get_context('spawn')
+        self._inq = ctx.Queue()
+        self._outq = ctx.Queue()
+        # Os processos sobem já; o anel é criado no primeiro item (formato do frame)
+        for _ in range(self.stage.workers):
+            # O PROFILER do processo novo nasce desligado: o estado vai junto
+            p = ctx.Process(target=_process_worker,
+                            args=(self.stage.factory, self._inq, self._outq, PROFILER.enabled), daemon=True)
+            p.start()
+            self._procs.append(p)
+        # Esperar os workers subirem (importar OpenCV etc.) antes do primeiro frame
+        prontos = 0
+        while prontos < len(self._procs):
+            try:
+                self._outq.get(timeout=0.5)
+                prontos += 1
+            except queue.Empty:
+                if not all(p.is_alive() for p in self._procs):
+                    raise RuntimeError(f'worker da etapa {self.stage.name!r} encerrou ao iniciar')
+
+        feeder = threading.Thread(target=self._feed_loop, name=f'{self.stage.name}-feed',
+                                  daemon=True)
+        feeder.start()
+        pump = threading.Thread(target=self._pump_loop, name=f'{self.stage.name}-pump', daemon=True)
+        pump.start()
+        self._threads += [feeder, pump]
+
+    def _feed_loop(self):
+        while True:
+            item, ticket = self.inq.get()
+            if item is None:
+                break
+            if self._ring is None:
+                # Slots suficientes para cada worker ter um frame em uso e um na fila
+                self._ring = SharedFrameRing(item.frame.shape, item.frame.dtype,
+                                             slots=2 * self.stage.workers + 2)
+            slot = None
+            while slot is None and not self.pipeline._closed:
+                slot = self._ring.put(item.frame, timeout=0.1)
+            if slot is None:
+                break
+            self._frames[ticket] = (item, time.perf_counter())
+            self._inq.put((ticket, slot, item.meta, self._ring.spec))
+        for _ in self._procs:
+            self._inq.put(None)
+
+    def _pump_loop(self):
+        while True:
+            try:
+                resposta = self._outq.get(timeout=0.1)
+            except queue.Empty:
+                if self.pipeline._closed and not self._frames:
+                    return
+                if self._procs and not any(p.is_alive() for p in self._procs):
+                    if not self.pipeline._closed:
+                        self.pipeline._fail(self.stage.name, RuntimeError('workers encerraram'))
+                    return
+                continue
+            ticket, slot, meta, erro, amostras = resposta
+            for etapa, segundos in amostras or ():
+                PROFILER.record(etapa, segundos)
+            self._ring.release(slot)
+            item, inicio = self._frames.pop(ticket)
+            if erro is not None:
+                self.pipeline._fail(self.stage.name, RuntimeError(erro))
+                return
+            self._done(ticket, item, meta, time.perf_counter() - inicio)
+
+    def stop(self, timeout=1.0):
+        me = threading.current_thread()
+        for t in self._threads:
+            if t is me:
+                continue
+            t.join(timeout)
+        for p in self._procs:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+
+
+class Pipeline:
+    """
+    Etapas em sequência com filas limitadas de `depth` itens entre elas.
+    on_drop(item) é chamado para cada item descartado na entrada da primeira
+    etapa (política 'latency'). Os descartados mais adiante já passaram por
+    ela: o que ela consumiu do meta (comandos) não pode ser entregue de novo.
+    """
+
+    def __init__(self, stages, policy='latency', depth=1, on_drop=None):
+        if policy not in POLICIES:
+            raise ValueError(f"política desconhecida: {policy!r} (opções: {', '.join(POLICIES)})")
+        self.stages = list(stages)
+        self.policy = policy
+        self.on_drop = on_drop
+        drop = policy == 'latency'
+        self._queues = [_BoundedQueue(depth, drop, on_drop if i == 0 else None) for i in range(len(self.stages))]
+        # Saída: com 'latency' o consumidor só quer o resultado mais novo
+        self._output = _BoundedQueue(depth if drop else max(depth, 2), drop)
+        self._runners = []
+        for i, stage in enumerate(self.stages):
+            destino = self._queues[i + 1] if i + 1 < len(self.stages) else self._output
+            self._runners.append(_StageRunner(stage, self._queues[i], destino.put, self))
+        self._closed = False
+        self.error = None
+        self.submitted = 0
+
+    def start(self):
+        for runner in self._runners:
+            runner.start()
+        return self
+
+    def _fail(self, stage, exc):
+        if self.error is None:
+            self.error = RuntimeError(f'etapa {stage!r} falhou: {exc!r}')
+        self._close_queues()
+
+    def _close_queues(self):
+        self._closed = True
+        for q in self._queues:
+            q.close()
+        self._output.close()
+
+    def submit(self, seq, frame, meta=None):
+        """Entrega um frame à primeira etapa (bloqueia só na política 'throughput')."""
+        if self.error is not None:
+            raise self.error
+        self.submitted += 1
+        self._queues[0].put(Item(seq, frame, meta))
+
+    def get(self, timeout=None):
+        """Próximo resultado da última etapa, em ordem de sequência, ou None."""
+        item, _ = self._output.get(timeout)
+        if item is None and self.error is not None:
+            raise self.error
+        return item
+
+    def stats(self):
+        """{etapa: {processed, dropped, queued, busy_ms}} + descartes da saída."""
+        result = {}
+        for stage, q, runner in zip(self.stages, self._queues, self._runners):
+            result[stage.name] = {
+                'processed': runner.processed,
+                'dropped': q.dropped,
+                'queued': len(q),
+                'busy_ms': round(runner.busy / max(1, runner.processed) * 1000.0, 3),
+            }
+        result['output'] = {'dropped': self._output.dropped, 'queued': len(self._output)}
+        return result
+
+    def close(self, timeout=1.0):
+        """Encerra os workers (itens ainda nas filas são abandonados)."""
+        self._close_queues()
+        for runner in self._runners:
+            runner.stop(timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
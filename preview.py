@@ -0,0 +1,290 @@
+"""
+PRÉVIA DA JANELA (renderização com orçamento, separada do rastreamento)
+O frame exibido é só para o usuário: espelhar, desenhar o resultado e a
+legenda e mandar para o cv2.imshow custa tanto quanto a detecção numa janela
+pequena. O PreviewRenderer decide, frame a frame, se a prévia é desenhada:
+
+  - janela escondida (modo mouse virtual): nenhum trabalho de prévia;
+  - visível: no máximo `fps` prévias por segundo (0 = todo frame) e numa
+    resolução reduzida por `scale` (o rastreamento continua em resolução cheia).
+
+O frame da prévia é escrito num buffer reaproveitado (o loop serial passa o
+`out`), e os textos fixos (legenda, avisos, faixa HSV) são rasterizados uma
+única vez (TextCache) e depois só copiados por máscara.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from colormodel import range_key
+from instrumentation import PROFILER
+from tracker import PHASE_DETECTED, PHASE_EXACT, PHASE_FLOW, PHASE_LOST, PHASE_SEARCHING, PHASE_SIMILAR
+
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Folga (fração do intervalo) ao comparar com o horário da próxima prévia: com
+# fps igual ao da câmera, a variação entre frames não faz pular prévias
+DUE_SLACK = 0.25
+
+
+class TextCache:
+    """
+    Textos rasterizados uma vez e depois só compostos sobre o frame. O
+    cv2.putText suaviza as bordas, então cada texto vira um sprite com
+    transparência: cor já multiplicada pela cobertura (premultiplicada) e
+    o complemento da cobertura; desenhar é multiply + add no recorte. Para
+    textos fixos ou que mudam pouco (legenda, faixa HSV) - contadores que
+    mudam a cada frame continuam com cv2.putText.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._sprites = {}
+        self.rasterized = 0
+
+    def _sprite(self, text, font, scale, color, thickness):
+        key = (text, font, scale, color, thickness)
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            (w, h), base = cv2.getTextSize(text, font, scale, thickness)
+            # getTextSize não conta tudo (parênteses, acentos, espessura):
+            # desenhar com folga e recortar nos pixels acesos
+            pad = h + thickness + 2
+            tela = np.zeros((h + base + 2 * pad, w + 2 * pad), dtype=np.uint8)
+            cv2.putText(tela, text, (pad, pad + h), font, scale, 255, thickness)
+            x, y, w_box, h_box = cv2.boundingRect(tela)
+            cobertura = cv2.cvtColor(tela[y:y + h_box, x:x + w_box], cv2.COLOR_GRAY2BGR)
+            bloco = np.empty(cobertura.shape, dtype=np.uint8)
+            bloco[:] = color
+            cor = cv2.multiply(bloco, cobertura, scale=1.0 / 255)
+            resto = cv2.subtract(255, cobertura)
+            if len(self._sprites) >= self.max_entries:
+                # Descartar o mais antigo
+                self._sprites.pop(next(iter(self._sprites)))
+            # Deslocamento do canto do recorte em relação à origem do texto
+            sprite = self._sprites[key] = (cor, resto, x - pad, y - pad - h)
+            self.rasterized += 1
+        return sprite
+
+    def put(self, img, text, org, font, scale, color, thickness=1):
+        """Como cv2.putText (mesma origem, na linha de base), mas do cache."""
+        cor, resto, dx, dy = self._sprite(text, font, scale, tuple(color), thickness)
+        x0, y0 = org[0] + dx, org[1] + dy
+        # Parte do texto que cabe na imagem
+        fx0, fy0 = max(0, x0), max(0, y0)
+        fx1, fy1 = min(img.shape[1], x0 + cor.shape[1]), min(img.shape[0], y0 + cor.shape[0])
+        if fx1 <= fx0 or fy1 <= fy0:
+            return
+        recorte = (slice(fy0 - y0, fy1 - y0), slice(fx0 - x0, fx1 - x0))
+        destino = img[fy0:fy1, fx0:fx1]
+        cv2.multiply(destino, resto[recorte], dst=destino, scale=1.0 / 255)
+        cv2.add(destino, cor[recorte], dst=destino)
+
+
+class PreviewRenderer:
+    """
+    Prévia da janela. `visible` = False (janela escondida) desliga tudo;
+    due() diz se o frame atual ganha prévia; compose() desenha.
+
+    fps:        prévias por segundo com a janela visível (0 = todo frame)
+    scale:      fator da resolução da prévia (cliques na janela são
+                convertidos de volta com to_frame)
+    cache_text: textos fixos do TextCache (False = cv2.putText sempre)
+    """
+
+    def __init__(self, fps=0, scale=1.0, cache_text=True):
+        self.fps = float(fps or 0)
+        self.scale = min(1.0, max(0.1, float(scale)))
+        self.text = TextCache() if cache_text else None
+        self.visible = True
+        self.rendered = 0
+        self.skipped = 0
+        self._next = None
+
+    def due(self, now):
+        """O frame do instante `now` (s) ganha prévia? Conta desenhadas/puladas."""
+        if not self.visible:
+            self.skipped += 1
+            return False
+        if self.fps > 0:
+            intervalo = 1.0 / self.fps
+            if self._next is not None and now < self._next - DUE_SLACK * intervalo:
+                self.skipped += 1
+                return False
+            # Atrasou mais de um intervalo (janela acabou de voltar): recomeça daqui
+            proximo = (self._next or now) + intervalo
+            self._next = proximo if proximo > now else now + intervalo
+        self.rendered += 1
+        return True
+
+    def shape(self, frame_shape):
+        """Forma (altura, largura, canais) do frame da prévia para um frame cru."""
+        h, w = frame_shape[:2]
+        if self.scale < 1.0:
+            h, w = max(1, int(round(h * self.scale))), max(1, int(round(w * self.scale)))
+        return (h, w) + tuple(frame_shape[2:])
+
+    def to_frame(self, x, y):
+        """Ponto da janela (prévia) -> frame exibido em resolução cheia."""
+        if self.scale < 1.0:
+            return int(x / self.scale), int(y / self.scale)
+        return x, y
+
+    def base(self, frame_raw, out=None):
+        """Frame cru espelhado (e reduzido) em `out`, se dado."""
+        t0 = PROFILER.tic()
+        if self.scale < 1.0:
+            h, w = self.shape(frame_raw.shape)[:2]
+            imagem = cv2.resize(frame_raw, (w, h), dst=out, interpolation=cv2.INTER_AREA)
+            imagem = cv2.flip(imagem, 1, dst=imagem)
+        else:
+            imagem = cv2.flip(frame_raw, 1, dst=out)
+        PROFILER.toc('flip', t0)
+        return imagem
+
+    def _put(self, img, text, org, scale, color, thickness=1, font=FONT, static=False):
+        """Texto na prévia; `static` = texto que se repete (vem do cache)."""
+        if static and self.text is not None:
+            self.text.put(img, text, org, font, scale, color, thickness)
+        else:
+            cv2.putText(img, text, org, font, scale, color, thickness)
+
+    def _scaled(self, result):
+        """TrackResult nas coordenadas da prévia."""
+        s = self.scale
+        if s >= 1.0 or result.position is None:
+            return result
+        mudancas = {'position': (result.position[0] * s, result.position[1] * s),
+                    'search_radius': int(result.search_radius * s)}
+        if result.bbox is not None:
+            mudancas['bbox'] = tuple(int(round(c * s)) for c in result.bbox)
+        if result.box is not None:
+            (cx, cy), (w, h), angulo = result.box
+            mudancas['box'] = ((cx * s, cy * s), (w * s, h * s), angulo)
+        return result._replace(**mudancas)
+
+    def draw_result(self, img, result, detail='full'):
+        """
+        Desenha na prévia o resultado do rastreamento (cores por fase).
+        detail='minimal' desenha só bbox/centro, sem textos nem círculo de busca.
+        """
+        minimal = detail == 'minimal'
+        if result.phase == PHASE_LOST:
+            if result.frames_lost and not minimal:
+                # Acabou de desistir depois de muitos frames sem detecção
+                self._put(img, 'OBJETO PERDIDO!', (50, 100), 1.2, (0, 0, 255), 2, static=True)
+                self._put(img, 'Clique novamente para capturar', (50, 140), 0.8, (0, 0, 255), static=True)
+            return
+
+        raio = result.search_radius     # px do frame cheio, para o texto
+        result = self._scaled(result)
+        # Centróide sub-pixel: o desenho do OpenCV só aceita pixels inteiros
+        cx, cy = int(round(result.position[0])), int(round(result.position[1]))
+        if result.phase == PHASE_SEARCHING:
+            cv2.circle(img, (cx, cy), 10, (0, 0, 255), 2)
+            if minimal:
+                return
+            cv2.circle(img, (cx, cy), result.search_radius, (0, 0, 255), 2)
+            self._put(img, f'PROCURANDO ({result.frames_lost}/60)', (50, 50), 0.9, (0, 0, 255), 2)
+            self._put(img, f'Tol: +{result.tolerance}  Raio: {raio}px', (50, 80),
+                      0.6, (0, 0, 255))
+            return
+
+        x, y, w, h_bbox = result.bbox
+        if result.phase == PHASE_DETECTED:
+            cor, texto = (0, 255, 0), f'DETECTADO - Area: {int(result.area)} px'
+        elif result.phase == PHASE_EXACT:
+            cor, texto = (0, 255, 255), 'RASTREANDO (Exato)'
+        elif result.phase == PHASE_FLOW:
+            cor, texto = (255, 0, 255), f'RASTREANDO (Fluxo {result.confidence:.0%})'
+        else:
+            cor, texto = (255, 140, 0), 'RASTREANDO (Similar)'
+
+        cv2.rectangle(img, (x, y), (x + w, y + h_bbox), cor, 3)
+        cv2.circle(img, (cx, cy), 8, cor, -1)
+        if minimal:
+            return
+        if result.box is not None and result.phase != PHASE_FLOW:
+            # Caixa girada do CamShift e confiança
+            cv2.polylines(img, [cv2.boxPoints(result.box).astype('int32')], True, (255, 255, 255), 1)
+            texto += f' ({result.confidence:.0%})'
+        if result.phase != PHASE_DETECTED:
+            cv2.circle(img, (cx, cy), result.search_radius, cor, 2)
+        self._put(img, texto, (x, y - 15), 0.7, cor, 2)
+        if result.phase == PHASE_SIMILAR:
+            self._put(img, f'Tolerancia: +{result.tolerance}', (x, y + h_bbox + 20), 0.5, cor)
+
+    def draw_targets(self, img, results):
+        """Alvos além do primeiro (--targets): bbox/centro como em 'minimal' e o número do alvo."""
+        for alvo, result in enumerate(results[1:], start=2):
+            if result.position is None:
+                continue
+            self.draw_result(img, result, 'minimal')
+            cx, cy = self._scaled(result).position
+            self._put(img, str(alvo), (int(cx) + 12, int(cy) - 12), 0.7, (255, 255, 255), 2, static=True)
+
+    def compose(self, frame_raw, meta, out=None):
+        """
+        Prévia: espelha (e reduz) o frame cru e desenha resultado, faixa HSV e
+        legenda. Só lê `meta`, então pode rodar em várias threads do pipeline.
+        meta['render'] = False (due() disse não): nada é desenhado e 'display'
+        fica None. meta['overlay'] (governador): 'reduced' tira faixa HSV e
+        legenda, 'minimal' também os textos do resultado. `out`: buffer
+        reaproveitado (forma de shape(); só no loop serial, que mostra o
+        frame antes do próximo).
+        """
+        if not meta.get('render', True):
+            return dict(meta, display=None, compose_s=0.0)
+        inicio = time.perf_counter()
+        detail = meta.get('overlay', 'full')
+        img = self.base(frame_raw, out)
+        altura = img.shape[0]
+
+        t0 = PROFILER.tic()
+        if meta.get('targets'):
+            self.draw_targets(img, meta['targets'])
+        # Se cor foi capturada
+        if meta['hsv_color'] is not None:
+            lower, upper = meta['hsv_color']
+            self.draw_result(img, meta['result'], detail)
+            if detail == 'full':
+                # Info HSV (muda só com a cor: do cache)
+                info_text = (f"H:{int(lower[0])}-{int(upper[0])} S:{int(lower[1])}-{int(upper[1])} "
+                             f"V:{int(lower[2])}-{int(upper[2])}")
+                base = meta.get('base_color')
+                if base is not None and range_key(*base) != range_key(lower, upper):
+                    info_text += ' (adaptada)'
+                self._put(img, info_text, (15, altura - 20), 0.5, (200, 200, 200), static=True)
+        else:
+            self._put(img, 'CLIQUE no objeto para capturar sua cor', (30, 80), 1.1, (0, 165, 255), 2,
+                      static=True)
+            self._put(img, 'Sistema procurara por cores similares!', (30, 120), 0.8, (255, 200, 0), 2,
+                      static=True)
+
+        # Frames descartados pela captura (processamento mais lento que a câmera)
+        if meta['perdidos'] and detail != 'minimal':
+            self._put(img, f"Frames perdidos: {meta['perdidos']} (total {meta['dropped_total']})",
+                      (img.shape[1] - 330, 30), 0.5, (0, 165, 255))
+
+        # Legenda
+        if detail == 'full':
+            self._put(img, 'R: Reset | ESC: Sair', (15, altura - 40), 0.6, (200, 200, 200), static=True)
+            self._put(img, 'Verde=Detectado | Amarelo=Exato | Azul=Similar | Vermelho=Procurando',
+                      (15, altura - 60), 0.5, (150, 150, 150), static=True)
+        if meta['hud']:
+            PROFILER.draw_hud(img)
+            if meta.get('governor'):
+                cv2.putText(img, meta['governor'], (10, altura - 80), cv2.FONT_HERSHEY_PLAIN, 0.9,
+                            (255, 255, 255), 1)
+            if meta.get('skipped_tiles') is not None:
+                cv2.putText(img, f"segmentacao incremental: {meta['skipped_tiles'] * 100:.0f}% dos blocos do cache",
+                            (10, altura - 95), cv2.FONT_HERSHEY_PLAIN, 0.9, (255, 255, 255), 1)
+        PROFILER.toc('overlay', t0)
+        return dict(meta, display=img, compose_s=time.perf_counter() - inicio)
+
+    def metrics(self):
+        return {'rendered': self.rendered, 'skipped': self.skipped, 'scale': self.scale, 'fps': self.fps,
+                'text_rasterized': self.text.rasterized if self.text is not None else None}
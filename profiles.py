@@ -0,0 +1,196 @@
+"""
+PERFIS DE CALIBRAÇÃO (início rápido sem clicar na cor)
+Um perfil guarda, por câmera e usuário, o que foi aprendido numa sessão:
+o modelo de cor (range HSV e, com o modelo 'histogram', o histograma H-S)
+e as configurações da câmera (resolução e FPS pedidos). O ajuste do
+rastreador (classificador, modelo de cor, intervalo do fluxo óptico,
+orçamento do governador, adaptação da cor, reaquisição, segmentação
+incremental) só é gravado quando pedido (wave.py --save-tuning): opções de
+uma execução não viram padrão das seguintes. Na próxima execução o
+rastreador já nasce com a cor - um quiosque que reinicia depois de uma
+queda volta a rastrear no primeiro frame.
+
+Sem perfil salvo, a cor inicial vem do .env (H_MIN ... V_MAX), se houver.
+
+Perfis ficam em <pasta>/<câmera>/<usuário>.json (JSON legível, pode ser
+editado à mão). A pasta padrão é %APPDATA%\\wave\\profiles no Windows e
+$XDG_CONFIG_HOME/wave/profiles (~/.config/...) nos outros sistemas; a
+variável WAVE_PROFILES sobrepõe.
+"""
+
+import getpass
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from colormodel import HUE_MAX
+
+
+PROFILE_VERSION = 1
+
+# Ajuste do rastreador quando nem a linha de comando nem o perfil dizem nada
+DEFAULT_TUNING = {'classifier': 'hsv', 'color_model': 'range', 'flow_interval': 0, 'budget_ms': None,
+                  'adapt_color': False, 'reacquire': True, 'incremental': False}
+
+# Câmera pedida quando o perfil não diz nada
+DEFAULT_CAMERA = {'width': 1280, 'height': 720, 'fps': 30}
+
+# Chaves do .env com o range da cor (mesma ordem de lower + upper)
+ENV_KEYS = ('H_MIN', 'S_MIN', 'V_MIN', 'H_MAX', 'S_MAX', 'V_MAX')
+
+
+def default_dir():
+    """Pasta padrão dos perfis (ver docstring do módulo)."""
+    if os.environ.get('WAVE_PROFILES'):
+        return os.environ['WAVE_PROFILES']
+    if os.name == 'nt' and os.environ.get('APPDATA'):
+        return os.path.join(os.environ['APPDATA'], 'wave', 'profiles')
+    base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'wave', 'profiles')
+
+
+def default_user():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return 'default'
+
+
+def _safe_name(text):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(text)).strip('._') or 'default'
+
+
+def camera_key(source):
+    """Nome da câmera no perfil: 'camera0' para o índice 0, senão o nome do arquivo/fonte."""
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return f'camera{int(source)}'
+    if hasattr(source, 'read'):
+        return _safe_name(type(source).__name__)
+    return _safe_name(os.path.basename(os.path.normpath(str(source))))
+
+
+def calibration(hsv_color, hist=None):
+    """Modelo de cor do rastreador (range e histograma opcional) em forma de JSON."""
+    lower, upper = hsv_color
+    dados = {'lower': [int(c) for c in lower], 'upper': [int(c) for c in upper]}
+    if hist is not None:
+        # float32 -> float do Python é exato: o histograma volta bit a bit igual
+        dados['hist'] = {'bins': list(hist.shape[:2]), 'values': [float(v) for v in hist.ravel()]}
+    return dados
+
+
+def tracker_color(data):
+    """
+    Inverso de calibration(): {'hsv_color': (lower, upper), 'hist': array ou
+    None}, os argumentos de Tracker / tracker_stage. None se `data` não tem cor.
+    """
+    if not data or 'lower' not in data or 'upper' not in data:
+        return None
+    lower = np.array(data['lower'], dtype=np.uint8)
+    upper = np.array(data['upper'], dtype=np.uint8)
+    hist = None
+    if data.get('hist'):
+        bins = tuple(data['hist']['bins'])
+        hist = np.array(data['hist']['values'], dtype=np.float32).reshape(bins)
+    return {'hsv_color': (lower, upper), 'hist': hist}
+
+
+def read_env(path):
+    """Variáveis de um arquivo .env (KEY=valor, aspas opcionais, # comenta). {} se não existe."""
+    valores = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            linhas = f.read().splitlines()
+    except OSError:
+        return valores
+    for linha in linhas:
+        linha = linha.strip()
+        if not linha or linha.startswith('#') or '=' not in linha:
+            continue
+        chave, valor = linha.split('=', 1)
+        chave = chave.strip()
+        if chave.startswith('export '):
+            chave = chave[len('export '):].strip()
+        valor = valor.strip()
+        if len(valor) >= 2 and valor[0] == valor[-1] and valor[0] in '\'"':
+            valor = valor[1:-1]
+        valores[chave] = valor
+    return valores
+
+
+def env_calibration(env):
+    """Range H_MIN ... V_MAX do .env no formato de calibration(); None se faltar algum."""
+    try:
+        valores = [int(float(env[k])) for k in ENV_KEYS]
+    except (KeyError, ValueError):
+        return None
+    # Hue do .env pode vir em 0-180 (H_MAX=180 para vermelhos): o OpenCV vai até 179
+    h_min, s_min, v_min, h_max, s_max, v_max = valores
+    lower = [min(max(h_min, 0), HUE_MAX - 1), min(max(s_min, 0), 255), min(max(v_min, 0), 255)]
+    upper = [min(max(h_max, 0), HUE_MAX - 1), min(max(s_max, 0), 255), min(max(v_max, 0), 255)]
+    return {'lower': lower, 'upper': upper}
+
+
+def find_env(*dirs):
+    """Primeiro .env encontrado nas pastas dadas (padrão: pasta atual e a do programa)."""
+    for pasta in dirs or (os.getcwd(), os.path.dirname(os.path.abspath(__file__))):
+        path = os.path.join(pasta, '.env')
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def resolve(profile, defaults, **explicit):
+    """
+    Valor de cada opção: o da linha de comando (`explicit`, None = não
+    informado), senão o do perfil (`profile`, dict), senão o de `defaults`.
+    """
+    profile = profile or {}
+    return {chave: explicit[chave] if explicit.get(chave) is not None else profile.get(chave, padrao)
+            for chave, padrao in defaults.items()}
+
+
+class ProfileStore:
+    """Perfis em <directory>/<câmera>/<usuário>.json."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_dir()
+
+    def path(self, camera, user):
+        return os.path.join(self.directory, _safe_name(camera), _safe_name(user) + '.json')
+
+    def load(self, camera, user):
+        """Perfil salvo (dict) ou None. Arquivo corrompido ou de outra versão conta como ausente."""
+        try:
+            with open(self.path(camera, user), encoding='utf-8') as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(profile, dict) or profile.get('version') != PROFILE_VERSION:
+            return None
+        return profile
+
+    def save(self, camera, user, profile):
+        """Grava o perfil (escreve num temporário e troca: uma queda no meio não corrompe o anterior)."""
+        path = self.path(camera, user)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        dados = dict(profile, version=PROFILE_VERSION, camera_key=camera, user=user, saved=time.time())
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=1)
+        os.replace(tmp, path)
+        return path
+
+    def list(self):
+        """(câmera, usuário) de todos os perfis salvos."""
+        perfis = []
+        if not os.path.isdir(self.directory):
+            return perfis
+        for camera in sorted(os.listdir(self.directory)):
+            pasta = os.path.join(self.directory, camera)
+            if os.path.isdir(pasta):
+                perfis.extend((camera, nome[:-5]) for nome in sorted(os.listdir(pasta)) if nome.endswith('.json'))
+        return perfis
@@ -0,0 +1,190 @@
+"""
+PUBLICAÇÃO DO RASTREAMENTO PARA OUTROS PROCESSOS (memória compartilhada / UDP)
+Com --publish, o wave.py escreve cada resultado (seq, instante da captura,
+posição, bbox, área, fase, confiança) num anel em memória compartilhada; com
+--publish-udp HOST:PORTA, também num datagrama UDP por resultado. A
+interface do quiosque, o reconhecedor de gestos ou o logger leem o fluxo com
+subscriber.py (TrackSubscriber / UdpSubscriber) sem abrir a câmera.
+
+O formato (registro, cabeçalho, slots) está em subscriber.py, que só usa a
+biblioteca padrão. Publicar custa um struct.pack_into no anel e um sendto
+por destino UDP: o loop nunca espera nenhum leitor.
+"""
+
+import ctypes
+import os
+import socket
+import sys
+import time
+from multiprocessing import shared_memory
+
+from subscriber import (CLOSED_OFFSET, COUNT, COUNT_OFFSET, DATAGRAM, DATAGRAM_MAGIC, DEFAULT_NAME, HEADER,
+                        HEADER_MAGIC, HEADER_SIZE, HEARTBEAT, HEARTBEAT_OFFSET, LOCK, PHASES, RECORD, SLOT_SIZE,
+                        WIRE_VERSION, attach)
+from tracker import PHASES as TRACKER_PHASES
+
+
+# Registros guardados no anel (a 60 fps, ~4 s de histórico para um leitor atrasado)
+DEFAULT_SLOTS = 256
+
+_NAN = float('nan')
+
+# Um anel sem publicação há mais que isso (s) é de um publicador travado ou
+# morto, mesmo que o pid exista (pode ser de outro processo, reaproveitado)
+STALE_AFTER_S = 2.0
+
+if PHASES != TRACKER_PHASES:
+    raise ImportError('subscriber.PHASES está fora da ordem de tracker.PHASES')
+
+
+def parse_address(text, default_host='127.0.0.1'):
+    """'HOST:PORTA' ou 'PORTA' -> (host, porta)."""
+    host, _, porta = text.rpartition(':')
+    return host or default_host, int(porta)
+
+
+def _pid_alive(pid):
+    """True se existe um processo com este pid."""
+    if pid == os.getpid():
+        return True
+    if sys.platform == 'win32':
+        # os.kill(pid, 0) no Windows encerra o processo: pergunta pelo handle
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5  # acesso negado: existe, de outro usuário
+        codigo = ctypes.c_ulong()
+        try:
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(codigo))) and codigo.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _retire(name):
+    """
+    Marca como fechado e apaga um bloco de uma execução anterior que não saiu
+    direito: leitores ainda presos a ele veem `closed` e abrem o novo. Um
+    bloco com publicador vivo (pid existente e publicação há menos de
+    STALE_AFTER_S) ou que não é um anel de rastreamento não é tocado:
+    FileExistsError.
+    """
+    try:
+        velho = attach(name)
+    except FileNotFoundError:
+        return
+    try:
+        if velho.size < HEADER_SIZE or bytes(velho.buf[:4]) != HEADER_MAGIC:
+            raise FileExistsError(f"já existe um bloco '{name}' que não é um anel de rastreamento")
+        pid, fechado = HEADER.unpack_from(velho.buf, 0)[4:]
+        batida, = HEARTBEAT.unpack_from(velho.buf, HEARTBEAT_OFFSET)
+        if not fechado and _pid_alive(pid) and time.time() - batida < STALE_AFTER_S:
+            raise FileExistsError(f"'{name}' já tem um publicador ativo (pid {pid}); use outro nome")
+        velho.buf[CLOSED_OFFSET:CLOSED_OFFSET + 4] = (1).to_bytes(4, 'little')
+    finally:
+        velho.close()
+    try:
+        # Aberto de novo, registrado, só para apagar (o attach não registra)
+        apagar = shared_memory.SharedMemory(name=name)
+        apagar.close()
+        apagar.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class TrackPublisher:
+    """
+    Publica TrackResults. `name`: bloco de memória compartilhada (None = sem
+    anel); `udp`: destinos (host, porta) dos datagramas. Outro publicador
+    ativo com o mesmo `name` faz o construtor levantar FileExistsError.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, slots=DEFAULT_SLOTS, udp=()):
+        self.name = name
+        self.slots = int(slots)
+        self.published = 0
+        self.udp_errors = 0
+        self._shm = None
+        if name:
+            _retire(name)
+            self._shm = self._create(name, HEADER_SIZE + self.slots * SLOT_SIZE)
+            buf = self._shm.buf
+            buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+            HEADER.pack_into(buf, 0, HEADER_MAGIC, WIRE_VERSION, SLOT_SIZE, self.slots, os.getpid(), 0)
+            HEARTBEAT.pack_into(buf, HEARTBEAT_OFFSET, time.time())
+        self.destinations = [tuple(d) for d in udp]
+        self._sock = None
+        if self.destinations:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+
+    @staticmethod
+    def _create(name, size, timeout=1.0):
+        """
+        Cria o bloco. No Windows o bloco antigo só some quando o último leitor
+        o solta (eles soltam ao ver `closed`): espera até `timeout` s.
+        """
+        fim = time.perf_counter() + timeout
+        while True:
+            try:
+                return shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                if time.perf_counter() >= fim:
+                    raise
+                time.sleep(0.02)
+
+    def publish(self, seq, timestamp, result, target=0):
+        """Publica `result` (TrackResult) do frame `seq` capturado em `timestamp` (perf_counter)."""
+        indice = self.published
+        x, y = result.position if result.position is not None else (_NAN, _NAN)
+        bbox = result.bbox if result.bbox is not None else (0, 0, 0, 0)
+        area = result.area if result.area is not None else _NAN
+        confianca = result.confidence if result.confidence is not None else _NAN
+        campos = (indice, seq, timestamp, time.perf_counter(), x, y, *bbox, area, confianca,
+                  PHASES.index(result.phase), target)
+
+        if self._shm is not None:
+            buf = self._shm.buf
+            base = HEADER_SIZE + (indice % self.slots) * SLOT_SIZE
+            # Seqlock: ímpar enquanto escreve, par no fim; só então o total anda
+            LOCK.pack_into(buf, base, 2 * indice + 1)
+            RECORD.pack_into(buf, base + LOCK.size, *campos)
+            LOCK.pack_into(buf, base, 2 * indice + 2)
+            COUNT.pack_into(buf, COUNT_OFFSET, indice + 1)
+            HEARTBEAT.pack_into(buf, HEARTBEAT_OFFSET, time.time())
+
+        if self._sock is not None:
+            datagrama = DATAGRAM.pack(DATAGRAM_MAGIC, WIRE_VERSION, *campos)
+            for destino in self.destinations:
+                try:
+                    self._sock.sendto(datagrama, destino)
+                except OSError:
+                    # Ninguém escutando (Windows avisa com erro) ou buffer cheio: segue
+                    self.udp_errors += 1
+        self.published = indice + 1
+
+    def close(self):
+        """Marca o anel como fechado (leitores reabrem quando houver outro) e o apaga."""
+        if self._shm is not None:
+            self._shm.buf[CLOSED_OFFSET:CLOSED_OFFSET + 4] = (1).to_bytes(4, 'little')
+            self._shm.close()
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._shm = None
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,176 @@
+"""
+REAQUISIÇÃO AMORTIZADA (varredura do frame inteiro em faixas, uma por frame)
+Quando o objeto some, a busca local (janela crescendo ao redor da última
+posição) só o reencontra se ele voltar perto de onde sumiu. Enquanto isso,
+o Reacquirer varre o frame inteiro em baixa resolução, uma faixa
+horizontal por frame: `tiles` frames cobrem o frame todo, e o custo de cada
+frame fica limitado ao de uma faixa reduzida mais `max_verify` verificações.
+
+Na faixa reduzida (mesma redução da busca em pirâmide), o mapa de distância
+até a cor do objeto (colormodel.tolerance_map) limiarizado em `max_level`
+dá os candidatos. Cada candidato recebe uma nota (menor = melhor):
+  cor       distância média da cor (nível de tolerância) / max_level
+  área      |log(área / última área)|, 1 = 4x maior ou menor
+  movimento distância até a posição esperada (última posição + velocidade
+            x frames perdidos) / diagonal do frame
+Os melhores são confirmados em resolução cheia pela cor exata, numa janela
+pequena ao redor de cada um; o primeiro confirmado encerra a busca.
+
+As faixas se sobrepõem no tamanho do objeto: um objeto na divisa aparece
+inteiro em pelo menos uma delas.
+"""
+
+import collections
+import math
+
+import cv2
+
+from colormodel import threshold_tolerance
+from detection import MIN_AREA_EXACT, RoiFrame, pyramid_factor, scaled_area
+from instrumentation import PROFILER
+
+
+# Candidato de uma faixa: posição e bbox no frame exibido, área (px reais),
+# nível médio de tolerância da cor e nota (menor = melhor)
+Candidate = collections.namedtuple('Candidate', ['position', 'bbox', 'area', 'level', 'score'])
+
+
+class Reacquirer:
+    """
+    Varredura do frame inteiro em faixas, para reencontrar um objeto perdido.
+
+    tiles:         faixas horizontais (frames para cobrir o frame inteiro)
+    max_level:     nível de tolerância (colormodel) que ainda vira candidato
+    max_verify:    candidatos confirmados em resolução cheia por frame
+    max_area_ratio: candidato maior que isso vezes a última área é fundo
+    weights:       pesos (cor, área, movimento) da nota
+    """
+
+    def __init__(self, tiles=4, max_level=10, max_verify=2, max_area_ratio=4.0, weights=(1.0, 1.0, 1.0)):
+        self.tiles = max(1, int(tiles))
+        self.max_level = int(max_level)
+        self.max_verify = max(1, int(max_verify))
+        self.max_area_ratio = float(max_area_ratio)
+        self.weights = tuple(float(p) for p in weights)
+        self.scans = 0
+        self.candidates = 0
+        self.verified = 0
+        self.recoveries = 0
+        self.reset()
+
+    def reset(self):
+        """Esquece a perda em andamento (a próxima varredura recomeça da primeira faixa)."""
+        self._tile = 0
+        self._origin = None        # última posição conhecida (frame exibido)
+        self._velocity = (0.0, 0.0)
+        self._area = 0.0
+        self._frames = 0           # frames desde a perda
+
+    @property
+    def active(self):
+        return self._origin is not None
+
+    def start(self, position, velocity, area):
+        """Início da perda: posição, velocidade (px/frame) e área do objeto quando sumiu."""
+        self.reset()
+        self._origin = position
+        self._velocity = velocity
+        self._area = float(area)
+
+    def expected(self, frame_w, frame_h):
+        """Posição esperada do objeto agora (movimento uniforme desde a perda, dentro do frame)."""
+        x = self._origin[0] + self._velocity[0] * self._frames
+        y = self._origin[1] + self._velocity[1] * self._frames
+        return min(max(0.0, x), frame_w - 1.0), min(max(0.0, y), frame_h - 1.0)
+
+    def _band(self, index, frame_h, factor):
+        """Linhas (y0, y1) da faixa `index`, com sobreposição do tamanho do objeto."""
+        altura = int(math.ceil(frame_h / float(self.tiles)))
+        sobra = int(math.sqrt(max(self._area, 1.0))) + 2 * factor
+        y0 = max(0, index * altura - sobra)
+        y1 = min(frame_h, (index + 1) * altura + sobra)
+        # Múltiplos da redução: a faixa reduzida mapeia de volta sem arredondar
+        return y0 - y0 % factor, min(frame_h, y1 + (-y1) % factor)
+
+    def _score(self, position, area, level, expected, diagonal):
+        peso_cor, peso_area, peso_mov = self.weights
+        cor = level / float(max(1, self.max_level))
+        forma = min(1.0, abs(math.log(area / self._area)) / math.log(4.0)) if self._area > 0 else 0.0
+        movimento = math.hypot(position[0] - expected[0], position[1] - expected[1]) / diagonal
+        return peso_cor * cor + peso_area * forma + peso_mov * movimento
+
+    def scan(self, frame, hsv_ref, mirror=True, workspace=None):
+        """
+        Varre a próxima faixa do frame e devolve os candidatos dela, do melhor
+        para o pior (lista de Candidate, coordenadas do frame exibido).
+        """
+        frame_h, frame_w = frame.shape[:2]
+        factor = pyramid_factor(frame_w)
+        y0, y1 = self._band(self._tile, frame_h, factor)
+        self._tile = (self._tile + 1) % self.tiles
+        self.scans += 1
+
+        t0 = PROFILER.tic()
+        size = (frame_w // factor, (y1 - y0) // factor)
+        faixa = frame[y0:y1]
+        if factor > 1:
+            small = None if workspace is None else workspace.array('reacquire.frame', size[::-1] + frame.shape[2:])
+            faixa = cv2.resize(faixa, size, dst=small, interpolation=cv2.INTER_AREA)
+        roi = RoiFrame(faixa, None, False, workspace=workspace, slot='reacquire')
+        tmap = roi.tolerance_map(hsv_ref)
+        mask = threshold_tolerance(tmap, self.max_level, roi.buffer('candidates', tmap.shape))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        # Na imagem reduzida as bordas misturam cores: aceitar metade da área mínima
+        min_area = 0.5 * scaled_area(MIN_AREA_EXACT, frame_w, frame_h)
+        max_area = self.max_area_ratio * self._area if self._area > 0 else None
+        esperado = self.expected(frame_w, frame_h)
+        diagonal = math.hypot(frame_w, frame_h)
+        candidatos = []
+        for contour in contours:
+            x, y, w_box, h_box = cv2.boundingRect(contour)
+            area = max(cv2.contourArea(contour), 1.0) * factor * factor
+            if w_box * h_box * factor * factor < min_area or (max_area is not None and area > max_area):
+                continue
+            nivel = cv2.mean(tmap[y:y + h_box, x:x + w_box], mask[y:y + h_box, x:x + w_box])[0]
+            bbox = (x * factor, y0 + y * factor, w_box * factor, h_box * factor)
+            if mirror:
+                bbox = (frame_w - (bbox[0] + bbox[2]),) + bbox[1:]
+            posicao = (bbox[0] + bbox[2] // 2, bbox[1] + bbox[3] // 2)
+            candidatos.append(Candidate(posicao, bbox, area, nivel,
+                                        self._score(posicao, area, nivel, esperado, diagonal)))
+        candidatos.sort(key=lambda c: c.score)
+        self.candidates += len(candidatos)
+        PROFILER.toc('reacquire', t0)
+        return candidatos
+
+    def step(self, frame, hsv_color, hsv_ref, mirror=True, classifier=None, workspace=None):
+        """
+        Um frame de reaquisição: varre uma faixa e confirma os melhores
+        candidatos dela pela cor exata em resolução cheia.
+        Retorna (posição, bbox, área) no frame exibido ou (None, None, None).
+        """
+        if not self.active:
+            return None, None, None
+        self._frames += 1
+        frame_h, frame_w = frame.shape[:2]
+        factor = pyramid_factor(frame_w)
+        lower, upper = hsv_color
+        for candidato in self.scan(frame, hsv_ref, mirror, workspace)[:self.max_verify]:
+            # Janela em resolução cheia com margem de dois pixels da imagem reduzida
+            x, y, w_box, h_box = candidato.bbox
+            margem = 2 * factor
+            janela = (max(0, x - margem), max(0, y - margem),
+                      min(frame_w, x + w_box + margem), min(frame_h, y + h_box + margem))
+            self.verified += 1
+            achado = RoiFrame(frame, janela, mirror, classifier, workspace=workspace,
+                              slot='candidate').detect(lower, upper, MIN_AREA_EXACT)
+            if achado[0] is not None:
+                self.recoveries += 1
+                self.reset()
+                return achado
+        return None, None, None
+
+    def metrics(self):
+        return {'scans': self.scans, 'candidates': self.candidates, 'verified': self.verified,
+                'recoveries': self.recoveries}
@@ -0,0 +1,582 @@
+"""
+GRAVAÇÃO DE SESSÃO E REPRODUÇÃO DETERMINÍSTICA
+Grava os frames crus da câmera num anel em arquivo mapeado em memória
+(np.memmap, pré-alocado: cada frame é uma cópia para o slot, sem codificar)
+e, ao lado, um log binário compacto do que aconteceu em cada frame:
+comandos (cor capturada, reset), qualidade do governador, centro previsto,
+resultado do rastreador, teclas e comandos do cursor.
+
+A reprodução passa os frames gravados de novo pelo rastreador com os mesmos
+comandos e centros previstos, no ritmo original ou o mais rápido possível,
+e compara cada resultado com o gravado - um bug de rastreamento relatado
+vira um caso reproduzível, e a mesma gravação serve de teste de desempenho
+com imagens reais.
+
+Sessão = pasta com:
+    session.json - resolução, nº de slots e configuração do rastreador
+    frames.ring  - `slots` frames BGR crus; o frame de sequência s fica no
+                   slot s % slots (só os últimos `slots` frames sobrevivem)
+    slots.seq    - sequência gravada em cada slot (int64, -1 = vazio)
+    events.log   - registros binários (struct, little-endian) em ordem
+
+Uso:
+    python wave.py --record sessao/              (grava enquanto roda)
+    python wave.py --source sessao/              (assiste aos frames gravados)
+    python recorder.py info sessao/
+    python recorder.py dump sessao/ [--kinds track,cursor]
+    python recorder.py replay sessao/ [--realtime] [--json resultado.json]
+
+A reprodução é exata para o loop serial e para o pipeline com
+--policy throughput; com --policy latency um frame descartado depois do
+rastreamento não chega ao log.
+"""
+
+import argparse
+import collections
+import json
+import math
+import os
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from detection import MORPHOLOGY_MODES
+from multitrack import multi_stage
+from profiles import tracker_color
+from tracker import COLOR_MODELS, PHASES, TrackResult, tracker_stage
+
+
+FRAMES_FILE = 'frames.ring'
+SLOTS_FILE = 'slots.seq'
+LOG_FILE = 'events.log'
+INFO_FILE = 'session.json'
+
+# 150 frames = 5 s a 30 fps (~400 MB em 720p)
+DEFAULT_SLOTS = 150
+
+# Tipos de registro
+REC_FRAME = 1      # frame entregue ao rastreador: centro previsto
+REC_TRACK = 2      # resultado do rastreador
+REC_COLOR = 3      # comando set_color (range + amostra HSV do clique)
+REC_RESET = 4      # comando reset
+REC_QUALITY = 5    # ajuste de qualidade do governador
+REC_KEY = 6        # tecla
+REC_CURSOR = 7     # comando do cursor
+
+KINDS = {REC_FRAME: 'frame', REC_TRACK: 'track', REC_COLOR: 'color', REC_RESET: 'reset',
+         REC_QUALITY: 'quality', REC_KEY: 'key', REC_CURSOR: 'cursor'}
+
+# Cabeçalho de todo registro: tipo, seq do frame (o último, para teclas e
+# cursor) e instante (time.perf_counter da gravação)
+HEADER = struct.Struct('<BId')
+PAYLOADS = {
+    REC_FRAME: struct.Struct('<dd'),                 # centro x, y (NaN = sem previsão; double:
+                                                     # o recorte depende de int(centro))
+    REC_TRACK: struct.Struct('<Bffiiiifiiiff'),      # fase, x, y, bbox, área, tolerância, raio,
+                                                     # frames_lost, confiança, custo (ms)
+    REC_COLOR: struct.Struct('<3B3BHH'),             # lower, upper, amostra h x w (+ h*w*3 bytes)
+    REC_RESET: struct.Struct('<'),
+    REC_QUALITY: struct.Struct('<ddB'),              # escala, margem, morfologia
+    REC_KEY: struct.Struct('<8s?'),                  # tecla, pressionada
+    REC_CURSOR: struct.Struct('<Bff8s'),             # tipo, x, y (NaN em botões), botão
+}
+CURSOR_KINDS = ('move', 'down', 'up', 'click')
+
+# Registro lido do log; values depende do tipo (ver _decode)
+Record = collections.namedtuple('Record', ['kind', 'seq', 'timestamp', 'values'])
+
+# Um frame da sessão com tudo o que o rastreador recebeu e devolveu
+ReplayFrame = collections.namedtuple('ReplayFrame', [
+    'seq', 'timestamp', 'center', 'commands', 'quality', 'result', 'track_ms'])
+
+_NAN = float('nan')
+
+
+def _or_nan(value):
+    return _NAN if value is None else float(value)
+
+
+def _text(raw):
+    return raw.rstrip(b'\0').decode('ascii', 'replace')
+
+
+class SessionRecorder:
+    """
+    Grava uma sessão em `path`. O anel de frames é criado no primeiro frame
+    (a resolução real só é conhecida aí). store_frame roda na thread de
+    captura; os log_* podem vir de qualquer thread.
+    """
+
+    def __init__(self, path, slots=DEFAULT_SLOTS, fps=None, config=None):
+        self.path = path
+        self.slots = int(slots)
+        os.makedirs(path, exist_ok=True)
+        self.info = {
+            'version': 1,
+            'created': time.time(),
+            'clock': 'perf_counter',
+            'slots': self.slots,
+            'fps': fps,
+            'config': dict(config or {}),
+            'shape': None,
+        }
+        self._frames = None
+        self._slot_seq = None
+        self._log = open(os.path.join(path, LOG_FILE), 'wb', buffering=1 << 16)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._quality = None
+        self._last_flush = time.perf_counter()
+        self.frames_stored = 0
+        self.frames_skipped = 0
+        self.records = 0
+        self._write_info()
+
+    def _write_info(self):
+        with open(os.path.join(self.path, INFO_FILE), 'w') as f:
+            json.dump(self.info, f, indent=2)
+
+    def _open_ring(self, shape):
+        self.info['shape'] = list(shape)
+        self._frames = np.memmap(os.path.join(self.path, FRAMES_FILE), np.uint8, 'w+',
+                                 shape=(self.slots,) + tuple(shape))
+        self._slot_seq = np.memmap(os.path.join(self.path, SLOTS_FILE), np.int64, 'w+', shape=(self.slots,))
+        self._slot_seq[:] = -1
+        self._write_info()
+
+    def store_frame(self, frame):
+        """capture.Frame -> slot frame.seq % slots (uma cópia, sem codificar)."""
+        image = frame.image
+        if self._frames is None:
+            self._open_ring(image.shape)
+        elif image.shape != self._frames.shape[1:]:
+            # Mudou a resolução no meio da sessão: não cabe no anel
+            self.frames_skipped += 1
+            return
+        slot = frame.seq % self.slots
+        # Marcar o slot como inválido durante a cópia: uma leitura após uma
+        # queda nunca pega um frame pela metade
+        self._slot_seq[slot] = -1
+        self._frames[slot] = image
+        self._slot_seq[slot] = frame.seq
+        self.frames_stored += 1
+
+    def _write(self, kind, seq, timestamp, *values, tail=b''):
+        dados = HEADER.pack(kind, seq, timestamp) + PAYLOADS[kind].pack(*values) + tail
+        with self._lock:
+            self._log.write(dados)
+            self.records += 1
+            if timestamp - self._last_flush > 1.0:
+                # Uma queda perde no máximo ~1 s de log
+                self._log.flush()
+                self._last_flush = timestamp
+
+    def log_frame(self, seq, meta):
+        """
+        Frame que passou pelo rastreador: comandos e qualidade aplicados antes
+        dele, centro previsto e resultado (meta devolvido por tracker_stage).
+        """
+        self._seq = seq
+        t = meta['timestamp']
+        for command in meta.get('commands') or ():
+            self.log_command(seq, t, command)
+        quality = meta.get('quality')
+        if quality is not None and quality != self._quality:
+            self._quality = dict(quality)
+            self._write(REC_QUALITY, seq, t, quality['scale'], quality['margin'],
+                        MORPHOLOGY_MODES.index(quality['morphology']))
+        center = meta.get('center')
+        self._write(REC_FRAME, seq, t, *((_NAN, _NAN) if center is None else center))
+        self.log_track(seq, time.perf_counter(), meta['result'], meta.get('track_s'))
+
+    def log_command(self, seq, timestamp, command):
+        if command[0] == 'set_color':
+            (lower, upper), sample = command[1], (command[2] if len(command) > 2 else None)
+            if sample is None:
+                h = w = 0
+                tail = b''
+            else:
+                h, w = sample.shape[:2]
+                tail = np.ascontiguousarray(sample, dtype=np.uint8).tobytes()
+            self._write(REC_COLOR, seq, timestamp, *(int(c) for c in lower), *(int(c) for c in upper),
+                        h, w, tail=tail)
+        elif command[0] == 'reset':
+            self._write(REC_RESET, seq, timestamp)
+
+    def log_track(self, seq, timestamp, result, track_s=None):
+        x, y = result.position if result.position is not None else (_NAN, _NAN)
+        bbox = result.bbox if result.bbox is not None else (0, 0, 0, 0)
+        self._write(REC_TRACK, seq, timestamp, PHASES.index(result.phase), x, y, *bbox,
+                    _or_nan(result.area), int(result.tolerance or 0), int(result.search_radius or 0),
+                    int(result.frames_lost or 0), _or_nan(result.confidence),
+                    _NAN if track_s is None else track_s * 1000.0)
+
+    def log_key(self, timestamp, key, down=True):
+        self._write(REC_KEY, self._seq, timestamp, str(key).encode('ascii', 'replace')[:8], bool(down))
+
+    def log_cursor(self, kind, data):
+        """Comando do CursorDispatcher: ('move', (x, y)) ou ('down'/'up'/'click', botão)."""
+        if kind == 'move':
+            x, y, button = data[0], data[1], b''
+        else:
+            x, y, button = _NAN, _NAN, str(data).encode('ascii', 'replace')[:8]
+        self._write(REC_CURSOR, self._seq, time.perf_counter(), CURSOR_KINDS.index(kind), x, y, button)
+
+    def close(self):
+        with self._lock:
+            if self._log.closed:
+                return
+            self._log.close()
+        if self._frames is not None:
+            self._frames.flush()
+            self._slot_seq.flush()
+        self.info.update(closed=time.time(), frames_stored=self.frames_stored,
+                         frames_skipped=self.frames_skipped, records=self.records)
+        self._write_info()
+
+
+def _decode(kind, values, tail):
+    """Valores de um registro no formato usado pelo resto do programa."""
+    if kind == REC_FRAME:
+        x, y = values
+        return None if math.isnan(x) else (x, y)
+    if kind == REC_TRACK:
+        phase, x, y, bx, by, bw, bh, area, tolerance, radius, lost, confidence, track_ms = values
+        position = None if math.isnan(x) else (int(x) if x.is_integer() else x, int(y) if y.is_integer() else y)
+        bbox = (bx, by, bw, bh) if bw or bh else None
+        result = TrackResult(PHASES[phase], position, bbox, None if math.isnan(area) else area,
+                             tolerance, radius, lost, None if math.isnan(confidence) else confidence)
+        return result, (None if math.isnan(track_ms) else track_ms)
+    if kind == REC_COLOR:
+        lower = np.array(values[0:3], dtype=np.uint8)
+        upper = np.array(values[3:6], dtype=np.uint8)
+        h, w = values[6:8]
+        sample = np.frombuffer(tail, dtype=np.uint8).reshape(h, w, 3) if h and w else None
+        return ('set_color', (lower, upper), sample)
+    if kind == REC_RESET:
+        return ('reset',)
+    if kind == REC_QUALITY:
+        scale, margin, morphology = values
+        return {'scale': scale, 'margin': margin, 'morphology': MORPHOLOGY_MODES[morphology]}
+    if kind == REC_KEY:
+        return _text(values[0]), values[1]
+    if kind == REC_CURSOR:
+        tipo, x, y, button = values
+        if CURSOR_KINDS[tipo] == 'move':
+            return 'move', (x, y)
+        return CURSOR_KINDS[tipo], _text(button)
+    return values
+
+
+def read_records(path):
+    """Registros de events.log, em ordem. Um registro truncado no fim (queda) é ignorado."""
+    with open(os.path.join(path, LOG_FILE), 'rb') as f:
+        dados = f.read()
+    pos = 0
+    while pos + HEADER.size <= len(dados):
+        kind, seq, timestamp = HEADER.unpack_from(dados, pos)
+        payload = PAYLOADS.get(kind)
+        if payload is None or pos + HEADER.size + payload.size > len(dados):
+            break
+        values = payload.unpack_from(dados, pos + HEADER.size)
+        pos += HEADER.size + payload.size
+        tail = b''
+        if kind == REC_COLOR:
+            extra = values[6] * values[7] * 3
+            if pos + extra > len(dados):
+                break
+            tail = dados[pos:pos + extra]
+            pos += extra
+        yield Record(KINDS[kind], seq, timestamp, _decode(kind, values, tail))
+
+
+class SessionReader:
+    """Lê uma sessão gravada: info, registros e frames do anel."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INFO_FILE)) as f:
+            self.info = json.load(f)
+        self.records = list(read_records(path))
+        self._frames = None
+        self._slot_seq = None
+        if self.info.get('shape'):
+            slots = self.info['slots']
+            self._frames = np.memmap(os.path.join(path, FRAMES_FILE), np.uint8, 'r',
+                                     shape=(slots,) + tuple(self.info['shape']))
+            self._slot_seq = np.memmap(os.path.join(path, SLOTS_FILE), np.int64, 'r', shape=(slots,))
+
+    @property
+    def config(self):
+        return self.info.get('config') or {}
+
+    def image(self, seq):
+        """Frame cru de sequência `seq` (visão do arquivo) ou None se já foi sobrescrito."""
+        if self._frames is None:
+            return None
+        slot = seq % len(self._slot_seq)
+        if self._slot_seq[slot] != seq:
+            return None
+        return self._frames[slot]
+
+    def frames(self):
+        """ReplayFrame de cada frame rastreado, na ordem gravada."""
+        comandos, quality = [], None
+        atual = None
+        for record in self.records:
+            if record.kind in ('color', 'reset'):
+                comandos.append(record.values)
+            elif record.kind == 'quality':
+                quality = record.values
+            elif record.kind == 'frame':
+                atual = ReplayFrame(record.seq, record.timestamp, record.values, comandos, quality, None, None)
+                comandos = []
+            elif record.kind == 'track' and atual is not None and atual.seq == record.seq:
+                result, track_ms = record.values
+                yield atual._replace(result=result, track_ms=track_ms)
+                atual = None
+
+    def counts(self):
+        contagem = collections.Counter(r.kind for r in self.records)
+        return dict(contagem)
+
+
+class ReplaySource:
+    """
+    Fonte de frames com a interface do cv2.VideoCapture que devolve os
+    frames rastreados de uma sessão (os que ainda estão no anel), no ritmo
+    original (realtime=True) ou o mais rápido possível.
+    """
+
+    def __init__(self, path, realtime=True):
+        self.reader = SessionReader(path)
+        self.realtime = realtime
+        self._frames = [f for f in self.reader.frames() if self.reader.image(f.seq) is not None]
+        self._index = 0
+        self._opened = True
+        self._start = None
+
+    def isOpened(self):
+        return self._opened and self.reader.info.get('shape') is not None
+
+    def read(self):
+        if not self._opened or self._index >= len(self._frames):
+            return False, None
+        frame = self._frames[self._index]
+        if self.realtime:
+            agora = time.perf_counter()
+            if self._start is None:
+                self._start = (agora, frame.timestamp)
+            espera = self._start[0] + (frame.timestamp - self._start[1]) - agora
+            if espera > 0:
+                time.sleep(espera)
+        self._index += 1
+        return True, np.array(self.reader.image(frame.seq))
+
+    def get(self, prop):
+        shape = self.reader.info.get('shape') or (0, 0)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(shape[1])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(shape[0])
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.reader.info.get('fps') or 0.0)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self._frames))
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self._opened = False
+
+
+def is_session(path):
+    return isinstance(path, str) and os.path.isfile(os.path.join(path, INFO_FILE))
+
+
+def _same_result(a, b):
+    if a.phase != b.phase:
+        return False
+    if (a.position is None) != (b.position is None):
+        return False
+    return a.position is None or np.allclose(a.position, b.position, atol=1e-3)
+
+
+def replay(path, realtime=False, **overrides):
+    """
+    Passa a sessão de novo pelo rastreador (tracker_stage com a configuração
+    gravada, ou `overrides`) aplicando os mesmos comandos, qualidade e
+    centros previstos. Devolve tempos por frame e divergências do gravado.
+
+    Frames já sobrescritos no anel são pulados; os comandos deles entram no
+    primeiro frame disponível (o rastreador recomeça dali, então os primeiros
+    resultados podem divergir).
+    """
+    reader = SessionReader(path)
+    config = dict(reader.config)
+    # Sessões gravadas antes da reaquisição em faixas: reproduzir sem ela
+    config.setdefault('reacquire', False)
+    config.update(overrides)
+    classifier = config.pop('classifier', 'hsv')
+    # Cor com que o rastreador nasceu (perfil salvo / .env), antes de qualquer clique
+    inicial = tracker_color(config.pop('calibration', None))
+    targets = config.pop('targets', 1)
+    if targets > 1:
+        # Sessão com --targets: o resultado gravado é o do alvo 0
+        track = multi_stage(targets, hsv_color=(inicial or {}).get('hsv_color'))
+    else:
+        if inicial:
+            config.update(inicial)
+        track = tracker_stage(classifier, **config)
+
+    latencias, gravados = [], []
+    divergentes, primeira = 0, None
+    pulados = 0
+    pendentes = []
+    inicio = None
+    for frame in reader.frames():
+        image = reader.image(frame.seq)
+        pendentes.extend(frame.commands)
+        if image is None:
+            pulados += 1
+            continue
+        if realtime:
+            agora = time.perf_counter()
+            if inicio is None:
+                inicio = (agora, frame.timestamp)
+            espera = inicio[0] + (frame.timestamp - inicio[1]) - agora
+            if espera > 0:
+                time.sleep(espera)
+        meta = {'commands': pendentes, 'center': frame.center, 'quality': frame.quality}
+        pendentes = []
+        t0 = time.perf_counter()
+        saida = track(image, meta)
+        latencias.append(time.perf_counter() - t0)
+        if frame.track_ms is not None:
+            gravados.append(frame.track_ms)
+        if not _same_result(saida['result'], frame.result):
+            divergentes += 1
+            if primeira is None:
+                primeira = {'seq': frame.seq, 'recorded': frame.result._asdict(),
+                            'replayed': saida['result']._asdict()}
+
+    lat_ms = np.array(latencias) * 1000.0 if latencias else np.zeros(1)
+    return {
+        'session': path,
+        'frames': len(latencias),
+        'skipped': pulados,
+        'fps': round(len(latencias) / max(1e-9, float(np.sum(latencias))), 1),
+        'latency_p50_ms': round(float(np.percentile(lat_ms, 50)), 3),
+        'latency_p95_ms': round(float(np.percentile(lat_ms, 95)), 3),
+        'latency_p99_ms': round(float(np.percentile(lat_ms, 99)), 3),
+        'recorded_p50_ms': round(float(np.percentile(gravados, 50)), 3) if gravados else None,
+        'recorded_p95_ms': round(float(np.percentile(gravados, 95)), 3) if gravados else None,
+        'mismatches': divergentes,
+        'first_mismatch': primeira,
+    }
+
+
+def _cmd_info(args):
+    reader = SessionReader(args.session)
+    info = reader.info
+    frames = list(reader.frames())
+    disponiveis = sum(1 for f in frames if reader.image(f.seq) is not None)
+    duracao = frames[-1].timestamp - frames[0].timestamp if len(frames) > 1 else 0.0
+    print(f"sessão {args.session}: {info.get('shape')} , anel de {info['slots']} frames")
+    config = dict(info.get('config') or {})
+    inicial = config.pop('calibration', None)
+    print(f"configuração: {config}")
+    if inicial:
+        print(f"cor inicial: H({inicial['lower'][0]}-{inicial['upper'][0]}) S({inicial['lower'][1]}-"
+              f"{inicial['upper'][1]}) V({inicial['lower'][2]}-{inicial['upper'][2]})"
+              f"{' + histograma' if inicial.get('hist') else ''}")
+    print(f"{len(frames)} frames rastreados em {duracao:.1f} s, {disponiveis} ainda no anel")
+    print('registros: ' + ', '.join(f'{k}={n}' for k, n in sorted(reader.counts().items())))
+
+
+def _cmd_dump(args):
+    reader = SessionReader(args.session)
+    tipos = set(args.kinds.split(',')) if args.kinds else None
+    inicio = reader.records[0].timestamp if reader.records else 0.0
+    for record in reader.records:
+        if tipos is None or record.kind in tipos:
+            valores = record.values
+            if record.kind == 'color':
+                valores = (valores[0], [c.tolist() for c in valores[1]],
+                           None if valores[2] is None else valores[2].shape)
+            print(f"{(record.timestamp - inicio) * 1000.0:10.1f} ms  #{record.seq:<6} {record.kind:<8} {valores}")
+
+
+def _cmd_replay(args):
+    overrides = {}
+    if args.classifier:
+        overrides['classifier'] = args.classifier
+    if args.color_model:
+        overrides['color_model'] = args.color_model
+    if args.flow_interval is not None:
+        overrides['flow_interval'] = args.flow_interval
+    if args.adapt_color is not None:
+        overrides['adapt_color'] = args.adapt_color
+    if args.reacquire is not None:
+        overrides['reacquire'] = args.reacquire
+    if args.incremental is not None:
+        overrides['incremental'] = args.incremental
+    r = replay(args.session, realtime=args.realtime, **overrides)
+    print(f"{r['frames']} frames ({r['skipped']} fora do anel), {r['fps']:.0f} frames/s")
+    print(f"rastreamento: p50 {r['latency_p50_ms']:.2f} ms  p95 {r['latency_p95_ms']:.2f} ms"
+          f"  p99 {r['latency_p99_ms']:.2f} ms")
+    if r['recorded_p50_ms'] is not None:
+        print(f"gravado:      p50 {r['recorded_p50_ms']:.2f} ms  p95 {r['recorded_p95_ms']:.2f} ms")
+    if r['mismatches']:
+        m = r['first_mismatch']
+        print(f"✗ {r['mismatches']} frames divergem do gravado; primeiro #{m['seq']}: "
+              f"gravado {m['recorded']['phase']} {m['recorded']['position']}, "
+              f"agora {m['replayed']['phase']} {m['replayed']['position']}")
+    else:
+        print("✓ Todos os resultados iguais aos gravados")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(r, f, indent=2, default=str)
+        print(f"✓ Resultados em {args.json}")
+    return r
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sessões gravadas: informações, registros e reprodução')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_info = sub.add_parser('info', help='resumo da sessão')
+    p_info.add_argument('session')
+    p_info.set_defaults(func=_cmd_info)
+
+    p_dump = sub.add_parser('dump', help='lista os registros em texto')
+    p_dump.add_argument('session')
+    p_dump.add_argument('--kinds', help=f"tipos separados por vírgula ({', '.join(KINDS.values())})")
+    p_dump.set_defaults(func=_cmd_dump)
+
+    p_replay = sub.add_parser('replay', help='passa a sessão de novo pelo rastreador e compara')
+    p_replay.add_argument('session')
+    p_replay.add_argument('--realtime', action='store_true', help='no ritmo original (padrão: o mais rápido possível)')
+    p_replay.add_argument('--classifier', choices=('hsv', 'lut'), help='sobrepõe o gravado')
+    p_replay.add_argument('--color-model', choices=COLOR_MODELS, help='sobrepõe o gravado')
+    p_replay.add_argument('--flow-interval', type=int, help='sobrepõe o gravado')
+    p_replay.add_argument('--adapt-color', action='store_true', default=None, help='sobrepõe o gravado')
+    p_replay.add_argument('--no-adapt-color', dest='adapt_color', action='store_false', help='sobrepõe o gravado')
+    p_replay.add_argument('--reacquire', action='store_true', default=None, help='sobrepõe o gravado')
+    p_replay.add_argument('--no-reacquire', dest='reacquire', action='store_false', help='sobrepõe o gravado')
+    p_replay.add_argument('--incremental', action='store_true', default=None, help='sobrepõe o gravado')
+    p_replay.add_argument('--no-incremental', dest='incremental', action='store_false', help='sobrepõe o gravado')
+    p_replay.add_argument('--json', help='grava o resultado neste arquivo')
+    p_replay.set_defaults(func=_cmd_replay)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+CENAS SINTÉTICAS COM GABARITO (para benchmarks sem câmera)
+Um disco colorido percorre uma trajetória roteirizada sobre um fundo com
+textura. Cada cena pode ter ruído, variação de iluminação (oscilante ou
+deriva lenta de exposição e balanço de branco), oclusão, saída do
+objeto do quadro (ou sumiço e volta em outro canto), objetos de cor parecida (distratores), textura no próprio
+objeto e rajadas de borrão de movimento. Cada frame vem com a posição real
+do objeto.
+
+Com targets=N > 1, N discos de cores diferentes (TARGET_COLORS) percorrem a
+mesma trajetória defasados, para o rastreamento de vários objetos
+(multitrack.py); o gabarito de cada um vem de truth(index, target).
+"""
+
+import collections
+import math
+
+import cv2
+import numpy as np
+
+
+# Resoluções padrão dos benchmarks
+RESOLUTIONS = {'480p': (640, 480), '720p': (1280, 720), '1080p': (1920, 1080)}
+
+# Cores dos discos de uma cena com vários alvos (BGR): azul, verde, vermelho,
+# amarelo, magenta e laranja - Hues bem separados (o vermelho dá a volta em 180)
+TARGET_COLORS = ((220, 40, 40), (40, 200, 60), (40, 40, 220), (30, 210, 220), (200, 40, 200), (20, 130, 240))
+
+# Bits fracionários das coordenadas dos discos (cv2.circle com shift): o
+# disco é desenhado na posição real, em 1/16 de pixel, e o gabarito mede a
+# precisão sub-pixel do rastreador
+SUBPIXEL_SHIFT = 4
+
+# Gabarito de um frame: objeto visível? e centro no frame CRU (não espelhado)
+Truth = collections.namedtuple('Truth', ['visible', 'x', 'y'])
+
+
+class Scene:
+    """
+    Cena roteirizada. Tamanhos e velocidades são definidos em 1280x720 e
+    escalados para a resolução pedida (mesma convenção do detector).
+
+    trajectory: 'orbit' (elipse), 'bounce' (quica nas bordas), 'exit' (sai
+    pela direita e volta), 'fast' (elipse rápida), 'jump' (circula num canto,
+    some por alguns frames e reaparece no canto oposto).
+
+    targets: número de discos; o primeiro tem `color_bgr`, os outros as cores
+    seguintes de TARGET_COLORS, e o disco k anda `k / targets` de volta da
+    elipse à frente do primeiro (ou `k * spacing` frames, com `spacing`:
+    discos próximos, como as duas mãos).
+    """
+
+    def __init__(self, name, width=1280, height=720, num_frames=300, fps=30.0, seed=0,
+                 trajectory='orbit', color_bgr=(220, 40, 40), radius=30, noise=0.0,
+                 lighting_drift=0.0, exposure_drift=0.0, white_balance_drift=0.0, occlusions=(),
+                 distractors=0, texture=False, blur=(), targets=1, spacing=None):
+        self.name = name
+        self.width = int(width)
+        self.height = int(height)
+        self.num_frames = int(num_frames)
+        self.fps = float(fps)
+        self.trajectory = trajectory
+        self.color_bgr = tuple(int(c) for c in color_bgr)
+        self.scale = self.width / 1280.0
+        self.radius = max(3, int(round(radius * self.scale)))
+        self.noise = float(noise)
+        self.lighting_drift = float(lighting_drift)
+        self.exposure_drift = float(exposure_drift)
+        self.white_balance_drift = float(white_balance_drift)
+        self.occlusions = tuple(occlusions)
+        self.texture = texture
+        self.blur = tuple(blur)
+        self.targets = max(1, int(targets))
+        self.colors = (self.color_bgr,) + TARGET_COLORS[1:self.targets]
+        # Defasagem (frames) entre discos: uma fração da volta da elipse
+        self._spacing = int(round(2 * math.pi * self.fps / self.targets)) if spacing is None else int(spacing)
+        self._rng = np.random.default_rng(seed)
+        self._background = self._make_background()
+        self._distractors = self._make_distractors(distractors)
+        self._sprite = self._make_sprite() if texture else None
+        # Poucos quadros de ruído pré-gerados e reaproveitados em ciclo
+        self._noise = [self._rng.normal(0, noise, (self.height, self.width, 3)).astype(np.int16)
+                       for _ in range(4)] if noise > 0 else None
+
+    def _make_background(self):
+        """Gradiente suave com manchas de baixa saturação (sem a cor do objeto)."""
+        small = self._rng.integers(40, 110, size=(9, 16, 3), dtype=np.uint8)
+        return cv2.resize(small, (self.width, self.height), interpolation=cv2.INTER_CUBIC)
+
+    def _make_sprite(self):
+        """Disco com quadradinhos mais escuros (mesmo Hue): cantos para o fluxo óptico."""
+        r = self.radius
+        lado = 2 * r + 1
+        sprite = np.empty((lado, lado, 3), dtype=np.uint8)
+        sprite[:] = self.color_bgr
+        passo = max(3, r // 4)
+        for y in range(0, lado, passo):
+            for x in range(0, lado, passo):
+                if self._rng.random() < 0.35:
+                    escuro = tuple(int(c * self._rng.uniform(0.5, 0.8)) for c in self.color_bgr)
+                    sprite[y:y + passo, x:x + passo] = escuro
+        mask = np.zeros((lado, lado), dtype=np.uint8)
+        cv2.circle(mask, (r, r), r, 255, -1)
+        return sprite, mask
+
+    def _make_distractors(self, count):
+        """Discos parados com Hue próximo (mas fora do range exato) do objeto."""
+        base = cv2.cvtColor(np.uint8([[self.color_bgr]]), cv2.COLOR_BGR2HSV)[0, 0].astype(int)
+        distractors = []
+        for i in range(count):
+            hsv = np.uint8([[[(base[0] + 16 + 4 * i) % 180, max(60, base[1] - 60), base[2]]]])
+            bgr = tuple(int(c) for c in cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)[0, 0])
+            x = int(self._rng.uniform(0.1, 0.9) * self.width)
+            y = int(self._rng.uniform(0.1, 0.9) * self.height)
+            distractors.append(((x, y), int(self.radius * self._rng.uniform(0.8, 1.5)), bgr))
+        return distractors
+
+    def position(self, index, target=0):
+        """Centro (x, y) do objeto `target` no frame cru de índice `index` (pode estar fora do quadro)."""
+        index += target * self._spacing
+        t = index / self.fps
+        w, h = self.width, self.height
+        if self.trajectory == 'bounce':
+            vx, vy = 9.0 * self.scale, 6.0 * self.scale
+            span_x, span_y = w - 2 * self.radius, h - 2 * self.radius
+            px = (index * vx) % (2 * span_x)
+            py = (index * vy) % (2 * span_y)
+            return (self.radius + (px if px < span_x else 2 * span_x - px),
+                    self.radius + (py if py < span_y else 2 * span_y - py))
+        if self.trajectory == 'exit':
+            # Vai e volta na horizontal, passando bem além da borda direita
+            period = 8.0
+            phase = (t % period) / period
+            travel = 1.6 * w
+            x = 0.2 * w + travel * (phase * 2 if phase < 0.5 else 2 - phase * 2)
+            return x, h / 2.0 + 0.15 * h * math.sin(t * 1.3)
+        if self.trajectory == 'jump':
+            # A cada 100 frames some por 10 (fora do quadro) e volta do outro lado
+            segmento, quadro = divmod(index, 100)
+            if segmento and quadro < 10:
+                return -10.0 * w, -10.0 * h
+            ax, ay = (0.25 * w, 0.3 * h) if segmento % 2 == 0 else (0.75 * w, 0.7 * h)
+            return ax + 0.08 * w * math.cos(t), ay + 0.08 * h * math.sin(t)
+        speed = 3.0 if self.trajectory == 'fast' else 1.0
+        return (w / 2.0 + (w / 3.0) * math.cos(t * speed),
+                h / 2.0 + (h / 3.0) * math.sin(t * speed))
+
+    def blurred(self, index):
+        return any(start <= index < end for start, end in self.blur)
+
+    def occluded(self, index):
+        return any(start <= index < end for start, end in self.occlusions)
+
+    def truth(self, index, target=0):
+        x, y = self.position(index, target)
+        inside = self.radius <= x < self.width - self.radius and self.radius <= y < self.height - self.radius
+        # Oclusão e borrão só acontecem sobre o primeiro disco
+        return Truth(inside and not (target == 0 and self.occluded(index)), x, y)
+
+    def _paste_sprite(self, frame, centro):
+        sprite, mask = self._sprite
+        r = self.radius
+        x0, y0 = centro[0] - r, centro[1] - r
+        # Parte do disco que cabe no quadro
+        fx0, fy0 = max(0, x0), max(0, y0)
+        fx1, fy1 = min(self.width, x0 + sprite.shape[1]), min(self.height, y0 + sprite.shape[0])
+        if fx1 <= fx0 or fy1 <= fy0:
+            return
+        recorte = (slice(fy0 - y0, fy1 - y0), slice(fx0 - x0, fx1 - x0))
+        cv2.copyTo(sprite[recorte], mask[recorte], frame[fy0:fy1, fx0:fx1])
+
+    def _disc(self, frame, centro, bgr):
+        """Disco liso centrado no ponto (floats) dado."""
+        um = 1 << SUBPIXEL_SHIFT
+        cv2.circle(frame, (int(round(centro[0] * um)), int(round(centro[1] * um))), self.radius * um, bgr,
+                   -1, cv2.LINE_AA, SUBPIXEL_SHIFT)
+
+    def render(self, index):
+        frame = self._background.copy()
+        for center, radius, bgr in self._distractors:
+            cv2.circle(frame, center, radius, bgr, -1)
+
+        for target in range(1, self.targets):
+            outro = self.position(index, target)
+            self._disc(frame, outro, self.colors[target])
+        x, y = self.position(index)
+        centro = (int(round(x)), int(round(y)))
+        if self._sprite is None:
+            self._disc(frame, (x, y), self.color_bgr)
+        else:
+            self._paste_sprite(frame, centro)
+        if self.blurred(index):
+            # Borrão de movimento na horizontal: o objeto se mistura com o fundo
+            r = 4 * self.radius
+            x0, y0 = max(0, centro[0] - r), max(0, centro[1] - r)
+            x1, y1 = min(self.width, centro[0] + r), min(self.height, centro[1] + r)
+            if x1 > x0 and y1 > y0:
+                k = 4 * self.radius + 1
+                frame[y0:y1, x0:x1] = cv2.blur(frame[y0:y1, x0:x1], (k, 3))
+        if self.occluded(index):
+            # Anteparo cinza sobre o objeto
+            r = int(self.radius * 1.6)
+            cv2.rectangle(frame, (int(x) - r, int(y) - r), (int(x) + r, int(y) + r), (90, 90, 90), -1)
+
+        if self.lighting_drift:
+            # Iluminação oscila devagar (auto-exposição / luz do dia)
+            gain = 1.0 + self.lighting_drift * math.sin(2 * math.pi * index / self.num_frames)
+            frame = cv2.convertScaleAbs(frame, alpha=gain)
+        if self.exposure_drift or self.white_balance_drift:
+            # Deriva lenta e monotônica ao longo da cena (fim da tarde): a
+            # exposição muda e o balanço de branco esquenta (menos azul, mais vermelho)
+            p = index / max(1, self.num_frames - 1)
+            gain = 1.0 + self.exposure_drift * p
+            wb = self.white_balance_drift * p
+            frame = cv2.multiply(frame, (gain * (1.0 - wb), gain, gain * (1.0 + wb), 0.0))
+        if self._noise is not None:
+            noisy = frame.astype(np.int16) + self._noise[index % len(self._noise)]
+            frame = np.clip(noisy, 0, 255).astype(np.uint8)
+        return frame
+
+    def frames(self):
+        """Gera (índice, frame BGR cru, gabarito)."""
+        for index in range(self.num_frames):
+            yield index, self.render(index), self.truth(index)
+
+    def pick_point(self, mirror=True, target=0):
+        """Ponto do frame 0 (no frame exibido) para capturar a cor do objeto `target`, como o clique do usuário."""
+        x, y = self.position(0, target)
+        x, y = int(round(x)), int(round(y))
+        if mirror:
+            x = self.width - 1 - x
+        return x, y
+
+
+# Cenários padrão: nome -> parâmetros de Scene (fora resolução e nº de frames)
+SCENARIOS = {
+    'steady': dict(trajectory='orbit'),
+    'noise': dict(trajectory='orbit', noise=12.0),
+    'lighting': dict(trajectory='bounce', lighting_drift=0.35),
+    'daylight': dict(trajectory='orbit', noise=3.0, exposure_drift=-0.35, white_balance_drift=0.3),
+    'occlusion': dict(trajectory='orbit', occlusions=((60, 85), (180, 200))),
+    'exit': dict(trajectory='exit'),
+    'jump': dict(trajectory='jump', noise=3.0),
+    'distractors': dict(trajectory='bounce', distractors=4, occlusions=((100, 130),)),
+    'fast': dict(trajectory='fast', noise=6.0),
+    'multi': dict(trajectory='orbit', noise=3.0, targets=4, occlusions=((120, 140),)),
+    'hands': dict(trajectory='orbit', noise=3.0, targets=2, spacing=10),
+    'blur': dict(trajectory='orbit', noise=4.0, texture=True, blur=((70, 74), (150, 153), (230, 235))),
+}
+
+
+def make_scene(scenario, resolution='720p', num_frames=300, seed=0):
+    """Cria a cena `scenario` (chave de SCENARIOS) na resolução pedida."""
+    width, height = RESOLUTIONS.get(resolution, resolution)
+    return Scene(scenario, width, height, num_frames=num_frames, seed=seed, **SCENARIOS[scenario])
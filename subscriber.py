@@ -0,0 +1,310 @@
+"""
+CLIENTE DO RASTREAMENTO PUBLICADO (outros processos, sem abrir a câmera)
+O wave.py com --publish escreve cada resultado num anel em memória
+compartilhada e, com --publish-udp, também em datagramas UDP (publisher.py).
+Este módulo lê os dois e só usa a biblioteca padrão: pode ser copiado para
+a interface do quiosque, o reconhecedor de gestos ou o logger.
+
+Memória compartilhada (TrackSubscriber): um escritor, vários leitores, sem
+trava. Cada slot tem um contador (seqlock): o escritor o deixa ímpar
+enquanto escreve e par no fim; o leitor copia o slot e confere o contador
+antes e depois - se mudou, o slot foi reescrito no meio e o registro conta
+como perdido. O escritor nunca espera os leitores: quem ficar mais de
+`slots` registros atrás perde os mais velhos (contados em `lost`).
+
+UDP (UdpSubscriber): um datagrama por resultado (DATAGRAM.size bytes),
+perdas detectadas pelos buracos no índice.
+
+Tempos são time.perf_counter() do publicador; em Windows, Linux e macOS o
+relógio é o mesmo para todos os processos da máquina, então
+time.perf_counter() - update.timestamp é a latência desde a captura.
+
+Uso:
+    with TrackSubscriber() as sub:
+        while True:
+            for update in sub.wait(timeout=1.0):
+                print(update.seq, update.phase, update.position)
+
+    python subscriber.py [--name wave-track | --udp 5005]   # consumidor de teste
+"""
+
+import argparse
+import collections
+import math
+import select
+import socket
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+
+# Nome padrão do bloco de memória compartilhada e porta UDP padrão
+DEFAULT_NAME = 'wave-track'
+DEFAULT_PORT = 5005
+
+WIRE_VERSION = 1
+
+# Fases na ordem de tracker.PHASES (o registro leva o índice)
+PHASES = ('detected', 'exact', 'similar', 'flow', 'searching', 'lost')
+
+# Registro: índice (contador do publicador), seq do frame, instante da
+# captura e da publicação, posição (NaN = nenhuma), bbox (largura 0 =
+# nenhum), área e confiança (NaN = nenhuma), fase, alvo
+RECORD = struct.Struct('<QQddffiiiiffBBxx')
+
+# Datagrama UDP: b'WV', versão e o registro
+DATAGRAM = struct.Struct('<2sB' + RECORD.format[1:])
+DATAGRAM_MAGIC = b'WV'
+
+# Cabeçalho do bloco: magic, versão, tamanho do slot, nº de slots, pid do
+# publicador, fechado (1 = o publicador saiu). O total de registros escritos
+# fica em COUNT_OFFSET, atualizado depois de cada slot, e o instante
+# (time.time) da última publicação em HEARTBEAT_OFFSET
+HEADER = struct.Struct('<4sHHIII')
+HEADER_MAGIC = b'WVTR'
+COUNT = struct.Struct('<Q')
+COUNT_OFFSET = 24
+HEARTBEAT = struct.Struct('<d')
+HEARTBEAT_OFFSET = 32
+HEADER_SIZE = 64
+CLOSED_OFFSET = 16
+
+# Slot: contador do seqlock + registro, alinhado em 8 bytes
+LOCK = struct.Struct('<Q')
+SLOT_SIZE = (LOCK.size + RECORD.size + 7) // 8 * 8
+
+TrackUpdate = collections.namedtuple('TrackUpdate', [
+    'index', 'seq', 'timestamp', 'published', 'position', 'bbox', 'area', 'phase', 'confidence', 'target'])
+
+
+def _nan_to_none(value):
+    return None if math.isnan(value) else value
+
+
+def decode(values):
+    """TrackUpdate a partir dos campos de RECORD."""
+    index, seq, timestamp, published, x, y, bx, by, bw, bh, area, confidence, phase, target = values
+    return TrackUpdate(index, seq, timestamp, published, None if math.isnan(x) else (x, y),
+                       (bx, by, bw, bh) if bw > 0 else None, _nan_to_none(area), PHASES[phase],
+                       _nan_to_none(confidence), target)
+
+
+def attach(name):
+    """
+    Abre um bloco de memória compartilhada existente sem registrá-lo no
+    resource_tracker: antes do Python 3.13 o leitor apagaria o bloco do
+    publicador ao sair (e, num processo filho do publicador, desfaria o
+    registro do próprio publicador).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    from multiprocessing import resource_tracker
+    registrar = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = registrar
+
+
+class TrackSubscriber:
+    """
+    Leitor do anel em memória compartilhada `name`. FileNotFoundError se o
+    publicador ainda não criou o bloco. `from_start`: entrega também os
+    registros que ainda estão no anel; senão só os publicados depois.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, from_start=False):
+        self.name = name
+        self.lost = 0
+        self.received = 0
+        self._open(from_start)
+
+    def _open(self, from_start):
+        self._shm = attach(self.name)
+        magic, version, slot_size, slots, self.pid, _ = HEADER.unpack_from(self._shm.buf, 0)
+        if magic != HEADER_MAGIC or version != WIRE_VERSION or slot_size != SLOT_SIZE:
+            self._shm.close()
+            raise ValueError(f"'{self.name}' não é um anel de rastreamento versão {WIRE_VERSION}")
+        self.slots = slots
+        self._next = 0 if from_start else self._written()
+        self._next = max(self._next, self._written() - slots)
+
+    def _written(self):
+        return COUNT.unpack_from(self._shm.buf, COUNT_OFFSET)[0]
+
+    @property
+    def closed(self):
+        """True quando o publicador saiu (o bloco pode ser recriado por outro)."""
+        return HEADER.unpack_from(self._shm.buf, 0)[5] != 0
+
+    def _read(self, index):
+        """Registro `index` ou None (ainda não escrito, ou reescrito no meio da cópia)."""
+        base = HEADER_SIZE + (index % self.slots) * SLOT_SIZE
+        buf = self._shm.buf
+        esperado = 2 * index + 2
+        if LOCK.unpack_from(buf, base)[0] != esperado:
+            return None
+        dados = bytes(buf[base + LOCK.size:base + LOCK.size + RECORD.size])
+        if LOCK.unpack_from(buf, base)[0] != esperado:
+            return None
+        return decode(RECORD.unpack(dados))
+
+    def _reopen(self):
+        """Publicador reiniciado: abre o bloco novo, se já existe."""
+        self.close()
+        try:
+            self._open(from_start=True)
+        except (FileNotFoundError, ValueError):
+            self._shm = None
+            return False
+        return True
+
+    def poll(self):
+        """Registros novos desde a última chamada (lista, talvez vazia). Não bloqueia."""
+        if self._shm is None or self.closed:
+            if not self._reopen():
+                return []
+        escritos = self._written()
+        if escritos - self._next > self.slots:
+            # Ficou para trás: os mais velhos já foram sobrescritos
+            self.lost += escritos - self.slots - self._next
+            self._next = escritos - self.slots
+        novos = []
+        while self._next < escritos:
+            update = self._read(self._next)
+            if update is None:
+                if self._written() - self._next >= self.slots:
+                    # Reescrito enquanto era copiado
+                    self.lost += 1
+                    self._next += 1
+                    continue
+                break
+            novos.append(update)
+            self._next += 1
+        self.received += len(novos)
+        return novos
+
+    def latest(self):
+        """O registro mais novo (sem consumir a fila de poll), ou None."""
+        if self._shm is None:
+            return None
+        escritos = self._written()
+        return self._read(escritos - 1) if escritos else None
+
+    def wait(self, timeout=None, interval=0.0002):
+        """Como poll(), mas espera até `timeout` s por algum registro, conferindo a cada `interval` s."""
+        fim = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            novos = self.poll()
+            if novos or (fim is not None and time.perf_counter() >= fim):
+                return novos
+            time.sleep(interval)
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class UdpSubscriber:
+    """Leitor dos datagramas do publicador em `host`:`port`."""
+
+    def __init__(self, port=DEFAULT_PORT, host='127.0.0.1'):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.lost = 0
+        self.received = 0
+        self.invalid = 0
+        self._next = None
+
+    def _decode(self, datagram):
+        if len(datagram) != DATAGRAM.size:
+            self.invalid += 1
+            return None
+        values = DATAGRAM.unpack(datagram)
+        if values[0] != DATAGRAM_MAGIC or values[1] != WIRE_VERSION:
+            self.invalid += 1
+            return None
+        update = decode(values[2:])
+        if self._next is not None and update.index > self._next:
+            self.lost += update.index - self._next
+        if self._next is None or update.index >= self._next:
+            self._next = update.index + 1
+        return update
+
+    def poll(self):
+        """Datagramas já recebidos (lista, talvez vazia). Não bloqueia."""
+        novos = []
+        while True:
+            try:
+                datagram = self.sock.recv(DATAGRAM.size + 1)
+            except (BlockingIOError, InterruptedError):
+                break
+            update = self._decode(datagram)
+            if update is not None:
+                novos.append(update)
+        self.received += len(novos)
+        return novos
+
+    def wait(self, timeout=None):
+        """Como poll(), mas espera até `timeout` s pelo primeiro datagrama."""
+        prontos, _, _ = select.select([self.sock], [], [], timeout)
+        return self.poll() if prontos else []
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Consumidor de teste do rastreamento publicado')
+    parser.add_argument('--name', default=DEFAULT_NAME, help='bloco de memória compartilhada')
+    parser.add_argument('--udp', type=int, metavar='PORTA', help='lê os datagramas UDP em vez da memória')
+    args = parser.parse_args(argv)
+    sub = None
+    try:
+        while sub is None:
+            try:
+                sub = UdpSubscriber(args.udp) if args.udp else TrackSubscriber(args.name)
+            except FileNotFoundError:
+                print(f"Esperando um publicador em '{args.name}' (wave.py --publish)...")
+                time.sleep(1.0)
+    except KeyboardInterrupt:
+        return 1
+    latencias = []
+    inicio = time.perf_counter()
+    with sub:
+        try:
+            while True:
+                for update in sub.wait(timeout=1.0):
+                    latencias.append(time.perf_counter() - update.published)
+                if time.perf_counter() - inicio >= 1.0 and latencias:
+                    latencias.sort()
+                    p50 = latencias[len(latencias) // 2] * 1e6
+                    pior = latencias[-1] * 1e6
+                    print(f"{len(latencias) / (time.perf_counter() - inicio):6.0f}/s  "
+                          f"publicação->leitura p50 {p50:.0f} µs  máx {pior:.0f} µs  perdidos {sub.lost}")
+                    latencias, inicio = [], time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
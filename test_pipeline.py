@@ -0,0 +1,127 @@
+"""
+Comandos que viajam no meta do pipeline (wave.py): um frame descartado antes
+do rastreamento devolve os comandos para o próximo; um descartado depois não
+(o rastreador já os aplicou).
+
+Os tempos medidos dentro de uma etapa de processo voltam para o PROFILER
+do processo principal.
+
+    python -m pytest -q test_pipeline.py
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from instrumentation import PROFILER
+from pipeline import Pipeline, Stage
+
+
+def _wait(condition, timeout=5.0):
+    fim = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > fim:
+            raise AssertionError('tempo esgotado')
+        time.sleep(0.001)
+
+
+def test_commands_applied_once_when_dropped_after_track():
+    aplicados = []
+    pendentes = []
+    lock = threading.Lock()
+    liberar = threading.Event()
+
+    def requeue(item):
+        with lock:
+            pendentes[:0] = item.meta['commands']
+
+    def take():
+        with lock:
+            comandos = pendentes[:]
+            del pendentes[:]
+        return comandos
+
+    def make_track():
+        def track(frame, meta):
+            aplicados.extend(meta['commands'])
+            return dict(meta)
+        return track
+
+    def make_compose():
+        def compose(frame, meta):
+            liberar.wait(5.0)
+            return meta
+        return compose
+
+    frame = np.zeros((4, 4, 3), np.uint8)
+    pipe = Pipeline([Stage('track', make_track), Stage('compose', make_compose)],
+                    policy='latency', depth=1, on_drop=requeue).start()
+    try:
+        for seq, comando in enumerate(['set_color', 'reset', 'set_color_2', None]):
+            with lock:
+                if comando is not None:
+                    pendentes.append(comando)
+            pipe.submit(seq, frame, {'commands': take()})
+            # Um frame por vez no rastreador: os descartes acontecem depois dele
+            _wait(lambda: pipe.stats()['track']['processed'] == seq + 1)
+        assert pipe.stats()['compose']['dropped'] >= 1
+        liberar.set()
+        _wait(lambda: pipe.stats()['compose']['processed'] >= 2)
+    finally:
+        liberar.set()
+        pipe.close()
+
+    assert aplicados == ['set_color', 'reset', 'set_color_2']
+    assert pendentes == []
+
+
+def test_commands_requeued_when_dropped_before_track():
+    requeued = []
+    liberar = threading.Event()
+
+    def make_track():
+        def track(frame, meta):
+            liberar.wait(5.0)
+            return meta
+        return track
+
+    frame = np.zeros((4, 4, 3), np.uint8)
+    pipe = Pipeline([Stage('track', make_track)], policy='latency', depth=1,
+                    on_drop=lambda item: requeued.extend(item.meta['commands'])).start()
+    try:
+        pipe.submit(0, frame, {'commands': ['a']})
+        _wait(lambda: pipe.stats()['track']['queued'] == 0)
+        pipe.submit(1, frame, {'commands': ['b']})
+        pipe.submit(2, frame, {'commands': ['c']})
+    finally:
+        liberar.set()
+        pipe.close()
+
+    assert requeued == ['b']
+
+
+def make_timed():
+    def timed(frame, meta):
+        t0 = PROFILER.tic()
+        time.sleep(0.001)
+        PROFILER.toc('hsv', t0)
+        return meta
+    return timed
+
+
+def test_process_stage_returns_profiler_samples():
+    PROFILER.reset()
+    PROFILER.enabled = True
+    frame = np.zeros((4, 4, 3), np.uint8)
+    pipe = Pipeline([Stage('track', make_timed, process=True)], policy='throughput').start()
+    try:
+        for seq in range(3):
+            pipe.submit(seq, frame, {})
+        for _ in range(3):
+            assert pipe.get(timeout=10.0) is not None
+    finally:
+        pipe.close()
+        PROFILER.enabled = False
+    assert PROFILER.summary()['hsv']['count'] == 3
+    PROFILER.reset()
@@ -0,0 +1,576 @@
+"""
+MOTOR DE RASTREAMENTO (sem interface gráfica nem dependência de SO)
+Recebe frames BGR crus e devolve posição, bbox, área e fase do objeto.
+Todo o estado do rastreamento (cor, última posição, contadores) fica no
+objeto Tracker, então vários rastreadores podem rodar no mesmo processo.
+"""
+
+import collections
+import math
+import time
+
+from adaptation import ColorAdapter
+from colormodel import MAX_TOLERANCE, ColorLUT, HistogramModel, hsv_range, in_range, range_center, range_key
+from detection import (MIN_AREA_EXACT, RoiFrame, find_object_camshift, find_object_near_position,
+                       find_object_pyramid, find_similar_object_ladder, hsv_at, hsv_patch_at,
+                       mirror_window, scaled_length, tracking_window)
+from flow import FeatureFlow
+from incremental import SegmentationCache
+from instrumentation import PROFILER
+from reacquire import Reacquirer
+from workspace import Workspace
+
+
+# Fases do rastreamento
+PHASE_DETECTED = 'detected'    # Verde    = objeto encontrado (cor exata)
+PHASE_EXACT = 'exact'          # Amarelo  = reencontrado com a cor exata após perder
+PHASE_SIMILAR = 'similar'      # Azul     = rastreando cor SIMILAR
+PHASE_FLOW = 'flow'            # Magenta  = seguido por fluxo óptico entre detecções de cor
+PHASE_SEARCHING = 'searching'  # Vermelho = procurando ao redor da última posição
+PHASE_LOST = 'lost'            # Sem cor capturada ou objeto perdido
+PHASES = (PHASE_DETECTED, PHASE_EXACT, PHASE_SIMILAR, PHASE_FLOW, PHASE_SEARCHING, PHASE_LOST)
+
+# Fases em que o objeto foi achado neste frame
+FOUND_PHASES = (PHASE_DETECTED, PHASE_EXACT, PHASE_SIMILAR, PHASE_FLOW)
+
+# Modelos de cor: range HSV fixo ao redor do pixel clicado, ou histograma H-S
+# aprendido (back-projection + CamShift, com o range como reserva)
+COLOR_MODELS = ('range', 'histogram')
+
+# Amostra do histograma no clique: recorte de raio 12 px (em 1280x720) ao redor
+# do pixel, só com os pixels de cor parecida (Hue ±20, Saturação ±80, qualquer Valor)
+HISTOGRAM_SAMPLE_RADIUS = 12
+HISTOGRAM_SAMPLE_TOLERANCE = (20, 80, 255)
+
+# A cada tantos frames seguidos pelo CamShift, confirmar com a cor exata dentro
+# do bbox e, se confirmar, refinar o histograma com esses pixels
+HISTOGRAM_REFINE_FRAMES = 10
+
+# Janela do CamShift: bbox anterior centrado na posição prevista, com folga de
+# um tamanho do objeto para cada lado (a back-projection só é calculada nela)
+CAMSHIFT_WINDOW_MARGIN = 1.0
+
+# Com fluxo óptico: se a detecção por cor agendada falhar (borrão de movimento,
+# reflexo), o fluxo pode seguir o objeto por até mais tantos intervalos
+FLOW_MAX_BRIDGE_INTERVALS = 2
+
+# Um objeto "similar" maior que isso vezes a última área é fundo, não o objeto
+SIMILAR_MAX_AREA_RATIO = 4.0
+
+# A cada tantos frames seguidos só com cor similar, procurar a cor exata no
+# frame inteiro (o "similar" pode ser um pedaço do fundo, e o objeto já voltou).
+# Com reacquire=True a varredura em faixas faz isso aos poucos, frame a frame
+SIMILAR_RECHECK_FRAMES = 10
+
+# Adaptação da cor (adapt_color=True): também aprende com achados por cor
+# similar até este nível de tolerância (mudança rápida de luz: a cor exata
+# já falhou, mas o objeto ainda está perto dela)
+ADAPT_MAX_SIMILAR_LEVEL = 10
+
+# Reaquisição (reacquire=True): depois de tantos frames sem achar o objeto
+# perto de onde sumiu (ou só achando cor similar), varrer também o frame
+# inteiro em faixas, uma por frame, procurando a cor exata
+REACQUIRE_AFTER_FRAMES = 5
+
+# Com a varredura em faixas, a janela local para de crescer depois de tantos
+# frames perdidos (o frame inteiro já é coberto pelas faixas): o custo do
+# pior frame fica limitado
+SEARCH_MAX_GROWTH_FRAMES = 10
+
+# tracker_stage repete o histograma no meta por tantos frames depois de uma
+# cor nova: com a política 'latency' um meta pode ser descartado depois do
+# rastreamento, e o perfil da cor ficaria sem o histograma. Os refinamentos
+# seguintes (a cada HISTOGRAM_REFINE_FRAMES) vão uma vez: o próximo substitui
+HIST_RESEND_FRAMES = 15
+
+# Resultado de um frame. Coordenadas no frame exibido (espelhado se
+# mirror=True): position é o centróide sub-pixel (floats), bbox é inteiro.
+# position/bbox/area ficam None quando nada foi encontrado (em 'searching',
+# position é a última posição conhecida). search_radius é o raio usado (px).
+# confidence (0..1) e box (caixa girada ((cx, cy), (w, h), ângulo)) só vêm
+# do CamShift.
+TrackResult = collections.namedtuple('TrackResult', [
+    'phase', 'position', 'bbox', 'area', 'tolerance', 'search_radius', 'frames_lost',
+    'confidence', 'box'
+], defaults=(None, None))
+
+
+def color_sample(frame, x, y, mirror=True):
+    """Recorte HSV ao redor do pixel (x, y) do frame exibido, para aprender o histograma."""
+    return hsv_patch_at(frame, x, y, scaled_length(HISTOGRAM_SAMPLE_RADIUS, frame.shape[1]), mirror)
+
+
+class Tracker:
+    """
+    Rastreador de um objeto por cor:
+      1. objeto perdido -> busca no frame inteiro (pirâmide)
+      2. rastreando     -> cor exata numa janela ao redor da última posição
+      3. não achou      -> escada de tolerâncias (cores similares) na mesma janela;
+                           de tempos em tempos confere a cor exata no frame inteiro
+      4. após `max_lost_frames` frames sem achar -> desiste (fase 'lost')
+
+    Com reacquire=True (padrão), a partir de REACQUIRE_AFTER_FRAMES frames
+    perdidos (ou seguidos só por cor similar) o passo 3 vem junto com uma
+    varredura do frame inteiro em faixas, uma por frame
+    (reacquire.Reacquirer): o objeto que reaparece longe de onde sumiu é
+    reencontrado sem esperar a desistência, a janela local para de crescer e
+    a conferência periódica no frame inteiro deixa de ser um pico de custo.
+
+    Com color_model='histogram', o passo 2 vira back-projection do
+    histograma H-S + CamShift na janela (mais barato e tolerante a sombras);
+    os passos de cor exata/similar só rodam quando o CamShift perde a
+    confiança. O histograma vem do recorte ao redor do clique e é refinado
+    com detecções confirmadas pela cor exata.
+
+    Com flow_interval=N > 0, a detecção por cor roda só a cada N frames (ou
+    quando pedida com request_detection()); entre elas o objeto é seguido
+    por fluxo óptico esparso (flow.FeatureFlow, fase 'flow'). Quando o fluxo
+    perde a confiança, a cor assume no mesmo frame; quando a cor agendada
+    falha, o fluxo cobre o buraco por alguns intervalos.
+
+    Qualidade (ajustável a cada frame, ex. pelo QualityGovernor): `scale`
+    reduz o recorte antes da segmentação, `margin` multiplica o raio de
+    busca e `morphology` escolhe a limpeza da máscara.
+
+    Com reuse_buffers=True (padrão) os intermediários da segmentação ficam
+    num workspace.Workspace próprio e são reaproveitados entre frames.
+
+    Com adapt_color=True, cada detecção confirmada atualiza o range de cor
+    (adaptation.ColorAdapter): ele acompanha mudanças lentas de iluminação,
+    com deslocamento limitado e rollback em mudanças bruscas de área/forma,
+    e o rastreamento fica no caminho barato da cor exata. `base_color` é o
+    range capturado; `hsv_color`, o range em uso.
+
+    Com incremental=True, o HSV e a máscara da janela de rastreamento vêm
+    de um incremental.SegmentationCache: só os blocos da imagem que mudaram
+    (mais os ao redor do objeto e um rodízio de atualização) são
+    reconvertidos. `segmentation.skipped_fraction()` diz quantos blocos do
+    frame vieram do cache.
+    """
+
+    def __init__(self, hsv_color=None, mirror=True, classifier=None, search_radius=100,
+                 max_lost_frames=60, max_tolerance=MAX_TOLERANCE, color_model='range', flow_interval=0,
+                 reuse_buffers=True, hist=None, adapt_color=False, reacquire=True, incremental=False):
+        if color_model not in COLOR_MODELS:
+            raise ValueError(f"modelo de cor desconhecido: {color_model!r} (opções: {', '.join(COLOR_MODELS)})")
+        self.mirror = mirror
+        self.classifier = classifier
+        self.search_radius = search_radius   # px em 1280x720
+        self.max_lost_frames = max_lost_frames
+        self.max_tolerance = max_tolerance
+        self.scale = 1.0
+        self.margin = 1.0
+        self.morphology = 'full'
+        self.histogram = HistogramModel() if color_model == 'histogram' else None
+        self.workspace = Workspace() if reuse_buffers else None
+        self.adapt_color = adapt_color
+        self.adapter = None
+        self.reacquirer = Reacquirer() if reacquire else None
+        self.segmentation = SegmentationCache() if incremental else None
+        self.flow_interval = int(flow_interval)
+        self.flow = FeatureFlow() if self.flow_interval > 0 else None
+        self._flow_frames = 0           # frames seguidos por fluxo desde a última detecção por cor
+        self._force_detection = False
+        self._seed_wait = 0             # detecções por cor até tentar pontos de novo (objeto sem textura)
+
+        self.hsv_color = None
+        self.hsv_ref = None
+        self.base_color = None
+        self.last_position = None
+        self.last_bbox = None
+        self.last_area = 0
+        self.velocity = (0.0, 0.0)      # px/frame no frame exibido, média dos últimos achados
+        self._anchor = None             # (posição, velocidade, área) do último achado que não foi só similar
+        self.frames_lost = 0
+        self.frames_camshift = 0
+        self.frames_similar = 0
+        self.tolerance = 0
+        if hsv_color is not None:
+            self.set_color(hsv_color, hist=hist)
+
+    @classmethod
+    def with_lut(cls, **kwargs):
+        """Tracker usando o classificador por tabela BGR->máscara."""
+        return cls(classifier=ColorLUT(), **kwargs)
+
+    def set_color(self, hsv_color, sample=None, hist=None):
+        """
+        Define o range (lower, upper) da cor rastreada. `sample` (recorte HSV
+        ao redor do clique, ver color_sample) inicia o histograma; `hist`
+        (histograma de um perfil salvo) é usado como está; sem nenhum dos
+        dois, o histograma é aprendido na primeira detecção pela cor exata.
+        """
+        lower, upper = hsv_color
+        self.base_color = (lower, upper)
+        if self.classifier is not None:
+            # Montar a tabela BGR->máscara uma única vez, na captura da cor
+            self.classifier.clear()
+        self._use_range(lower, upper)
+        if self.adapt_color:
+            # Com o histograma, as amostras só vêm do refinamento (já espaçado)
+            self.adapter = ColorAdapter(self.base_color, every=1 if self.histogram is not None else 3)
+        if self.flow is not None:
+            self.flow.reset()
+            self._seed_wait = 0
+        if self.reacquirer is not None:
+            self.reacquirer.reset()
+        if self.histogram is not None:
+            self.histogram.reset()
+            if hist is not None:
+                self.histogram.load(hist)
+            elif sample is not None:
+                parecidos = in_range(sample, *hsv_range(*self.hsv_ref, *HISTOGRAM_SAMPLE_TOLERANCE))
+                self.histogram.learn(sample, parecidos)
+
+    def capture_color(self, frame, x, y, h_tol=10, s_tol=40, v_tol=40):
+        """
+        Captura a cor do pixel (x, y) do frame exibido (como o clique na janela).
+        Retorna o HSV do pixel.
+        """
+        h_val, s_val, v_val = hsv_at(frame, x, y, mirror=self.mirror)
+        sample = color_sample(frame, x, y, self.mirror) if self.histogram is not None else None
+        self.set_color(hsv_range(h_val, s_val, v_val, h_tol, s_tol, v_tol), sample)
+        return h_val, s_val, v_val
+
+    def _use_range(self, lower, upper):
+        """Range em uso nas buscas (o capturado ou o adaptado)."""
+        self.hsv_color = (lower, upper)
+        self.hsv_ref = range_center(lower, upper)
+        if self.classifier is not None:
+            self.classifier.set_range(lower, upper)
+
+    def set_quality(self, scale=1.0, margin=1.0, morphology='full'):
+        self.scale = scale
+        self.margin = margin
+        self.morphology = morphology
+
+    def reset(self):
+        """Esquece cor, posição e contadores."""
+        self.hsv_color = None
+        self.hsv_ref = None
+        self.base_color = None
+        self.adapter = None
+        self.last_position = None
+        self.last_bbox = None
+        self.last_area = 0
+        self.velocity = (0.0, 0.0)
+        self._anchor = None
+        self.frames_lost = 0
+        self.frames_similar = 0
+        self.frames_camshift = 0
+        self.tolerance = 0
+        if self.histogram is not None:
+            self.histogram.reset()
+        if self.flow is not None:
+            self.flow.reset()
+            self._seed_wait = 0
+        if self.reacquirer is not None:
+            self.reacquirer.reset()
+
+    def request_detection(self):
+        """Força a detecção por cor no próximo frame (com fluxo óptico ligado)."""
+        self._force_detection = True
+
+    def _found(self, phase, pos, bbox, area, radius, confidence=None, box=None):
+        if self.last_position is not None and self.frames_lost == 0:
+            vx, vy = self.velocity
+            self.velocity = (vx + 0.5 * (pos[0] - self.last_position[0] - vx),
+                             vy + 0.5 * (pos[1] - self.last_position[1] - vy))
+        else:
+            self.velocity = (0.0, 0.0)
+        self.last_position = pos
+        self.last_bbox = bbox
+        self.last_area = area
+        self.frames_lost = 0
+        if phase != PHASE_SIMILAR:
+            self.frames_similar = 0
+            self._anchor = (pos, self.velocity, area)
+            if self.reacquirer is not None and self.reacquirer.active:
+                self.reacquirer.reset()
+        return TrackResult(phase, pos, bbox, area, self.tolerance, radius, 0, confidence, box)
+
+    def _refine(self, frame, bbox):
+        """
+        Detecção confirmada: se a cor exata aparece dentro do bbox, acrescenta
+        esses pixels ao histograma. Retorna True se o histograma mudou.
+        """
+        x, y, w_box, h_box = bbox
+        roi = RoiFrame(frame, (x, y, x + w_box, y + h_box), mirror=self.mirror, classifier=self.classifier,
+                       workspace=self.workspace, slot='refine')
+        area = find_object_near_position(roi, self.hsv_color)[2]
+        if area is None:
+            return False
+        self._adapt(frame, bbox, area, roi)
+        return self.histogram.learn(roi.hsv, roi.classify(*self.hsv_color))
+
+    def _adapt(self, frame, bbox, area, roi=None):
+        """
+        Detecção confirmada: amostra da cor para o ColorAdapter (se ligado).
+        `roi`: recorte que contém o bbox e já tem o HSV calculado (senão o
+        HSV só do bbox é calculado aqui).
+        """
+        if self.adapter is None:
+            return
+        t0 = PROFILER.tic()
+        if roi is not None:
+            x0, y0, w_local, h_local = roi.to_local(bbox)
+            hsv = roi.hsv[y0:y0 + h_local, x0:x0 + w_local]
+        else:
+            x, y, w_box, h_box = bbox
+            hsv = RoiFrame(frame, (x, y, x + w_box, y + h_box), mirror=self.mirror,
+                           workspace=self.workspace, slot='adapt').hsv
+        if hsv.size and self.adapter.observe(hsv, bbox, area):
+            self._use_range(*self.adapter.hsv_color)
+        PROFILER.toc('adapt', t0)
+
+    def _reacquire(self, frame, radius):
+        """Uma faixa da varredura do frame inteiro; TrackResult se um candidato tem a cor exata."""
+        if not self.reacquirer.active:
+            # Posição e tamanho de referência: o último achado confiável (um
+            # "similar" pode ser um pedaço do fundo)
+            self.reacquirer.start(*(self._anchor or (self.last_position, self.velocity, self.last_area)))
+        pos, bbox, area = self.reacquirer.step(frame, self.hsv_color, self.hsv_ref, mirror=self.mirror,
+                                               classifier=self.classifier, workspace=self.workspace)
+        if pos is None:
+            return None
+        self.tolerance = 0
+        if self.histogram is not None:
+            self._refine(frame, bbox)
+        else:
+            self._adapt(frame, bbox, area)
+        return self._found(PHASE_EXACT, pos, bbox, area, radius)
+
+    def _follow_flow(self, frame, center=None):
+        """Segue o objeto por fluxo óptico; None se o fluxo perdeu a confiança."""
+        t0 = PROFILER.tic()
+        seguido = self.flow.track(frame, center)
+        PROFILER.toc('flow', t0)
+        if seguido is None:
+            if self._flow_frames == 0:
+                # Perdeu logo no primeiro frame (pontos de ruído, sem textura): esperar
+                self._seed_wait = self.flow_interval
+            return None
+        pos, confianca = seguido
+        _, _, w_box, h_box = self.last_bbox
+        bbox = (int(round(pos[0])) - w_box // 2, int(round(pos[1])) - h_box // 2, w_box, h_box)
+        self._flow_frames += 1
+        return self._found(PHASE_FLOW, pos, bbox, self.last_area, 0, confianca)
+
+    def process(self, frame, center=None):
+        """
+        Processa um frame BGR cru e devolve um TrackResult.
+        `center`: posição prevista do objeto neste frame (MotionModel.center);
+        enquanto o objeto está sendo seguido, a janela fica ao redor dela em
+        vez da última posição.
+        """
+        if self.flow is None:
+            return self._process(frame, center)
+
+        # Entre detecções por cor agendadas, só o fluxo óptico
+        if (self.flow.active and self.frames_lost == 0 and not self._force_detection
+                and self._flow_frames < self.flow_interval):
+            result = self._follow_flow(frame, center)
+            if result is not None:
+                return result
+
+        result = self._process(frame, center)
+        if result.phase in (PHASE_DETECTED, PHASE_EXACT):
+            # Detecção por cor: recomeça o fluxo com pontos novos sobre o objeto.
+            # Objeto liso (sem cantos): só tenta de novo depois de um intervalo
+            self._flow_frames = 0
+            self._force_detection = False
+            if self._seed_wait > 0:
+                self._seed_wait -= 1
+            else:
+                t0 = PROFILER.tic()
+                if not self.flow.seed(frame, result.bbox, self.mirror, self.hsv_color):
+                    self._seed_wait = self.flow_interval
+                PROFILER.toc('flow', t0)
+        elif result.phase != PHASE_FLOW:
+            self.flow.reset()
+        return result
+
+    def _process(self, frame, center):
+        if self.hsv_color is None:
+            return TrackResult(PHASE_LOST, None, None, None, 0, 0, 0)
+
+        frame_h, frame_w = frame.shape[:2]
+        if self.workspace is not None:
+            self.workspace.reserve(frame.shape)
+        if self.segmentation is not None:
+            # Blocos do objeto (e até onde ele anda num frame) sempre
+            # reconvertidos: a borda que entra num bloco vizinho mexe pouco na
+            # média dele. Os outros blocos, só se mudaram
+            foco = None
+            if self.last_bbox is not None and self.last_position is not None:
+                x, y, w_box, h_box = self.last_bbox
+                folga = int(math.ceil(max(abs(self.velocity[0]), abs(self.velocity[1])))) + 2
+                foco = (x - folga, y - folga, x + w_box + folga, y + h_box + folga)
+                if self.mirror:
+                    foco = mirror_window(foco, frame_w)
+            self.segmentation.update(frame, foco)
+
+        if self.last_position is None:
+            # Objeto perdido (ou ainda não encontrado): procurar no frame inteiro,
+            # candidatos em baixa resolução e refinamento em resolução cheia
+            self.tolerance = 0
+            pos, bbox, area = find_object_pyramid(frame, self.hsv_color, mirror=self.mirror,
+                                                  classifier=self.classifier, workspace=self.workspace)
+            if pos is None:
+                return TrackResult(PHASE_LOST, None, None, None, 0, 0, 0)
+            if self.histogram is not None:
+                self._refine(frame, bbox)
+            else:
+                self._adapt(frame, bbox, area)
+            return self._found(PHASE_DETECTED, pos, bbox, area, 0)
+
+        # Rastreamento: tudo roda só na janela ao redor da última posição
+        crescimento = self.frames_lost if self.reacquirer is None else min(self.frames_lost, SEARCH_MAX_GROWTH_FRAMES)
+        raio = scaled_length((self.search_radius + crescimento * 10) * self.margin, frame_w)
+        centro = center if center is not None and self.frames_lost == 0 else self.last_position
+        janela = tracking_window(centro, raio, self.last_area, frame_w, frame_h)
+        roi = RoiFrame(frame, janela, mirror=self.mirror, classifier=self.classifier,
+                       scale=self.scale, morphology=self.morphology, workspace=self.workspace, slot='track',
+                       cache=self.segmentation)
+
+        phase = PHASE_DETECTED if self.frames_lost == 0 else PHASE_EXACT
+        max_area = SIMILAR_MAX_AREA_RATIO * max(self.last_area, MIN_AREA_EXACT * roi.area_scale)
+
+        # TENTATIVA 0 (modelo histograma, objeto sendo seguido): back-projection +
+        # CamShift numa janela justa ao redor do bbox anterior. Depois de um
+        # achado só por cor similar o bbox pode ser fundo: volta pela cor exata
+        if (self.histogram is not None and self.histogram.ready and self.last_bbox is not None
+                and self.frames_lost == 0 and self.frames_similar == 0):
+            _, _, w_box, h_box = self.last_bbox
+            inicial = (int(centro[0]) - w_box // 2, int(centro[1]) - h_box // 2, w_box, h_box)
+            folga = int(max(w_box, h_box) * CAMSHIFT_WINDOW_MARGIN * self.margin)
+            janela_cs = (max(0, inicial[0] - folga), max(0, inicial[1] - folga),
+                         min(frame_w, inicial[0] + w_box + folga), min(frame_h, inicial[1] + h_box + folga))
+            roi_cs = RoiFrame(frame, janela_cs, mirror=self.mirror, scale=self.scale,
+                              workspace=self.workspace, slot='camshift', cache=self.segmentation)
+            pos, bbox, area, confianca, caixa = find_object_camshift(roi_cs, self.histogram, inicial)
+            if pos is not None and area <= max_area:
+                self.frames_camshift += 1
+                if self.frames_camshift % HISTOGRAM_REFINE_FRAMES == 0:
+                    self._refine(frame, bbox)
+                self.tolerance = 0
+                return self._found(phase, pos, bbox, area, raio, confianca, caixa)
+
+        # TENTATIVA 1: objeto EXATO
+        pos, bbox, area = find_object_near_position(roi, self.hsv_color)
+        if pos is not None:
+            self.tolerance = 0
+            if self.histogram is not None:
+                self._refine(frame, bbox)
+            else:
+                # Sem tabela, o HSV da janela já foi calculado pela busca
+                self._adapt(frame, bbox, area, roi if self.classifier is None else None)
+            return self._found(phase, pos, bbox, area, raio)
+
+        # A cor falhou mas o fluxo ainda segue o objeto (ex.: borrão de movimento)
+        if (self.flow is not None and self.flow.active and self.frames_lost == 0
+                and self._flow_frames < FLOW_MAX_BRIDGE_INTERVALS * self.flow_interval):
+            result = self._follow_flow(frame, center)
+            if result is not None:
+                return result
+
+        self.frames_lost += 1
+
+        # TENTATIVA 2: cores SIMILARES - a escada inteira de tolerâncias sai de
+        # um único mapa de distância; fica a mais apertada que encontra o objeto
+        t0 = PROFILER.tic()
+        pos, bbox, area, nivel = find_similar_object_ladder(roi, self.hsv_ref, self.max_tolerance,
+                                                            max_area=max_area)
+        PROFILER.toc('similar', t0)
+        self.tolerance = nivel if nivel is not None else self.max_tolerance
+        if pos is not None:
+            self.frames_similar += 1
+            if self.reacquirer is not None:
+                if self.frames_similar >= REACQUIRE_AFTER_FRAMES:
+                    exato = self._reacquire(frame, raio)
+                    if exato is not None:
+                        return exato
+            elif self.frames_similar % SIMILAR_RECHECK_FRAMES == 0:
+                exato = find_object_pyramid(frame, self.hsv_color, mirror=self.mirror,
+                                            classifier=self.classifier, workspace=self.workspace)
+                if exato[0] is not None:
+                    self.tolerance = 0
+                    if self.histogram is not None:
+                        self._refine(frame, exato[1])
+                    else:
+                        self._adapt(frame, exato[1], exato[2])
+                    return self._found(PHASE_EXACT, *exato, raio)
+            if nivel <= ADAPT_MAX_SIMILAR_LEVEL:
+                self._adapt(frame, bbox, area, roi)
+            return self._found(PHASE_SIMILAR, pos, bbox, area, raio)
+
+        # Longe dali: uma faixa da varredura do frame inteiro por frame
+        if self.reacquirer is not None and self.frames_lost >= REACQUIRE_AFTER_FRAMES:
+            exato = self._reacquire(frame, raio)
+            if exato is not None:
+                return exato
+
+        # FASE 3: PROCURANDO (ou desistindo)
+        frames_lost = self.frames_lost
+        if frames_lost > self.max_lost_frames:
+            if self.adapter is not None and self.adapter.rollback():
+                # A adaptação pode ter levado o range para longe do objeto
+                self._use_range(*self.adapter.hsv_color)
+            if self.reacquirer is not None:
+                self.reacquirer.reset()
+            self.last_position = None
+            self.frames_lost = 0
+            self.tolerance = 0
+            return TrackResult(PHASE_LOST, None, None, None, 0, raio, frames_lost)
+        return TrackResult(PHASE_SEARCHING, self.last_position, None, None,
+                           self.tolerance, raio, frames_lost)
+
+
+def tracker_stage(classifier='hsv', mirror=True, **kwargs):
+    """
+    Fábrica para pipeline.Stage: devolve fn(frame, meta) com um Tracker
+    próprio (vive na thread ou no processo da etapa).
+
+    meta (dict) pode trazer 'commands' - lista de ('set_color', (lower, upper)[, amostra[, hist]])
+    ou ('reset',), aplicados antes do frame -, 'center' (posição prevista) e
+    'quality' (argumentos de Tracker.set_quality).
+    Devolve o meta com 'result' (TrackResult), 'hsv_color' (range em uso),
+    'base_color' (range capturado; difere do em uso com adapt_color),
+    'last_area' e 'track_s' (segundos gastos no frame); com o modelo 'histogram', 'hist'
+    traz o histograma (para salvar no perfil) no frame em que ele muda e nos
+    HIST_RESEND_FRAMES frames seguintes a uma cor capturada nova.
+    Com incremental=True, 'skipped_tiles' é a fração dos blocos da janela que
+    vieram do cache (None nos frames sem segmentação por cor).
+    """
+    tracker = Tracker.with_lut(mirror=mirror, **kwargs) if classifier == 'lut' else \
+        Tracker(mirror=mirror, **kwargs)
+    enviado = {'hist': None, 'cor': None, 'restam': 0}
+
+    def track(frame, meta):
+        inicio = time.perf_counter()
+        if meta.get('quality'):
+            tracker.set_quality(**meta['quality'])
+        for command in meta.get('commands') or ():
+            if command[0] == 'set_color':
+                tracker.set_color(*command[1:])
+            elif command[0] == 'reset':
+                tracker.reset()
+        result = tracker.process(frame, meta.get('center') if tracker.last_position is not None else None)
+        saida = dict(meta, result=result, hsv_color=tracker.hsv_color, base_color=tracker.base_color,
+                     last_area=tracker.last_area, track_s=time.perf_counter() - inicio)
+        if tracker.segmentation is not None:
+            segmentado = tracker.segmentation.frame is frame
+            saida['skipped_tiles'] = tracker.segmentation.skipped_fraction() if segmentado else None
+        # learn() troca o array a cada amostra: basta comparar a identidade
+        hist = tracker.histogram.hist if tracker.histogram is not None else None
+        cor = range_key(*tracker.base_color) if tracker.base_color is not None else None
+        if cor != enviado['cor']:
+            enviado.update(hist=hist, cor=cor, restam=HIST_RESEND_FRAMES)
+        elif hist is not enviado['hist']:
+            enviado.update(hist=hist, restam=max(enviado['restam'], 1))
+        if hist is not None and enviado['restam'] > 0:
+            saida['hist'] = hist
+            enviado['restam'] -= 1
+        return saida
+
+    return track
@@ -4,43 +4,62 @@ Clique em um objeto na câmera para capturar sua cor
 O programa vai criar um filtro e rastrear o objeto mesmo quando ele sair da câmera
 """
 
+import time
+
+# Início do programa: referência do tempo até o primeiro frame rastreado
+_T0 = time.perf_counter()
+
+import argparse
 import cv2
-import numpy as np
 import ctypes
-import time
+import functools
+import threading
+
+import numpy as np
 
-# Prefer using pyautogui when available (higher-level, often less blocked).
-try:
-    import pyautogui
-    pyautogui.FAILSAFE = False
-    _use_pyautogui = True
-except Exception:
-    _use_pyautogui = False
-
-# Prefer keyboard for press-and-hold if available
-try:
-    import keyboard
-    _use_keyboard = True
-except Exception:
-    _use_keyboard = False
+from capture import FrameGrabber, open_source_async
+from cursor import BACKENDS, DEFAULT_SCREEN_SIZE, CursorDispatcher, detect_screen_size, make_backend, parse_size
+from colormodel import hsv_range, range_key
+from detection import hsv_at, scaled_area
+from governor import QualityGovernor
+from hotkeys import HotkeyInput
+from instrumentation import PROFILER
+from motion import FILTERS, CursorInterpolator, MotionModel
+from multitrack import MAX_TARGETS, multi_stage
+from pipeline import POLICIES, Pipeline, Stage
+from profiles import (DEFAULT_CAMERA, DEFAULT_TUNING, ProfileStore, calibration, camera_key, default_user,
+                      env_calibration, find_env, read_env, resolve, tracker_color)
+from recorder import DEFAULT_SLOTS, SessionRecorder
+from preview import PreviewRenderer
+from publisher import TrackPublisher, parse_address
+from subscriber import DEFAULT_NAME
+from tracker import COLOR_MODELS, FOUND_PHASES, PHASE_LOST, color_sample, tracker_stage
+from workspace import Workspace
 
 # Variáveis globais
-hsv_color = None
-frame_hsv = None
-last_position = None  # Armazena última posição conhecida
-search_radius = 100   # Raio de busca em pixels
+# O Tracker vive na etapa de rastreamento (no loop ou numa thread/processo do
+# pipeline); a interface só conversa com ele por comandos que vão junto do
+# próximo frame: ('set_color', (lower, upper), amostra) ou ('reset',)
+comandos = []
+comandos_lock = threading.Lock()
+motion = None          # Filtro + predição da posição do cursor
+cursor = None          # CursorDispatcher: aplica movimentos/cliques numa thread própria
+frame_raw = None       # Último frame BGR cru (não espelhado)
+preview = None         # PreviewRenderer: se/como a janela é desenhada (nada com ela escondida)
+num_targets = 1        # Alvos de cores diferentes (--targets); cada clique é a cor do próximo
+next_target = 0        # Alvo que recebe a cor do próximo clique (0 = o do cursor)
 
 # Virtual mouse globals
 virtual_mouse_enabled = False  # Ativa movimento do mouse quando True
 window_minimized = False       # Janela escondida/fora da tela
-prev_mouse_pos = None          # Para suavizar movimento
-last_area = 0                  # Última área detectada do objeto
-area_threshold = 80            # Mínimo de área para mover o mouse (ajustável)
+area_threshold = 80            # Mínimo de área para mover o mouse (px em 1280x720, ajustável)
+
+# Teclas globais (hook da biblioteca `keyboard`): funcionam com a janela sem foco
+hotkeys = None
 
-# Estado de teclas globais para suportar ações quando a janela perde foco
-prev_key_states = {'esc': False, '0': False, 'r': False}
-last_key_action_time = 0.0
-KEY_DEBOUNCE = 0.25  # segundos para debouncing de ações globais
+# Histograma aprendido só vai para o perfil (além da troca de cor e da saída)
+# depois de este intervalo desde o último salvamento (s)
+PROFILE_SAVE_INTERVAL = 10.0
 
 # Helpers to restore the OpenCV window using Win32 APIs
 def _restore_window_by_title(title='Detector de Cor'):
@@ -55,231 +74,190 @@ def _restore_window_by_title(title='Detector de Cor'):
     except Exception:
         pass
 
-# Windows screen size (assume Windows)
-screen_w = ctypes.windll.user32.GetSystemMetrics(0)
-screen_h = ctypes.windll.user32.GetSystemMetrics(1)
+# Tamanho da tela, consultado no primeiro uso
+screen_w = None
+screen_h = None
+
+def _screen_size():
+    """Resolução da tela: a de --screen, senão a do backend do cursor (senão DEFAULT_SCREEN_SIZE)."""
+    global screen_w, screen_h
+    if screen_w is None:
+        try:
+            screen_w, screen_h = cursor.screen_size()
+        except Exception:
+            screen_w, screen_h = DEFAULT_SCREEN_SIZE
+    return screen_w, screen_h
+
+def _send_command(*command):
+    with comandos_lock:
+        comandos.append(command)
+
+
+def _take_commands():
+    global comandos
+    with comandos_lock:
+        pendentes, comandos = comandos, []
+    return pendentes
+
+
+def _requeue_commands(item):
+    """Frame descartado antes do rastreamento: os comandos dele vão com o próximo."""
+    pendentes = (item.meta or {}).get('commands')
+    if pendentes:
+        with comandos_lock:
+            comandos[:0] = pendentes
+
 
 def mouse_click(event, x, y, flags, param):
     """Captura a cor quando você clica na câmera"""
-    global hsv_color, frame_hsv
-    
-    if event == cv2.EVENT_LBUTTONDOWN and frame_hsv is not None:
-        # Pega o valor HSV do pixel clicado (converter para int para evitar underflow/overflow)
-        h_val, s_val, v_val = map(int, frame_hsv[y, x])
-
-        # Criar range de tolerância (usar ints, depois converter para uint8)
-        h_lower = max(0, h_val - 10)
-        h_upper = min(180, h_val + 10)
-        s_lower = max(0, s_val - 40)
-        s_upper = min(255, s_val + 40)
-        v_lower = max(0, v_val - 40)
-        v_upper = min(255, v_val + 40)
-
-        # Garantir que os arrays de limite sejam do mesmo tipo (uint8) esperado pelo OpenCV
-        hsv_color = (
-            np.array([h_lower, s_lower, v_lower], dtype=np.uint8),
-            np.array([h_upper, s_upper, v_upper], dtype=np.uint8)
-        )
+    global next_target
+    if event == cv2.EVENT_LBUTTONDOWN and frame_raw is not None:
+        # A prévia pode estar reduzida: ponto no frame em resolução cheia
+        x, y = preview.to_frame(x, y)
+        # Pega o valor HSV do pixel clicado (só esse pixel é convertido; a janela é espelhada)
+        # e cria o range de tolerância (Hue dá a volta em 180 para vermelhos)
+        h_val, s_val, v_val = hsv_at(frame_raw, x, y)
+        lower, upper = hsv_range(h_val, s_val, v_val, 10, 40, 40)
+        # Recorte ao redor do clique: amostra do histograma (modelo 'histogram')
+        _send_command('set_color', (lower, upper), color_sample(frame_raw, x, y))
+        h_lower, s_lower, v_lower = map(int, lower)
+        h_upper, s_upper, v_upper = map(int, upper)
         
         print(f"\n{'='*50}")
-        print(f"✓ COR CAPTURADA EM ({x}, {y})!")
+        if num_targets > 1:
+            # O MultiTracker distribui as cores na mesma ordem (multi_stage)
+            print(f"✓ COR DO ALVO {next_target + 1} CAPTURADA EM ({x}, {y})!")
+            next_target = (next_target + 1) % num_targets
+        else:
+            print(f"✓ COR CAPTURADA EM ({x}, {y})!")
         print(f"{'='*50}")
         print(f"Cor referência: H={h_val}  S={s_val}  V={v_val}")
         print(f"Range: H({h_lower}-{h_upper}) S({s_lower}-{s_upper}) V({v_lower}-{v_upper})")
         print(f"{'='*50}\n")
 
-def find_object_near_position(mask, last_pos, search_rad):
+def _screen_point(cx, cy, frame_w, frame_h):
     """
-    Procura pelo objeto perto da última posição conhecida
-    Retorna a posição encontrada ou None
+    Pixel da tela para um ponto (floats, centróide sub-pixel) do frame
+    exibido: mapeia centro de pixel em centro de pixel e arredonda só no fim.
     """
-    if last_pos is None:
-        return None
-    
-    cx_last, cy_last = last_pos
-    h, w = mask.shape
-    
-    # Criar ROI (Region of Interest) ao redor da última posição
-    x_start = max(0, cx_last - search_rad)
-    x_end = min(w, cx_last + search_rad)
-    y_start = max(0, cy_last - search_rad)
-    y_end = min(h, cy_last + search_rad)
-    
-    # Extrair ROI
-    roi = mask[y_start:y_end, x_start:x_end]
-    
-    # Procurar contornos no ROI
-    contours, _ = cv2.findContours(roi, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    if contours:
-        # Encontrar o maior contorno
-        maior_contorno = max(contours, key=cv2.contourArea)
-        area = cv2.contourArea(maior_contorno)
-        
-        if area > 100:  # Mínimo de pixels
-            x, y, w_box, h_box = cv2.boundingRect(maior_contorno)
-            # Converter coordenadas de volta para o frame inteiro
-            cx = x_start + x + w_box // 2
-            cy = y_start + y + h_box // 2
-            return (cx, cy), (x_start + x, y_start + y, w_box, h_box), area
-    
-    return None, None, None
-
+    screen_w, screen_h = _screen_size()
+    mx = (cx + 0.5) * screen_w / float(frame_w) - 0.5
+    my = (cy + 0.5) * screen_h / float(frame_h) - 0.5
+    return (min(max(int(round(mx)), 0), screen_w - 1),
+            min(max(int(round(my)), 0), screen_h - 1))
 
-def find_similar_object_fast(frame_hsv, hsv_ref, last_pos, search_rad, tolerance_increase=0):
+def _move_mouse_to_screen(cx, cy, frame_w, frame_h):
     """
-    Busca por objetos SIMILARES ao referência em tempo real
-    MUITO RÁPIDA - aumenta tolerância progressivamente até encontrar
-    Começa restrita (cor semelhante) e vai abrindo conforme o tempo passa
+    Mapeia coordenadas do frame para a tela e move o cursor. A suavização e
+    a predição ficam no MotionModel (motion.py), antes desta chamada; o
+    movimento só é enfileirado (o CursorDispatcher aplica na sua thread).
     """
-    if last_pos is None:
-        return None, None, None
-    
-    # Converter referências para int para evitar operações em uint8 que causam wrap-around
-    h_ref, s_ref, v_ref = map(int, hsv_ref)
-
-    # Tolerância cresce AGRESSIVAMENTE para encontrar similares rápido
-    # Multiplicadores maiores = tolerância abre MUITO mais rápido
-    h_tol = 12 + (tolerance_increase * 0.6)       # Hue: sensível ao inicio, abre depois
-    s_tol = 45 + (tolerance_increase * 2.0)       # Saturação: abre AGRESSIVO
-    v_tol = 45 + (tolerance_increase * 2.0)       # Value: abre AGRESSIVO
-
-    h_lower = int(max(0, h_ref - int(h_tol)))
-    h_upper = int(min(180, h_ref + int(h_tol)))
-    s_lower = int(max(0, s_ref - int(s_tol)))
-    s_upper = int(min(255, s_ref + int(s_tol)))
-    v_lower = int(max(0, v_ref - int(v_tol)))
-    v_upper = int(min(255, v_ref + int(v_tol)))
-
-    # Garantir mesmo dtype (uint8) para lower/upper - requerido por cv2.inRange
-    lower = np.array([h_lower, s_lower, v_lower], dtype=np.uint8)
-    upper = np.array([h_upper, s_upper, v_upper], dtype=np.uint8)
-    
-    # Criar máscara com tolerância aumentada
-    mask = cv2.inRange(frame_hsv, lower, upper)
-    
-    # Limpeza otimizada (pequena = rápida)
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-    
-    # Procurar próximo à última posição
-    cx_last, cy_last = last_pos
-    frame_h, frame_w = frame_hsv.shape[:2]
-    
-    x_start = max(0, cx_last - search_rad)
-    x_end = min(frame_w, cx_last + search_rad)
-    y_start = max(0, cy_last - search_rad)
-    y_end = min(frame_h, cy_last + search_rad)
-    
-    roi = mask[y_start:y_end, x_start:x_end]
-    contours, _ = cv2.findContours(roi, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    if contours:
-        # Encontrar MAIOR contorno no ROI
-        maior_contorno = max(contours, key=cv2.contourArea)
-        area = cv2.contourArea(maior_contorno)
-        
-        if area > 70:  # Limiar MUITO menor para pegar similares pequenos
-            x, y, w_box, h_box = cv2.boundingRect(maior_contorno)
-            cx = x_start + x + w_box // 2
-            cy = y_start + y + h_box // 2
-            return (cx, cy), (x_start + x, y_start + y, w_box, h_box), area
-    
-    return None, None, None
+    cursor.move(*_screen_point(cx, cy, frame_w, frame_h))
 
 
-def _move_mouse_to_screen(cx, cy, frame_w, frame_h, smooth=0.25):
-    """Mapeia coordenadas do frame para a tela e move o cursor (suaviza por filter exponencial)."""
-    global prev_mouse_pos, screen_w, screen_h
+def _mouse_click(button='left'):
+    """Clique do mouse (left/right), enviado pela thread do cursor."""
+    cursor.click(button)
 
-    # Calcular posição relativa na tela
-    tx = int(cx / float(frame_w) * screen_w)
-    ty = int(cy / float(frame_h) * screen_h)
 
-    if prev_mouse_pos is None:
-        prev_mouse_pos = (tx, ty)
+def _mouse_down(button='left'):
+    """Pressiona o botão do mouse (não solta)."""
+    cursor.press(button)
 
-    # Suavizar movimento
-    mx = int(prev_mouse_pos[0] * (1.0 - smooth) + tx * smooth)
-    my = int(prev_mouse_pos[1] * (1.0 - smooth) + ty * smooth)
 
-    # Mover cursor (pyautogui se disponível, senão ctypes)
-    if _use_pyautogui:
+def _mouse_up(button='left'):
+    """Solta o botão do mouse."""
+    cursor.release(button)
+
+
+def _toggle_virtual_mouse():
+    """Tecla 0: esconde a janela e liga o mouse virtual, ou restaura a interface."""
+    global virtual_mouse_enabled, window_minimized
+    window_minimized = not window_minimized
+    virtual_mouse_enabled = window_minimized
+    # Janela escondida: nenhum frame é desenhado nem enviado ao imshow
+    preview.visible = not window_minimized
+    if window_minimized:
+        # mover janela para fora da tela (simular minimizado)
         try:
-            pyautogui.moveTo(mx, my, duration=0)
+            cv2.moveWindow('Detector de Cor', -2000, -2000)
         except Exception:
-            ctypes.windll.user32.SetCursorPos(mx, my)
+            pass
+        print('→ MODO MOUSE VIRTUAL ATIVADO (janela escondida). Teclas: a=left, l=right, 0=restaurar')
     else:
-        ctypes.windll.user32.SetCursorPos(mx, my)
-
-    prev_mouse_pos = (mx, my)
-
-
-def _mouse_click(button='left'):
-    """Gera evento de clique do mouse (left/right) no Windows."""
-    MOUSEEVENTF_LEFTDOWN = 0x0002
-    MOUSEEVENTF_LEFTUP = 0x0004
-    MOUSEEVENTF_RIGHTDOWN = 0x0008
-    MOUSEEVENTF_RIGHTUP = 0x0010
-
-    if _use_pyautogui:
+        # Restaurar janela de forma mais robusta usando Win32
         try:
-            if button == 'left':
-                pyautogui.click(button='left')
-            else:
-                pyautogui.click(button='right')
-            return
+            _restore_window_by_title('Detector de Cor')
         except Exception:
-            pass
+            try:
+                cv2.moveWindow('Detector de Cor', 100, 100)
+            except Exception:
+                pass
 
-    # Fallback para ctypes se pyautogui não estiver disponível ou falhar
-    if button == 'left':
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
-        time.sleep(0.01)
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
-    else:
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_RIGHTDOWN, 0, 0, 0, 0)
-        time.sleep(0.01)
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_RIGHTUP, 0, 0, 0, 0)
+        # Garantir que qualquer clique preso seja solto
+        cursor.release_all()
 
+        # Resetar suavização para evitar saltos do cursor
+        motion.reset()
 
-def _mouse_down(button='left'):
-    """Pressiona o botão do mouse (não solta)."""
-    MOUSEEVENTF_LEFTDOWN = 0x0002
-    MOUSEEVENTF_RIGHTDOWN = 0x0008
-    if _use_pyautogui:
-        try:
-            pyautogui.mouseDown(button=button)
-            return
-        except Exception:
-            pass
-    if button == 'left':
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_LEFTDOWN, 0, 0, 0, 0)
-    else:
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_RIGHTDOWN, 0, 0, 0, 0)
+        print('→ Interface restaurada. Modo mouse virtual desativado.')
 
 
-def _mouse_up(button='left'):
-    """Solta o botão do mouse."""
-    MOUSEEVENTF_LEFTUP = 0x0004
-    MOUSEEVENTF_RIGHTUP = 0x0010
-    if _use_pyautogui:
-        try:
-            pyautogui.mouseUp(button=button)
-            return
-        except Exception:
-            pass
-    if button == 'left':
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_LEFTUP, 0, 0, 0, 0)
-    else:
-        ctypes.windll.user32.mouse_event(MOUSEEVENTF_RIGHTUP, 0, 0, 0, 0)
+def _reset():
+    global next_target
+    _send_command('reset')
+    next_target = 0
+    motion.reset()
+    print("\n✓ Reset! Clique em um objeto para começar...\n")
 
 
-def main():
-    global hsv_color, frame_hsv, last_position, search_radius
-    global virtual_mouse_enabled, window_minimized, prev_mouse_pos, last_area
-    global prev_key_states, last_key_action_time
+def main(source=0, buffer_depth=1, classifier=None, profile=False, hud=False,
+         profile_out=None, profile_interval=None, cursor_filter='kalman', predict=True,
+         cursor_rate=0, lead_ms=0.0, cursor_backend='auto', pipeline='off', policy='latency',
+         render_workers=2, budget_ms=None, color_model=None, flow_interval=None,
+         record=None, record_slots=DEFAULT_SLOTS, user=None, profiles_dir=None, use_profiles=True,
+         adapt_color=None, reacquire=None, preview_fps=0, preview_scale=1.0, publish=None, publish_udp=(),
+         incremental=None, targets=1, screen=None, save_tuning=False):
+    """
+    classifier, color_model, flow_interval, budget_ms, adapt_color, reacquire e
+    incremental em None vêm do perfil de calibração desta câmera/usuário (profiles.py), senão dos padrões.
+    Os informados valem só nesta sessão; com save_tuning também vão para o perfil.
+    publish: nome do anel em memória compartilhada; publish_udp: destinos
+    (host, porta) - cada resultado vai para outros processos (publisher.py).
+    targets > 1: um MultiTracker segue um objeto por cor (multitrack.py); os
+    cliques capturam as cores em rodízio, o cursor segue o primeiro e todos
+    são publicados (campo `target`).
+    screen: (largura, altura) da tela; None = a do backend do cursor ou,
+    para uinput/record, a detectada no sistema.
+    """
+    global frame_raw, motion, cursor, hotkeys, preview, num_targets, next_target, screen_w, screen_h
+    
+    # Perfil de calibração: cor aprendida, câmera e ajuste do rastreador da
+    # última sessão nesta câmera (opções da linha de comando têm prioridade)
+    camera = camera_key(source)
+    usuario = user or default_user()
+    perfis = ProfileStore(profiles_dir) if use_profiles else None
+    perfil = perfis.load(camera, usuario) if perfis is not None else None
+    explicito = dict(classifier=classifier, color_model=color_model, flow_interval=flow_interval,
+                     budget_ms=budget_ms, adapt_color=adapt_color, reacquire=reacquire, incremental=incremental)
+    ajuste = resolve(perfil and perfil.get('tracker'), DEFAULT_TUNING, **explicito)
+    # O perfil guarda o que a sessão aprendeu (cor, câmera); o ajuste salvo
+    # continua o dele, a não ser que --save-tuning peça para gravar as opções
+    # desta execução
+    ajuste_salvo = dict((perfil and perfil.get('tracker')) or {})
+    if save_tuning:
+        ajuste_salvo.update((chave, valor) for chave, valor in explicito.items() if valor is not None)
+    classifier, color_model = ajuste['classifier'], ajuste['color_model']
+    flow_interval, budget_ms = ajuste['flow_interval'], ajuste['budget_ms']
+    # Com adapt_color, o range acompanha mudanças lentas de iluminação; com
+    # reacquire, o objeto perdido é procurado no frame inteiro, aos poucos; com
+    # incremental, só os blocos da imagem que mudaram são reconvertidos
+    opcoes_tracker = dict(color_model=color_model, flow_interval=flow_interval, adapt_color=ajuste['adapt_color'],
+                          reacquire=ajuste['reacquire'], incremental=ajuste['incremental'])
+    camera_cfg = resolve(perfil and perfil.get('camera'), DEFAULT_CAMERA)
+    
+    # A câmera abre numa thread enquanto o resto se inicializa
+    abertura = open_source_async(source, **camera_cfg)
     
     print("\n" + "="*60)
     print("  DETECTOR DE COR COM RASTREAMENTO INTELIGENTE")
@@ -295,343 +273,481 @@ def main():
     print("  Verde    = Objeto encontrado (cor exata)")
     print("  Amarelo  = Rastreando objeto exato")
     print("  Azul     = Rastreando cor SIMILAR")
+    print("  Magenta  = Seguindo por fluxo óptico (--flow-interval)")
     print("  Vermelho = Procurando (sem deteccao)")
+    num_targets = max(1, min(int(targets), MAX_TARGETS))
+    if num_targets > 1:
+        print(f"\nALVOS: {num_targets} cores - cada clique captura a do próximo alvo (1, 2, ... e volta ao 1);")
+        print("  o cursor segue o alvo 1, os outros vão para --publish")
     print("="*60 + "\n")
     
-    # Iniciar câmera
-    cap = cv2.VideoCapture(0)
+    # Cor inicial: a do perfil salvo, senão a do .env (H_MIN ... V_MAX); sem
+    # nenhuma, espera o clique
+    cor_inicial = perfil.get('color') if perfil else None
+    origem = perfis.path(camera, usuario) if cor_inicial else None
+    if cor_inicial is None:
+        origem = find_env()
+        cor_inicial = env_calibration(read_env(origem)) if origem else None
+    inicial = tracker_color(cor_inicial) or {}
+    if inicial:
+        lower, upper = inicial['hsv_color']
+        print(f"✓ Cor inicial de {origem}: H({lower[0]}-{upper[0]}) S({lower[1]}-{upper[1]}) "
+              f"V({lower[2]}-{upper[2]}){' + histograma' if inicial['hist'] is not None else ''}")
     
-    if not cap.isOpened():
-        print("✗ Erro: Câmera não encontrada!")
-        return
+    next_target = 1 % num_targets if inicial else 0
     
-    # Configurar câmera - otimizado para velocidade
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-    cap.set(cv2.CAP_PROP_FPS, 30)
-    cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
+    # Classificador de cor: cvtColor + inRange (padrão) ou tabela BGR->máscara
+    # Com flow_interval, a cor só é detectada a cada N frames; entre elas, fluxo óptico
+    # Com a cor do perfil, a tabela/histograma ficam prontos antes da câmera
+    # Vários alvos: MultiTracker, uma segmentação por frame para todas as cores
+    if num_targets > 1:
+        ignoradas = [nome for nome, ativa in (('--classifier lut', classifier == 'lut'),
+                                              ('--color-model histogram', color_model == 'histogram'),
+                                              ('--flow-interval', flow_interval),
+                                              ('--adapt-color', ajuste['adapt_color']),
+                                              ('--incremental', ajuste['incremental'])) if ativa]
+        if ignoradas:
+            print(f"⚠ Com --targets, {', '.join(ignoradas)} não vale (o MultiTracker só usa o range HSV)")
+        fabrica = functools.partial(multi_stage, num_targets, hsv_color=inicial.get('hsv_color'))
+    else:
+        fabrica = functools.partial(tracker_stage, classifier, **opcoes_tracker, **inicial)
+    track = fabrica() if pipeline == 'off' else None
+    
+    # Cursor: filtro + predição até o instante do movimento; opcionalmente uma thread
+    # move o cursor na taxa do monitor entre os frames da câmera
+    motion = MotionModel(cursor_filter, predict=predict, lead=lead_ms / 1000.0)
+    interpolador = None
+    
+    # Injeção do cursor numa thread própria: o loop só enfileira comandos
+    tamanho_tela = screen or detect_screen_size()
+    try:
+        backend = make_backend(cursor_backend, tamanho_tela)
+    except Exception as e:
+        print(f"⚠ Cursor indisponível ({e}); usando backend 'record' (sem mover o mouse)")
+        backend = make_backend('record', tamanho_tela)
+    cursor = CursorDispatcher(backend)
+    screen_w, screen_h = screen or (None, None)
+    largura, altura = _screen_size()
+    print(f"✓ Cursor: backend '{backend.name}', tela {largura}x{altura}")
+    if backend.needs_screen_size and tamanho_tela is None:
+        print(f"⚠ Resolução da tela não detectada; usando {largura}x{altura} (informe com --screen LxA)")
+    
+    # Teclas globais por evento; a/l (segurar = botão pressionado) vão direto
+    # para o cursor, sem esperar o próximo frame
+    hotkeys = HotkeyInput(direct={
+        'a': lambda down: cursor.press('left') if down else cursor.release('left'),
+        'l': lambda down: cursor.press('right') if down else cursor.release('right'),
+    })
+    if not hotkeys.start():
+        print("⚠ Biblioteca 'keyboard' indisponível: teclas só com a janela em foco")
     
     # Criar janela e configurar clique do mouse
     cv2.namedWindow('Detector de Cor')
     cv2.setMouseCallback('Detector de Cor', mouse_click)
     
-    print("✓ Câmera aberta. Clique no objeto que deseja detectar...")
-    print("  Sistema agora procura por cores similares!\n")
+    # Instrumentação por etapa (custo desprezível quando desligada)
+    PROFILER.enabled = profile or hud or bool(profile_out)
+    if profile_out:
+        PROFILER.configure_export(profile_out, profile_interval)
     
-    frames_sem_deteccao = 0  # Contador para aumentar raio de busca
-    tolerance_bonus = 0      # Aumenta tolerância para similares
+    opcoes = {'hud': hud}
     
-    tick_freq = cv2.getTickFrequency()
+    # Prévia da janela: nada com a janela escondida; visível, no máximo
+    # preview_fps prévias/s (0 = todo frame) em preview_scale da resolução
+    preview = PreviewRenderer(preview_fps, preview_scale)
     
-    while True:
-        inicio_frame = cv2.getTickCount()
-        ret, frame = cap.read()
-        if not ret:
-            print("✗ Erro ao capturar frame!")
-            break
-        
-        # Espelhar frame
-        frame = cv2.flip(frame, 1)
-        
-        # Converter para HSV
-        frame_hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        frame_resultado = frame.copy()
+    # Publicação: outros processos (interface, gestos, logger) recebem cada
+    # resultado sem abrir a câmera
+    publisher = None
+    if publish:
+        try:
+            publisher = TrackPublisher(publish, udp=publish_udp)
+        except FileExistsError as e:
+            print(f"⚠ Publicação em memória desligada: {e}")
+            publish = None
+    if publisher is None and publish_udp:
+        publisher = TrackPublisher(None, udp=publish_udp)
+    if publisher is not None:
+        destinos = ([f"memória '{publish}'"] if publish else []) + [f'udp {h}:{p}' for h, p in publish_udp]
+        print(f"✓ Publicando o rastreamento em {', '.join(destinos)}")
+    
+    # Governador de qualidade: com orçamento, reduz recorte/raio/morfologia/
+    # overlay quando o p95 do custo do frame passa dele
+    governor = None
+    ajustes = {'quality': None, 'overlay': 'full'}
+    if budget_ms:
+        governor = QualityGovernor(budget_ms)
+        ajustes = governor.settings()
+        PROFILER.extras['governor'] = governor.metrics
+        print(f"✓ Governador de qualidade: orçamento de {budget_ms:.1f} ms (p{governor.percentile})")
+    
+    def frame_meta(captura, perdidos):
+        """O que acompanha o frame pelas etapas (comandos, centro previsto, avisos)."""
+        return {
+            'quality': ajustes['quality'],
+            'overlay': ajustes['overlay'],
+            'governor': governor.describe() if governor is not None and opcoes['hud'] else None,
+            'seq': captura.seq,
+            'timestamp': captura.timestamp,
+            'center': motion.center(captura.timestamp),
+            'commands': _take_commands(),
+            'perdidos': perdidos,
+            'dropped_total': grabber.frames_dropped,
+            'hud': opcoes['hud'],
+            'render': preview.due(captura.timestamp),
+        }
+    
+    # Pipeline: rastreamento (thread ou processo) e composição do frame exibido
+    # (threads) rodam em paralelo com a captura e com a janela
+    pipe = None
+    parar = threading.Event()
+    if pipeline != 'off':
+        pipe = Pipeline([
+            Stage('track', fabrica, process=(pipeline == 'process')),
+            Stage('compose', lambda: preview.compose, workers=render_workers),
+        ], policy=policy, depth=1 if policy == 'latency' else 4, on_drop=_requeue_commands).start()
+    
+    # Daqui em diante precisa da câmera
+    cap = abertura.result()
+    if not cap.isOpened():
+        print("✗ Erro: Câmera não encontrada!")
+        parar.set()
+        if pipe is not None:
+            pipe.close()
+        if publisher is not None:
+            publisher.close()
+        hotkeys.stop()
+        cursor.close()
+        cv2.destroyAllWindows()
+        return
+    
+    # Gravação da sessão: frames crus num anel mapeado em memória (copiados na
+    # thread de captura) + log binário de comandos, resultados, teclas e cursor
+    recorder = None
+    if record:
+        config = dict(opcoes_tracker, classifier=classifier)
+        if num_targets > 1:
+            config['targets'] = num_targets
+        if inicial:
+            config['calibration'] = cor_inicial
+        recorder = SessionRecorder(record, slots=record_slots, fps=cap.get(cv2.CAP_PROP_FPS) or None,
+                                   config=config)
+        cursor.tap = recorder.log_cursor
+        print(f"✓ Gravando a sessão em {record} (últimos {record_slots} frames)")
+    
+    # Captura em thread separada: o loop sempre recebe o frame mais novo
+    grabber = FrameGrabber(cap, depth=buffer_depth,
+                           on_frame=recorder.store_frame if recorder is not None else None).start()
+    
+    if inicial:
+        print("✓ Câmera aberta. Rastreando a cor inicial (clique em outro objeto para trocar)...\n")
+    else:
+        print("✓ Câmera aberta. Clique no objeto que deseja detectar...")
+        print("  Sistema agora procura por cores similares!\n")
+    
+    # Perfil: salvo quando a cor muda (clique), quando o histograma aprendido
+    # muda (no máximo a cada PROFILE_SAVE_INTERVAL s) e na saída
+    estado = {'cor': inicial.get('hsv_color'), 'hist': inicial.get('hist'), 'sujo': False, 'salvo': 0.0}
+    if perfil is not None and ((perfil.get('tracker') or {}) != ajuste_salvo or perfil.get('camera') != camera_cfg):
+        estado['sujo'] = True
+    
+    def salvar_perfil():
+        if perfis is None or estado['cor'] is None:
+            return
+        try:
+            perfis.save(camera, usuario, {'color': calibration(estado['cor'], estado['hist']),
+                                          'camera': camera_cfg, 'tracker': ajuste_salvo})
+        except OSError as e:
+            print(f"⚠ Perfil não salvo ({e})")
+        estado['sujo'] = False
+        estado['salvo'] = time.perf_counter()
+    
+    # Com o modelo 'histogram' o perfil de uma cor nova só é gravado com o histograma dela
+    espera_hist = color_model == 'histogram' and num_targets == 1
+    
+    def atualizar_perfil(meta):
+        # O range capturado (o adaptado muda com a luz e recomeça do capturado)
+        cor = meta.get('base_color')
+        hist = meta.get('hist')
+        if cor is not None and (estado['cor'] is None or range_key(*cor) != range_key(*estado['cor'])):
+            # Cor nova: o histograma da anterior não vale mais
+            estado['cor'], estado['hist'] = cor, hist
+            if hist is None and espera_hist:
+                # O meta com o histograma pode ter sido descartado: ele se
+                # repete nos próximos frames (HIST_RESEND_FRAMES)
+                estado['sujo'] = True
+            else:
+                salvar_perfil()
+        elif hist is not None and (estado['hist'] is None or not np.array_equal(hist, estado['hist'])):
+            faltava = estado['hist'] is None
+            estado['hist'] = hist
+            estado['sujo'] = True
+            if faltava or time.perf_counter() - estado['salvo'] > PROFILE_SAVE_INTERVAL:
+                salvar_perfil()
+    
+    if pipe is not None:
+        def alimentar():
+            while not parar.is_set():
+                captura, perdidos = grabber.read(timeout=0.5)
+                if captura is None:
+                    if grabber.eof:
+                        break
+                    continue
+                pipe.submit(captura.seq, captura.image, frame_meta(captura, perdidos))
         
-        # Se cor foi capturada
-        if hsv_color is not None:
-            lower, upper = hsv_color
-            
-            # Calcular cor referência (centro do range)
-            hsv_ref = np.array([
-                (int(lower[0]) + int(upper[0])) // 2,
-                (int(lower[1]) + int(upper[1])) // 2,
-                (int(lower[2]) + int(upper[2])) // 2
-            ])
-            
-            # Criar máscara com cor exata
-            mask = cv2.inRange(frame_hsv, lower, upper)
-            
-            # Limpeza otimizada
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            
-            # Procurar contornos
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            objeto_encontrado = False
-            
-            if contours:
-                maior_contorno = max(contours, key=cv2.contourArea)
-                area = cv2.contourArea(maior_contorno)
-                
-                if area > 100:
-                    objeto_encontrado = True
-                    frames_sem_deteccao = 0
-                    tolerance_bonus = 0
-                    
-                    x, y, w, h_bbox = cv2.boundingRect(maior_contorno)
-                    cx = x + w // 2
-                    cy = y + h_bbox // 2
-                    last_position = (cx, cy)
-                    last_area = area
-                    
-                    cv2.rectangle(frame_resultado, (x, y), (x + w, y + h_bbox), (0, 255, 0), 3)
-                    cv2.circle(frame_resultado, (cx, cy), 8, (0, 255, 0), -1)
-                    cv2.putText(frame_resultado, f'DETECTADO - Area: {int(area)} px', (x, y - 15),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            # Se não encontrou, usar rastreamento inteligente
-            if not objeto_encontrado and last_position is not None:
-                frames_sem_deteccao += 1
-                
-                # Aumentar tolerância RAPIDAMENTE a cada 5 frames
-                if frames_sem_deteccao % 5 == 0 and frames_sem_deteccao > 3:
-                    tolerance_bonus = min(120, tolerance_bonus + 10)
-                
-                raio_aumentado = search_radius + (frames_sem_deteccao * 10)
-                
-                # TENTATIVA 1: Procurar objeto EXATO
-                pos, bbox, area = find_object_near_position(mask, last_position, raio_aumentado)
-                
-                if pos is not None:
-                    cx, cy = pos
-                    x, y, w, h_bbox = bbox
-                    last_position = (cx, cy)
-                    frames_sem_deteccao = 0
-                    last_area = area
-                    
-                    cv2.rectangle(frame_resultado, (x, y), (x + w, y + h_bbox), (0, 255, 255), 3)
-                    cv2.circle(frame_resultado, (cx, cy), 8, (0, 255, 255), -1)
-                    cv2.circle(frame_resultado, last_position, raio_aumentado, (0, 255, 255), 2)
-                    cv2.putText(frame_resultado, f'RASTREANDO (Exato)', (x, y - 15),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-                else:
-                    # TENTATIVA 2: Procurar cores SIMILARES
-                    pos_sim, bbox_sim, area_sim = find_similar_object_fast(
-                        frame_hsv, hsv_ref, last_position, raio_aumentado, tolerance_bonus
-                    )
-                    
-                    if pos_sim is not None:
-                        cx, cy = pos_sim
-                        x, y, w, h_bbox = bbox_sim
-                        last_position = (cx, cy)
-                        frames_sem_deteccao = 0
-                        last_area = area_sim
-                        
-                        cv2.rectangle(frame_resultado, (x, y), (x + w, y + h_bbox), (255, 140, 0), 3)
-                        cv2.circle(frame_resultado, (cx, cy), 8, (255, 140, 0), -1)
-                        cv2.circle(frame_resultado, last_position, raio_aumentado, (255, 140, 0), 2)
-                        cv2.putText(frame_resultado, f'RASTREANDO (Similar)', (x, y - 15),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 140, 0), 2)
-                        cv2.putText(frame_resultado, f'Tolerancia: +{tolerance_bonus}', (x, y + h_bbox + 20),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 140, 0), 1)
-                    else:
-                        # FASE 3: PROCURANDO
-                        if frames_sem_deteccao > 60:
-                            cv2.putText(frame_resultado, 'OBJETO PERDIDO!', (50, 100),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 255), 2)
-                            cv2.putText(frame_resultado, 'Clique novamente para capturar', (50, 140),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 1)
-                            last_position = None
-                            frames_sem_deteccao = 0
-                            tolerance_bonus = 0
-                        else:
-                            cx, cy = last_position
-                            cv2.circle(frame_resultado, (cx, cy), raio_aumentado, (0, 0, 255), 2)
-                            cv2.circle(frame_resultado, (cx, cy), 10, (0, 0, 255), 2)
-                            cv2.putText(frame_resultado, f'PROCURANDO ({frames_sem_deteccao}/60)', (50, 50),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-                            cv2.putText(frame_resultado, f'Tol: +{tolerance_bonus}  Raio: {raio_aumentado}px', (50, 80),
-                                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 1)
-            
-            # Info HSV
-            info_text = f"H:{int(lower[0])}-{int(upper[0])} S:{int(lower[1])}-{int(upper[1])} V:{int(lower[2])}-{int(upper[2])}"
-            cv2.putText(frame_resultado, info_text, (15, frame_resultado.shape[0] - 20), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
+        threading.Thread(target=alimentar, name='PipelineFeeder', daemon=True).start()
+        print(f"✓ Pipeline: rastreamento em {'processo' if pipeline == 'process' else 'thread'}, "
+              f"{render_workers} thread(s) de composição, política '{policy}'")
+    
+    # Loop serial: o frame exibido é sempre escrito no mesmo buffer
+    tela = Workspace()
+    rastreado = False
+    while True:
+        inicio_frame = PROFILER.tic()
+        if pipe is None:
+            t0 = PROFILER.tic()
+            captura, perdidos = grabber.read(timeout=2.0)
+            PROFILER.toc('capture', t0)
+            if captura is None:
+                print("✗ Erro ao capturar frame!")
+                break
+            # O frame cru é usado na detecção; o espelhamento é só para exibição
+            # (a detecção mapeia as coordenadas em vez de espelhar o frame)
+            frame_raw = captura.image
+            # Rastrear (cor exata -> janela ao redor da posição prevista -> cores similares)
+            meta = track(frame_raw, frame_meta(captura, perdidos))
+            if meta['render']:
+                tela.reserve(frame_raw.shape)
+                meta = preview.compose(frame_raw, meta, tela.array('display', preview.shape(frame_raw.shape)))
+            else:
+                meta = dict(meta, display=None, compose_s=0.0)
         else:
-            cv2.putText(frame_resultado, 'CLIQUE no objeto para capturar sua cor', (30, 80),
-                       cv2.FONT_HERSHEY_SIMPLEX, 1.1, (0, 165, 255), 2)
-            cv2.putText(frame_resultado, 'Sistema procurara por cores similares!', (30, 120),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 200, 0), 2)
+            # Resultado mais novo do pipeline, na ordem dos frames
+            t0 = PROFILER.tic()
+            item = pipe.get(timeout=2.0)
+            PROFILER.toc('pipeline', t0)
+            if item is None:
+                print("✗ Erro ao capturar frame!")
+                break
+            frame_raw, meta = item.frame, item.meta
         
-        # Legenda
-        cv2.putText(frame_resultado, 'R: Reset | ESC: Sair', (15, frame_resultado.shape[0] - 40),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1)
-        cv2.putText(frame_resultado, 'Verde=Detectado | Amarelo=Exato | Azul=Similar | Vermelho=Procurando',
-                   (15, frame_resultado.shape[0] - 60), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (150, 150, 150), 1)
+        frame_h, frame_w = frame_raw.shape[:2]
+        result = meta['result']
+        if publisher is not None:
+            for alvo, resultado in enumerate(meta.get('targets') or (result,)):
+                publisher.publish(meta['seq'], meta['timestamp'], resultado, target=alvo)
+        if governor is not None:
+            # Custo do trabalho que o governador controla (rastreamento + composição)
+            ajustes = governor.record(meta['track_s'] + meta['compose_s'], meta['last_area'])
+        if result.phase in FOUND_PHASES:
+            motion.update(result.position, meta['timestamp'])
+            if not rastreado:
+                rastreado = True
+                print(f"✓ Primeiro frame rastreado {(time.perf_counter() - _T0) * 1000:.0f} ms após o início")
+        elif result.phase == PHASE_LOST:
+            motion.reset()
+        if recorder is not None:
+            recorder.log_frame(meta['seq'], meta)
+        atualizar_perfil(meta)
         
-        # Mostrar frame
-        cv2.imshow('Detector de Cor', frame_resultado)
+        # Mostrar frame (só os que ganharam prévia)
+        if meta['display'] is not None:
+            t0 = PROFILER.tic()
+            cv2.imshow('Detector de Cor', meta['display'])
+            PROFILER.toc('imshow', t0)
 
-        # Se o modo mouse virtual estiver ativo, mover o cursor para a última posição
+        # Se o modo mouse virtual estiver ativo, mover o cursor para a posição prevista
         # Somente mover se a última área detectada for maior que o limiar
-        if virtual_mouse_enabled and last_position is not None and last_area >= area_threshold:
-            fh, fw = frame.shape[0], frame.shape[1]
-            _move_mouse_to_screen(last_position[0], last_position[1], fw, fh)
+        mover = (virtual_mouse_enabled and result.position is not None
+                 and meta['last_area'] >= scaled_area(area_threshold, frame_w, frame_h))
+        if cursor_rate > 0:
+            if interpolador is None:
+                interpolador = CursorInterpolator(
+                    motion, lambda x, y, w=frame_w, h=frame_h: _move_mouse_to_screen(x, y, w, h),
+                    rate=cursor_rate, snap=lambda x, y, w=frame_w, h=frame_h: _screen_point(x, y, w, h)).start()
+            interpolador.active = mover
+        elif mover:
+            t0 = PROFILER.tic()
+            pos = motion.position()
+            if pos is not None:
+                _move_mouse_to_screen(pos[0], pos[1], frame_w, frame_h)
+            PROFILER.toc('cursor', t0)
 
         # Controles
+        t0 = PROFILER.tic()
         key = cv2.waitKey(1) & 0xFF
-        # Handle key events (single-click triggers)
-        if key == 27:
-            break
-        elif key == ord('r') or key == ord('R'):
-            hsv_color = None
-            last_position = None
-            frames_sem_deteccao = 0
-            tolerance_bonus = 0
-            print("\n✓ Reset! Clique em um objeto para começar...\n")
-        elif key == ord('a'):
+        PROFILER.toc('waitkey', t0)
+        if recorder is not None and key != 0xFF:
+            recorder.log_key(time.perf_counter(), chr(key))
+        t0 = PROFILER.tic()
+        sair = False
+        # Teclas da janela (em foco). Com o hook global ativo, esc/0/r/a/l chegam
+        # pelos eventos abaixo e não são tratadas aqui (senão disparariam duas vezes)
+        if key == 27 and not hotkeys.active:
+            sair = True
+        elif key in (ord('r'), ord('R')) and not hotkeys.active:
+            _reset()
+        elif key == ord('p') and PROFILER.enabled:
+            # Mostrar/esconder HUD de tempos por etapa
+            opcoes['hud'] = not opcoes['hud']
+        elif key == ord('a') and not hotkeys.active:
             # Clique esquerdo (curto)
             _mouse_click('left')
             print('→ Clique esquerdo (a) enviado')
-        elif key == ord('l'):
+        elif key == ord('l') and not hotkeys.active:
             # Clique direito (curto)
             _mouse_click('right')
             print('→ Clique direito (l) enviado')
-        elif key == ord('0'):
-            # Toggle modo virtual / minimizado
-            window_minimized = not window_minimized
-            virtual_mouse_enabled = window_minimized
-            if window_minimized:
-                # mover janela para fora da tela (simular minimizado)
-                try:
-                    cv2.moveWindow('Detector de Cor', -2000, -2000)
-                except Exception:
-                    pass
-                print('→ MODO MOUSE VIRTUAL ATIVADO (janela escondida). Teclas: a=left, l=right, 0=restaurar')
-            else:
-                # Restaurar janela de forma mais robusta usando Win32
-                try:
-                    _restore_window_by_title('Detector de Cor')
-                except Exception:
-                    try:
-                        cv2.moveWindow('Detector de Cor', 100, 100)
-                    except Exception:
-                        pass
-
-                # Garantir que qualquer clique preso seja solto e flags limpas
-                if globals().get('left_down', False):
-                    try:
-                        _mouse_up('left')
-                    except Exception:
-                        pass
-                    globals()['left_down'] = False
-                if globals().get('right_down', False):
-                    try:
-                        _mouse_up('right')
-                    except Exception:
-                        pass
-                    globals()['right_down'] = False
-
-                # Resetar suavização para evitar saltos do cursor
-                prev_mouse_pos = None
-
-                print('→ Interface restaurada. Modo mouse virtual desativado.')
-        # Suporte a ações globais de tecla quando a janela está fora de foco
-        # (Ex: ESC para sair, 0 para restaurar/alternar modo, R para reset)
-        if _use_keyboard:
-            try:
-                now = time.time()
-                if now - last_key_action_time > KEY_DEBOUNCE:
-                    # ESC => sair
-                    if keyboard.is_pressed('esc') and not prev_key_states.get('esc', False):
-                        prev_key_states['esc'] = True
-                        last_key_action_time = now
-                        break
-                    # 0 => togglear modo minimizado/virtual
-                    if keyboard.is_pressed('0') and not prev_key_states.get('0', False):
-                        prev_key_states['0'] = True
-                        last_key_action_time = now
-                        window_minimized = not window_minimized
-                        virtual_mouse_enabled = window_minimized
-                        if window_minimized:
-                            try:
-                                cv2.moveWindow('Detector de Cor', -2000, -2000)
-                            except Exception:
-                                pass
-                            print('→ MODO MOUSE VIRTUAL ATIVADO (janela escondida). Teclas: a=left, l=right, 0=restaurar')
-                        else:
-                            try:
-                                _restore_window_by_title('Detector de Cor')
-                            except Exception:
-                                try:
-                                    cv2.moveWindow('Detector de Cor', 100, 100)
-                                except Exception:
-                                    pass
-
-                            # Garantir que qualquer clique preso seja solto e flags limpas
-                            if globals().get('left_down', False):
-                                try:
-                                    _mouse_up('left')
-                                except Exception:
-                                    pass
-                                globals()['left_down'] = False
-                            if globals().get('right_down', False):
-                                try:
-                                    _mouse_up('right')
-                                except Exception:
-                                    pass
-                                globals()['right_down'] = False
-
-                            prev_mouse_pos = None
-                            print('→ Interface restaurada. Modo mouse virtual desativado.')
-                    # R => reset
-                    if keyboard.is_pressed('r') and not prev_key_states.get('r', False):
-                        prev_key_states['r'] = True
-                        last_key_action_time = now
-                        hsv_color = None
-                        last_position = None
-                        frames_sem_deteccao = 0
-                        tolerance_bonus = 0
-                        print("\n✓ Reset! Clique em um objeto para começar...\n")
-
-                # Atualizar estados quando teclas são liberadas
-                if not keyboard.is_pressed('esc'):
-                    prev_key_states['esc'] = False
-                if not keyboard.is_pressed('0'):
-                    prev_key_states['0'] = False
-                if not keyboard.is_pressed('r'):
-                    prev_key_states['r'] = False
-            except Exception:
-                # Se o hook global falhar, ignorar e continuar (apenas cv2.waitKey ficará disponível)
-                pass
-        # If keyboard module is available, support press-and-hold for a and l
-        if _use_keyboard:
-            try:
-                # Left button hold
-                if keyboard.is_pressed('a'):
-                    if not globals().get('left_down', False):
-                        _mouse_down('left')
-                        globals()['left_down'] = True
-                else:
-                    if globals().get('left_down', False):
-                        _mouse_up('left')
-                        globals()['left_down'] = False
-
-                # Right button hold
-                if keyboard.is_pressed('l'):
-                    if not globals().get('right_down', False):
-                        _mouse_down('right')
-                        globals()['right_down'] = True
-                else:
-                    if globals().get('right_down', False):
-                        _mouse_up('right')
-                        globals()['right_down'] = False
-            except Exception:
-                # If keyboard hook fails, silently ignore and fallback to single clicks
-                pass
+        elif key == ord('0') and not hotkeys.active:
+            _toggle_virtual_mouse()
+        
+        # Teclas globais: eventos desde o último frame, em ordem (a/l já foram
+        # aplicados no cursor pelo próprio hook)
+        for evento in hotkeys.drain():
+            if recorder is not None:
+                recorder.log_key(evento.timestamp, evento.key, evento.down)
+            if not evento.down:
+                continue
+            if evento.key == 'esc':
+                sair = True
+                break
+            elif evento.key == '0':
+                _toggle_virtual_mouse()
+            elif evento.key == 'r':
+                _reset()
+        PROFILER.toc('keyboard', t0)
         
-        # FPS control
-        fim_frame = cv2.getTickCount()
-        tempo_frame = (fim_frame - inicio_frame) / tick_freq
-        delay = max(1, int((1.0 / 30 - tempo_frame) * 1000))
+        # Tempo total do frame
+        PROFILER.toc('frame', inicio_frame)
+        PROFILER.frame_done()
+        if sair:
+            break
     
     # Limpar
-    cap.release()
+    if estado['sujo']:
+        salvar_perfil()
+    if perfis is not None and estado['cor'] is not None:
+        print(f"✓ Perfil de calibração: {perfis.path(camera, usuario)}")
+    parar.set()
+    if pipe is not None:
+        pipe.close()
+    if interpolador is not None:
+        interpolador.stop()
+    hotkeys.stop()
+    cursor.close()
+    grabber.release()
+    if publisher is not None:
+        publisher.close()
+        print(f"✓ {publisher.published} resultados publicados")
+    if recorder is not None:
+        recorder.close()
+        print(f"✓ Sessão gravada em {record} ({recorder.frames_stored} frames, {recorder.records} registros)")
     cv2.destroyAllWindows()
+    if profile_out:
+        PROFILER.export()
+        print(f"✓ Tempos por etapa exportados para {profile_out}")
+    elif PROFILER.enabled:
+        for etapa, t in PROFILER.summary().items():
+            print(f"  {etapa:<11} p50={t['p50_ms']:.2f}ms  p95={t['p95_ms']:.2f}ms  p99={t['p99_ms']:.2f}ms")
+    if governor is not None:
+        print(f"  {governor.describe()} ({governor.downgrades} reduções, {governor.upgrades} aumentos)")
+    print(f"✓ Prévia: {preview.rendered} frames desenhados, {preview.skipped} pulados "
+          f"(janela escondida ou acima de --preview-fps)")
     
-    print("\n✓ Detector finalizado!")
+    print(f"\n✓ Detector finalizado! ({grabber.frames_captured} frames capturados, "
+          f"{grabber.frames_dropped} descartados)")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Detector de cor com rastreamento e mouse virtual')
+    parser.add_argument('--source', default='0',
+                        help="índice da câmera, caminho de vídeo ou 'synthetic' (padrão: 0)")
+    parser.add_argument('--buffer', type=int, default=1,
+                        help='quantidade de frames mantidos pela thread de captura (padrão: 1)')
+    parser.add_argument('--classifier', choices=('hsv', 'lut'),
+                        help='classificador de cor: cvtColor+inRange ou tabela BGR->máscara (padrão: perfil ou hsv)')
+    parser.add_argument('--profile', action='store_true',
+                        help='mede o tempo de cada etapa do frame e imprime percentis no fim')
+    parser.add_argument('--hud', action='store_true',
+                        help="mostra os tempos por etapa na janela (tecla 'p' alterna)")
+    parser.add_argument('--profile-out', metavar='ARQUIVO',
+                        help='exporta os tempos por etapa em .json ou .csv ao sair')
+    parser.add_argument('--profile-interval', type=float, metavar='SEG',
+                        help='com --profile-out, exporta também a cada SEG segundos')
+    parser.add_argument('--color-model', choices=COLOR_MODELS,
+                        help='range: faixa HSV fixa do pixel clicado; histogram: histograma H-S + CamShift '
+                             '(padrão: perfil ou range)')
+    parser.add_argument('--flow-interval', type=int, metavar='N',
+                        help='detecta pela cor a cada N frames e segue por fluxo óptico entre elas '
+                             '(padrão: perfil ou 0 = desligado)')
+    parser.add_argument('--filter', choices=tuple(FILTERS), default='kalman',
+                        help='filtro da posição do cursor (padrão: kalman; ema = suavização antiga)')
+    parser.add_argument('--no-predict', dest='predict', action='store_false',
+                        help='não projeta o cursor do instante da captura até o do movimento')
+    parser.add_argument('--cursor-rate', type=float, default=0, metavar='HZ',
+                        help='move o cursor numa thread a HZ vezes/s (ex.: 144), interpolando entre frames')
+    parser.add_argument('--lead-ms', type=float, default=0.0,
+                        help='predição extra (ms) para a latência da própria câmera')
+    parser.add_argument('--cursor-backend', choices=('auto',) + tuple(BACKENDS), default='auto',
+                        help='injeção do cursor: win32 (SendInput), xtest, uinput, pyautogui ou record')
+    parser.add_argument('--screen', type=parse_size, metavar='LxA',
+                        help='resolução da tela (ex.: 2560x1440); padrão: a do backend do cursor ou, '
+                             'para uinput/record, a detectada no sistema')
+    parser.add_argument('--pipeline', choices=('off', 'thread', 'process'), default='off',
+                        help='roda rastreamento e composição em paralelo (thread ou processo com memória compartilhada)')
+    parser.add_argument('--policy', choices=POLICIES, default='latency',
+                        help='latency: descarta trabalho velho; throughput: processa todos os frames')
+    parser.add_argument('--render-workers', type=int, default=2,
+                        help='threads que compõem o frame exibido no modo pipeline (padrão: 2)')
+    parser.add_argument('--budget-ms', type=float, metavar='MS',
+                        help='orçamento por frame: reduz a qualidade quando o p95 passa dele '
+                             '(padrão: perfil ou desligado; 0 desliga)')
+    parser.add_argument('--record', metavar='PASTA',
+                        help='grava a sessão (frames crus + log) nesta pasta; reproduza com recorder.py replay')
+    parser.add_argument('--record-slots', type=int, default=DEFAULT_SLOTS, metavar='N',
+                        help=f'frames mantidos no anel da gravação (padrão: {DEFAULT_SLOTS})')
+    parser.add_argument('--adapt-color', action='store_true', default=None,
+                        help='o range de cor acompanha mudanças lentas de iluminação (padrão: perfil ou desligado)')
+    parser.add_argument('--no-adapt-color', dest='adapt_color', action='store_false',
+                        help='range de cor fixo no capturado, mesmo que o perfil diga o contrário')
+    parser.add_argument('--reacquire', action='store_true', default=None,
+                        help='objeto perdido é procurado no frame inteiro em faixas, uma por frame (padrão: ligado)')
+    parser.add_argument('--no-reacquire', dest='reacquire', action='store_false',
+                        help='objeto perdido só é procurado ao redor de onde sumiu, até desistir')
+    parser.add_argument('--incremental', action='store_true', default=None,
+                        help='segmentação incremental: reconverte só os blocos da imagem que mudaram '
+                             '(câmera parada; padrão: perfil ou desligado)')
+    parser.add_argument('--no-incremental', dest='incremental', action='store_false',
+                        help='converte a janela inteira todo frame, mesmo que o perfil diga o contrário')
+    parser.add_argument('--targets', type=int, default=1, metavar='N',
+                        help=f'objetos de cores diferentes (até {MAX_TARGETS}): cada clique captura a cor do '
+                             'próximo; o cursor segue o 1º, todos vão para --publish (padrão: 1)')
+    parser.add_argument('--preview-fps', type=float, default=0, metavar='HZ',
+                        help='prévias por segundo na janela (padrão: 0 = todo frame); o rastreamento não muda')
+    parser.add_argument('--preview-scale', type=float, default=1.0, metavar='FATOR',
+                        help='resolução da prévia na janela (ex.: 0.5 = metade; padrão: 1.0)')
+    parser.add_argument('--publish', nargs='?', const=DEFAULT_NAME, metavar='NOME',
+                        help=f'publica cada resultado num anel em memória compartilhada (padrão: {DEFAULT_NAME})')
+    parser.add_argument('--publish-udp', action='append', default=[], metavar='HOST:PORTA', type=parse_address,
+                        help='publica também em datagramas UDP (pode repetir; PORTA sozinha = localhost)')
+    parser.add_argument('--user', metavar='NOME',
+                        help='usuário do perfil de calibração (padrão: usuário do sistema)')
+    parser.add_argument('--profiles-dir', metavar='PASTA',
+                        help='pasta dos perfis de calibração (padrão: ver profiles.py)')
+    parser.add_argument('--save-tuning', action='store_true',
+                        help='grava no perfil as opções do rastreador desta execução (--classifier, --color-model, '
+                             '--flow-interval, --budget-ms, --adapt-color, --reacquire, --incremental); '
+                             'sem isso elas valem só nesta sessão')
+    parser.add_argument('--no-profile', dest='use_profiles', action='store_false',
+                        help='não carrega nem salva o perfil de calibração (a cor vem do .env ou do clique)')
+    args = parser.parse_args()
+    main(args.source, args.buffer, args.classifier, profile=args.profile, hud=args.hud,
+         profile_out=args.profile_out, profile_interval=args.profile_interval,
+         cursor_filter=args.filter, predict=args.predict, cursor_rate=args.cursor_rate,
+         lead_ms=args.lead_ms, cursor_backend=args.cursor_backend,
+         pipeline=args.pipeline, policy=args.policy, render_workers=args.render_workers,
+         budget_ms=args.budget_ms, color_model=args.color_model, flow_interval=args.flow_interval,
+         record=args.record, record_slots=args.record_slots, user=args.user,
+         profiles_dir=args.profiles_dir, use_profiles=args.use_profiles, adapt_color=args.adapt_color,
+         reacquire=args.reacquire, preview_fps=args.preview_fps, preview_scale=args.preview_scale,
+         publish=args.publish, publish_udp=args.publish_udp, incremental=args.incremental, targets=args.targets,
+         screen=args.screen, save_tuning=args.save_tuning)
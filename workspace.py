@@ -0,0 +1,82 @@
+"""
+BUFFERS REAPROVEITADOS ENTRE FRAMES (Workspace)
+Cada etapa da segmentação (recorte reduzido, HSV, máscara, morfologia, mapa
+de distância, back-projection...) escreve num buffer com nome, reaproveitado
+de um frame para o outro pelo `dst=` das funções do OpenCV. Em regime, o
+loop não aloca nenhum array do tamanho do recorte.
+
+O recorte muda de tamanho a cada frame (janela cortada na borda, área do
+objeto), então cada buffer é um bloco plano com capacidade de sobra: o array
+devolvido é uma visão contígua do começo dele. Quando não cabe, o bloco
+cresce com folga (GROWTH), limitado ao tamanho do frame; trocar de resolução
+(reserve) descarta tudo e recomeça.
+
+Um Workspace é de uma thread só (um por Tracker). Um array devolvido vale
+até o próximo pedido do mesmo nome.
+"""
+
+import math
+
+import numpy as np
+
+
+# Ao crescer, um buffer ganha esta folga sobre o tamanho pedido
+GROWTH = 2.0
+
+
+class Workspace:
+    """
+    array(nome, forma, dtype) devolve o buffer `nome` com essa forma.
+    allocations / allocated_bytes contam quantas vezes um buffer precisou
+    ser (re)alocado - param de subir depois do aquecimento.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+        self._limit = None          # elementos por canal do maior frame (reserve)
+        self._frame_shape = None
+        self.allocations = 0
+        self.allocated_bytes = 0
+
+    def reserve(self, frame_shape):
+        """Frame de outra resolução: descarta os buffers (tamanhos antigos não servem)."""
+        frame_shape = tuple(frame_shape[:2])
+        if frame_shape != self._frame_shape:
+            self._buffers.clear()
+            self._frame_shape = frame_shape
+            self._limit = frame_shape[0] * frame_shape[1]
+
+    def array(self, name, shape, dtype=np.uint8):
+        """Visão contígua com `shape` do buffer `name` (conteúdo indefinido)."""
+        dtype = np.dtype(dtype)
+        size = math.prod(shape)
+        buf = self._buffers.get(name)
+        if buf is None or buf.size < size or buf.dtype != dtype:
+            capacidade = int(size * GROWTH)
+            if self._limit is not None:
+                canais = shape[2] if len(shape) > 2 else 1
+                capacidade = min(capacidade, self._limit * canais)
+            buf = np.empty(max(size, capacidade, 1), dtype)
+            self._buffers[name] = buf
+            self.allocations += 1
+            self.allocated_bytes += buf.nbytes
+        return buf[:size].reshape(shape)
+
+    def like(self, name, other, channels=None, dtype=None):
+        """Buffer com a altura/largura de `other` (e `channels` canais, ou os mesmos dele)."""
+        shape = other.shape[:2]
+        if channels is None:
+            shape = other.shape
+        elif channels > 1:
+            shape = shape + (channels,)
+        return self.array(name, shape, other.dtype if dtype is None else dtype)
+
+    @property
+    def nbytes(self):
+        """Memória total dos buffers (bytes)."""
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+    def clear(self):
+        self._buffers.clear()
+        self._frame_shape = None
+        self._limit = None